@@ -15,7 +15,20 @@ def log(msg, *args):
   print(msg, file=sys.stderr)
 
 
+def PerLine(f, num_lines):
+  """Summarize the 'new' and 'malloc' lines of ALLOC_LOG output."""
+  n = 0
+  for line in f:
+    n += 1
+  print('%d allocations for %d lines of source (%.2f per line)' %
+        (n, num_lines, float(n) / num_lines))
+
+
 def main(argv):
+  if len(argv) > 1 and argv[1] == 'per-line':
+    PerLine(sys.stdin, int(argv[2]))
+    return
+
   d = collections.defaultdict(list)
   for i, line in enumerate(sys.stdin):
     address, length = line.split()
@@ -23,6 +23,17 @@ alloc-hist() {
   #_bin/osh_eval.sizelog -n $prog | egrep '^new|^malloc' | hist
 }
 
+per-line() {
+  ### Allocations per line of parsed source, e.g. to measure the lexer
+
+  local prog=${1:-configure}
+  local num_lines
+  num_lines=$(wc -l < $prog)
+
+  _bin/osh_eval.alloclog -n $prog | egrep '^new|^malloc' |
+    benchmarks/alloclog.py per-line $num_lines
+}
+
 list-lengths() {
   ### Show the address of each list, its length, and its maximum element
   local prog=${1:-configure}
@@ -0,0 +1,67 @@
+#!/usr/bin/env python2
+"""
+arena_mem.py - Compare the memory used by Arena and CompactArena.
+
+Usage:
+  benchmarks/arena_mem.py FILE...
+
+Example:
+  $ benchmarks/arena_mem.py benchmarks/testdata/configure
+"""
+from __future__ import print_function
+
+import sys
+
+from _devbuild.gen.option_asdl import option_i
+from _devbuild.gen.syntax_asdl import source
+from core import alloc
+from core import main_loop
+from core import optview
+from core import pyutil
+from core import state
+from frontend import parse_lib
+from frontend import reader
+
+
+def ParseWithArena(arena, path, oil_grammar):
+  opt0_array = state.InitOpts()
+  opt_stacks = [None] * option_i.ARRAY_SIZE
+  parse_opts = optview.Parse(opt0_array, opt_stacks)
+  parse_ctx = parse_lib.ParseContext(arena, parse_opts, {}, oil_grammar)
+
+  with open(path) as f:
+    line_reader = reader.FileReader(f, arena)
+    c_parser = parse_ctx.MakeOshParser(line_reader)
+    with alloc.ctx_Location(arena, source.MainFile(path)):
+      # Keep the tree alive while measuring, like osh -n does.
+      return main_loop.ParseWholeFile(c_parser)
+
+
+def main(argv):
+  loader = pyutil.GetResourceLoader()
+  oil_grammar = pyutil.LoadOilGrammar(loader)
+
+  print('%-20s %-15s %10s %12s' % ('file', 'column', 'items', 'bytes'))
+  for path in argv[1:]:
+    totals = []
+    for arena in [alloc.Arena(), alloc.CompactArena()]:
+      node = ParseWithArena(arena, path, oil_grammar)
+      total = 0
+      for name, num_items, num_bytes in alloc.MemoryReport(arena):
+        print('%-20s %-15s %10d %12d' % (path[-20:], name, num_items, num_bytes))
+        total += num_bytes
+      print('%-20s %-15s %10s %12d' % (path[-20:], arena.__class__.__name__,
+                                       '', total))
+      totals.append(total)
+      del node
+    print('%-20s %-15s %10s %11.1fx' % (path[-20:], 'ratio', '',
+                                        float(totals[0]) / totals[1]))
+    print()
+
+
+if __name__ == '__main__':
+  try:
+    main(sys.argv)
+  except RuntimeError as e:
+    print('FATAL: %s' % e, file=sys.stderr)
+    sys.exit(1)
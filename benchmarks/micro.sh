@@ -42,4 +42,243 @@ printf-loop-complex() {
   done | wc -l
 }
 
+# Run an external command N times, with a big array on the heap.  fork() has
+# to copy the shell's page tables, but posix_spawn() doesn't.  The debug file
+# shows how many processes were started each way.
+#
+# Usage:
+#   ./micro.sh external-loop [N] [OSH]
+
+external-loop() {
+  local n=${1:-10000}
+  local osh=${2:-bin/osh}
+
+  local code='
+big=( $(seq 200000) )
+for (( i = 0; i < n; ++i )); do
+  /bin/true
+done
+'
+  local debug_file=_tmp/external-loop.txt
+  mkdir -p _tmp
+
+  local spawn
+  for spawn in 0 1; do
+    echo "OSH_SPAWN=$spawn"
+    rm -f $debug_file
+    time n=$n OSH_SPAWN=$spawn $osh --debug-file $debug_file -c "$code"
+    grep 'Started' $debug_file
+    echo
+  done
+}
+
+# Run an external command N times with 500 exported variables.  The
+# environment is only rebuilt when an exported variable changes.
+#
+# Usage:
+#   ./micro.sh export-loop [N] [SH]
+
+export-loop() {
+  local n=${1:-1000}
+  local sh=${2:-bin/osh}
+
+  local code='
+for (( i = 0; i < 500; ++i )); do
+  export "V$i=value$i"
+done
+for (( i = 0; i < n; ++i )); do
+  /bin/true
+done
+'
+  time n=$n $sh -c "$code"
+}
+
+# Match a regex and replace a glob pattern N times.  libc caches compiled
+# regexes, and the debug file shows the hits and misses.
+#
+# Usage:
+#   ./micro.sh regex-loop [N] [OSH]
+
+regex-loop() {
+  local n=${1:-10000}
+  local osh=${2:-bin/osh}
+
+  local code='
+s=foo-bar-baz
+for (( i = 0; i < n; ++i )); do
+  [[ $s =~ ^([a-z]+)-([a-z]+) ]]
+  t=${s//-/_}
+done
+'
+  local debug_file=_tmp/regex-loop.txt
+  mkdir -p _tmp
+
+  rm -f $debug_file
+  time n=$n $osh --debug-file $debug_file -c "$code"
+  grep 'Regex cache' $debug_file
+}
+
+# Command subs that only call builtins and shell functions run without a
+# fork.  The last one calls an external command, for comparison.
+#
+# Usage:
+#   ./micro.sh command-sub-loop [N] [SH]
+
+command-sub-loop() {
+  local n=${1:-1000}
+  local sh=${2:-bin/osh}
+
+  local -a cases=(
+    'x=$(echo hi)'
+    'x=$(f $i)'
+    "x=\$(printf '%05d' \$i)"
+    'x=$(/bin/echo hi)'
+  )
+
+  local code
+  for code in "${cases[@]}"; do
+    echo "$code"
+    time $sh -c "
+f() { echo \"x-\$1\"; }
+for (( i = 0; i < $n; ++i )); do
+  $code
+done
+"
+    echo
+  done
+}
+
+# Here docs are written to a pipe, or a temp file if they're big, without
+# starting a process.
+#
+# Usage:
+#   ./micro.sh here-doc-loop [N] [SH]
+
+here-doc-loop() {
+  local n=${1:-1000}
+  local sh=${2:-bin/osh}
+
+  time $sh -c "
+for (( i = 0; i < $n; ++i )); do
+  read -r x <<END
+line \$i
+END
+done
+echo \$x
+"
+}
+
+# $(< file) reads the file in the shell process.  $(__cat < file) is the
+# same thing in a forked process, for comparison.
+#
+# Usage:
+#   ./micro.sh read-file-loop [N] [SH]
+
+read-file-loop() {
+  local n=${1:-1000}
+  local sh=${2:-bin/osh}
+
+  local file=_tmp/read-file-loop.txt
+  mkdir -p _tmp
+  seq 1000 > $file
+
+  local code
+  for code in 'x=$(< $file)' 'x=$(__cat < $file)'; do
+    echo "$code"
+    time file=$file $sh -c "
+for (( i = 0; i < $n; ++i )); do
+  $code
+done
+"
+    echo
+  done
+}
+
+# 'while read' reads blocks from a file, and from a pipe that only the loop
+# reads.  The 'cat' after the loop could read the pipe too, so the last case
+# reads a byte at a time.
+#
+# Usage:
+#   ./micro.sh read-loop [N] [SH]
+
+read-loop() {
+  local n=${1:-2000}
+  local sh=${2:-bin/osh}
+
+  local file=_tmp/read-loop.txt
+  mkdir -p _tmp
+  seq $n | awk '{ printf "%s %0100d\n", $1, 0 }' > $file  # 100 byte lines
+
+  local code
+  for code in \
+    'while read -r line; do :; done < $file' \
+    'cat $file | while read -r line; do :; done' \
+    'cat $file | { while read -r line; do :; done; cat; }'; do
+    echo "$code"
+    time file=$file $sh -c "$code"
+    echo
+  done
+}
+
+# mapfile reads all of stdin at once, and splits it natively, unless -n
+# limits the number of lines.
+#
+# Usage:
+#   ./micro.sh mapfile-lines [N] [SH]
+
+mapfile-lines() {
+  local n=${1:-1000000}
+  local sh=${2:-bin/osh}
+
+  local file=_tmp/mapfile-lines.txt
+  mkdir -p _tmp
+  seq $n > $file
+
+  local code
+  for code in \
+    'mapfile -t lines < $file' \
+    'cat $file | mapfile -t lines' \
+    'mapfile -t -n $n lines < $file'; do
+    echo "$code"
+    time file=$file n=$n $sh -c "$code"'; echo ${#lines[@]}'
+    echo
+  done
+}
+
+# ${x##pat} and ${x%%pat} are one regex search.  ${x#pat} and ${x%pat} call
+# fnmatch() on each prefix or suffix until one matches.  The glob is
+# translated once per pattern, so short strings in a loop are cheap.
+#
+# Usage:
+#   ./micro.sh strip-loop [N] [SH]
+
+strip-loop() {
+  local n=${1:-6000}
+  local sh=${2:-bin/osh}
+
+  local code
+  for code in 'y=${x%:*}' 'y=${x##*:}'; do
+    echo "$code"
+    time $sh -c "
+x=foo:bar:baz
+for (( i = 0; i < $n; ++i )); do
+  $code
+done
+"
+    echo
+  done
+
+  # 5000 byte strings
+  for code in 'y=${x#*:}' 'y=${x##*:}'; do
+    echo "$code (long)"
+    time $sh -c "
+x=\$(printf '%05000d' 0):tail
+for (( i = 0; i < 20; ++i )); do
+  $code
+done
+"
+    echo
+  done
+}
+
 "$@"
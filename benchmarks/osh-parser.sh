@@ -441,6 +441,17 @@ EOF
 EOF
 }
 
+parse-all() {
+  ### Parse-check the whole corpus with one worker per CPU
+
+  local files=${1:-benchmarks/osh-parser-files.txt}
+  local out=$BASE_DIR/parse-all.tsv
+  mkdir -p $BASE_DIR
+
+  time grep -v '^#' $files | bin/oshc parse-all "${@:2}" > $out
+  cat $out
+}
+
 time-test() {
   benchmarks/time_.py \
     --field bash --field foo.txt \
@@ -116,6 +116,37 @@ compare-time() {
   compare time-callback
 }
 
+# Time N runs of bin/osh, to track the cost of what we load at startup.  The
+# Oil grammar, expression evaluator, and completion are loaded on first use,
+# so 'true' shouldn't pay for them, but the Oil expression does.
+#
+# Example:
+#   benchmarks/startup.sh osh-startup 50
+osh-startup() {
+  local n=${1:-20}
+  local osh=${2:-bin/osh}
+
+  local -a cases=(
+    'true'
+    'echo hi'
+    'var x = len([1, 2, 3])'
+    'complete -W "a b" foo'
+  )
+
+  local code
+  for code in "${cases[@]}"; do
+    local start end
+    start=$(date +%s%N)
+    for (( i = 0; i < n; ++i )); do
+      $osh -c "$code" >/dev/null
+    done
+    end=$(date +%s%N)
+
+    local ms=$(( (end - start) / n / 1000000 ))
+    printf '%6d ms  %s\n' "$ms" "$code"
+  done
+}
+
 import-stats() {
   # 152 sys calls!  More than bash needs to start up.
   echo json
@@ -51,6 +51,7 @@ from pylib import os_path
 from tea import tea_main
 from tools import deps
 from tools import osh2oil
+from tools import parse_all
 from tools import readlink
 
 try:
@@ -61,7 +62,7 @@ except ImportError:
 # TODO: Hook up to completion.
 SUBCOMMANDS = [
     'translate', 'arena', 'spans', 'format', 'deps', 'undefined-vars',
-    'parse-glob', 'parse-printf',
+    'parse-glob', 'parse-printf', 'parse-all',
 ]
 
 def OshCommandMain(argv):
@@ -97,6 +98,10 @@ def OshCommandMain(argv):
     print('TODO:parse-printf')
     return 0
 
+  if action == 'parse-all':
+    # Parse many files in parallel, with one arena per file
+    return parse_all.Main(argv)
+
   arena = alloc.Arena()
   try:
     script_name = argv[1]
@@ -126,7 +131,7 @@ def OshCommandMain(argv):
   parse_ctx = parse_lib.ParseContext(arena, parse_opts, aliases, oil_grammar)
   parse_ctx.Init_OnePassParse(True)
 
-  line_reader = reader.FileLineReader(f, arena)
+  line_reader = reader.FileReader(f, arena)
   c_parser = parse_ctx.MakeOshParser(line_reader)
 
   try:
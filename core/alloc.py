@@ -8,6 +8,11 @@ The idea is to save the LST for functions, but discard it for commands that
 have already executed.  Each statement/function can be parsed into a separate
 Arena, and the entire Arena can be discarded at once.
 
+What we do now is a simpler version of that.  Long-lived objects like function
+definitions call Pin(), and main loops call Reclaim() after a top-level
+command or 'eval' runs.  Lines and spans that were allocated for it and not
+pinned are discarded, and their IDs are reused.
+
 Also, we don't want to save comment lines.
 """
 
@@ -16,8 +21,13 @@ from _devbuild.gen.syntax_asdl import (
 )
 from asdl import runtime
 from core.pyerror import log
+from mycpp import mylib
+
+from typing import List, Dict, Tuple, Any, cast
 
-from typing import List, Dict, Any, cast
+if mylib.PYTHON:
+  import array
+  import sys
 
 _ = log
 
@@ -48,10 +58,15 @@ class Arena(object):
   def __init__(self):
     # type: () -> None
 
-    # Three parallel arrays indexed by line_id.
+    # Parallel arrays indexed by line_id.
     self.line_vals = []  # type: List[str]
     self.line_nums = []  # type: List[int]
     self.line_srcs = []  # type: List[source_t]
+
+    # For lines added with AddLineAt(), line_vals has None, and these hold the
+    # buffer (e.g. the contents of a file) and the line's offset into it.
+    self.line_bufs = []  # type: List[str]
+    self.line_offsets = []  # type: List[int]
     self.line_num_strs = {}  # type: Dict[int, str]  # an INTERN table
 
     # indexed by span_id
@@ -60,6 +75,15 @@ class Arena(object):
     # reuse these instances in many line_span instances
     self.source_instances = []  # type: List[source_t]
 
+    # Lines and spans before these IDs are referenced by long-lived objects,
+    # so they can't be reclaimed.
+    self.pinned_line_id = 0
+    self.pinned_span_id = 0
+
+    # For stats
+    self.num_freed_lines = 0
+    self.num_freed_spans = 0
+
   def PushSource(self, src):
     # type: (source_t) -> None
     self.source_instances.append(src)
@@ -78,19 +102,38 @@ class Arena(object):
     self.line_vals.append(line)
     self.line_nums.append(line_num)
     self.line_srcs.append(self.source_instances[-1])
+    self.line_bufs.append(None)
+    self.line_offsets.append(-1)
     return line_id
 
+  if mylib.PYTHON:
+    def AddLineAt(self, buf, offset, line_num):
+      # type: (str, int, int) -> int
+      """Like AddLine(), but only save the line's offset into a buffer.
+
+      The buffer is usually a whole file, so its lines aren't copied until
+      GetLine() is called, e.g. for an error message.
+      """
+      line_id = len(self.line_vals)
+      self.line_vals.append(None)
+      self.line_nums.append(line_num)
+      self.line_srcs.append(self.source_instances[-1])
+      self.line_bufs.append(buf)
+      self.line_offsets.append(offset)
+      return line_id
+
   def GetLine(self, line_id):
     # type: (int) -> str
-    """Return the text of a line.
-
-    TODO: This should be hidden behind an interface like Python's line cache?
-    It should store offsets (and maybe checkums).  It will have two
-    implementions: in-memory for interactive, and on-disk for batch and
-    'sourced' files.
-    """
+    """Return the text of a line."""
     assert line_id >= 0, line_id
-    return self.line_vals[line_id]
+    line = self.line_vals[line_id]
+    if mylib.PYTHON:
+      if line is None:  # added with AddLineAt()
+        buf = self.line_bufs[line_id]
+        start = self.line_offsets[line_id]
+        end = buf.find('\n', start)
+        line = buf[start : end + 1] if end != -1 else buf[start:]
+    return line
 
   def GetLineNumber(self, line_id):
     # type: (int) -> int
@@ -147,7 +190,165 @@ class Arena(object):
       'Span ID out of range: %d is greater than %d' % (span_id, len(self.spans))
     return self.spans[span_id]
 
+  def LastLineId(self):
+    # type: () -> int
+    """Return one past the last line ID."""
+    return len(self.line_vals)
+
   def LastSpanId(self):
     # type: () -> int
     """Return one past the last span ID."""
     return len(self.spans)
+
+  def Pin(self):
+    # type: () -> None
+    """Keep all lines and spans allocated so far.
+
+    Called when a long-lived object refers to them, e.g. a function
+    definition, a trap handler, or a cached parse of $PS1.
+    """
+    self.pinned_line_id = self.LastLineId()
+    self.pinned_span_id = self.LastSpanId()
+
+  def Reclaim(self, line_id, span_id):
+    # type: (int, int) -> None
+    """Discard the lines and spans allocated since the given IDs.
+
+    Those that are pinned are kept.  The caller must ensure that nothing else
+    refers to them, since their IDs will be reused.
+    """
+    if line_id < self.pinned_line_id:
+      line_id = self.pinned_line_id
+    if span_id < self.pinned_span_id:
+      span_id = self.pinned_span_id
+
+    while len(self.line_vals) > line_id:
+      self.line_vals.pop()
+      self.line_nums.pop()
+      self.line_srcs.pop()
+      self.line_bufs.pop()
+      self.line_offsets.pop()
+      self.num_freed_lines += 1
+
+    num_spans = self.LastSpanId()
+    if num_spans > span_id:
+      self._PopSpans(span_id)
+      self.num_freed_spans += num_spans - span_id
+
+  def _PopSpans(self, span_id):
+    # type: (int) -> None
+    while len(self.spans) > span_id:
+      self.spans.pop()
+
+
+if mylib.PYTHON:
+  def _IntArray(typecode='i'):
+    # type: (str) -> List[int]
+    """Packed C ints that support the List[int] operations we use."""
+    return array.array(typecode)  # type: ignore
+
+
+class CompactArena(Arena):
+  """An Arena that stores spans and line numbers in packed integer columns.
+
+  Arena stores one line_span object per token, plus a boxed int for each
+  field.  Here each field of line_span gets its own array of C ints, and
+  GetLineSpan() creates a line_span on demand.  Spans are written once per
+  token, but only read for error messages and translation.
+
+  In C++, List<int> is already a contiguous vector, so the columns are plain
+  lists.
+  """
+  def __init__(self):
+    # type: () -> None
+    Arena.__init__(self)
+
+    # Parallel arrays indexed by span_id.
+    self.span_line_ids = []  # type: List[int]
+    self.span_cols = []  # type: List[int]
+    self.span_lengths = []  # type: List[int]
+
+    if mylib.PYTHON:
+      self.line_nums = _IntArray()
+      self.line_offsets = _IntArray('l')  # files can be over 2 GiB
+      self.span_line_ids = _IntArray()
+      self.span_cols = _IntArray()
+      self.span_lengths = _IntArray()
+
+  def AddLineSpan(self, line_id, col, length):
+    # type: (int, int, int) -> int
+    span_id = len(self.span_line_ids)
+    self.span_line_ids.append(line_id)
+    self.span_cols.append(col)
+    self.span_lengths.append(length)
+    return span_id
+
+  def GetLineSpan(self, span_id):
+    # type: (int) -> line_span
+    assert span_id != runtime.NO_SPID, span_id
+    assert span_id < len(self.span_line_ids), \
+      'Span ID out of range: %d is greater than %d' % (
+          span_id, len(self.span_line_ids))
+    return line_span(self.span_line_ids[span_id], self.span_cols[span_id],
+                     self.span_lengths[span_id])
+
+  def LastSpanId(self):
+    # type: () -> int
+    return len(self.span_line_ids)
+
+  def _PopSpans(self, span_id):
+    # type: (int) -> None
+    while len(self.span_line_ids) > span_id:
+      self.span_line_ids.pop()
+      self.span_cols.pop()
+      self.span_lengths.pop()
+
+
+if mylib.PYTHON:
+  def _ListSize(objs):
+    # type: (Any) -> int
+    """Size of a list, the objects it points to, and their int fields.
+
+    Shared objects, like small ints and interned strings, are counted once.
+    """
+    seen = {}  # type: Dict[int, bool]
+    total = sys.getsizeof(objs)
+    for obj in objs:
+      for o in [obj] + [getattr(obj, a) for a in getattr(obj, '__slots__', ())]:
+        if id(o) not in seen:
+          seen[id(o)] = True
+          total += sys.getsizeof(o)
+    return total
+
+  def MemoryReport(arena):
+    # type: (Arena) -> List[Tuple[str, int, int]]
+    """Return (column name, number of items, bytes used) rows.
+
+    The sizes are from sys.getsizeof(), so they're only estimates, but they're
+    good enough to compare Arena and CompactArena.
+    """
+    if isinstance(arena, CompactArena):
+      span_rows = [
+          ('span_line_ids', arena.span_line_ids),
+          ('span_cols', arena.span_cols),
+          ('span_lengths', arena.span_lengths),
+      ]  # type: List[Tuple[str, Any]]
+    else:
+      span_rows = [('spans', arena.spans)]
+
+    rows = []  # type: List[Tuple[str, int, int]]
+    for name, col in [
+        ('line_vals', arena.line_vals),
+        ('line_nums', arena.line_nums),
+        ('line_srcs', arena.line_srcs),
+        ('line_bufs', arena.line_bufs),
+        ('line_offsets', arena.line_offsets),
+    ] + span_rows:
+      # Packed arrays hold their data inline, and source_t instances and
+      # buffers are shared by many lines.
+      if isinstance(col, array.array) or name in ('line_srcs', 'line_bufs'):
+        size = sys.getsizeof(col)
+      else:
+        size = _ListSize(col)
+      rows.append((name, len(col), size))
+    return rows
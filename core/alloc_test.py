@@ -55,6 +55,94 @@ class AllocTest(unittest.TestCase):
     self.assertEqual('one.oil', arena.GetLineSource(id3).path)
     self.assertEqual(3, arena.GetLineNumber(id3))
 
+  def testLineSpans(self):
+    arena = self.arena
+    arena.PushSource(source.MainFile('one.oil'))
+    arena.AddLine('echo hi', 1)
+    line_id = arena.AddLine('echo 1000000', 1000000)
+    arena.PopSource()
+
+    self.assertEqual(0, arena.LastSpanId())
+    self.assertEqual(0, arena.AddLineSpan(line_id, 0, 4))
+    self.assertEqual(1, arena.AddLineSpan(line_id, 5, 7))
+    self.assertEqual(2, arena.LastSpanId())
+
+    span = arena.GetLineSpan(1)
+    self.assertEqual(line_id, span.line_id)
+    self.assertEqual(5, span.col)
+    self.assertEqual(7, span.length)
+    self.assertEqual(1000000, arena.GetLineNumber(span.line_id))
+
+  def testAddLineAt(self):
+    arena = self.arena
+    arena.PushSource(source.MainFile('one.oil'))
+    buf = 'echo 1\necho 2'
+    arena.AddLine('echo 0\n', 1)
+    self.assertEqual(1, arena.AddLineAt(buf, 0, 2))
+    self.assertEqual(2, arena.AddLineAt(buf, 7, 3))
+    # Offsets into files over 2 GiB fit
+    self.assertEqual(3, arena.AddLineAt(buf, 3 << 30, 4))
+    arena.PopSource()
+
+    self.assertEqual('echo 0\n', arena.GetLine(0))
+    self.assertEqual('echo 1\n', arena.GetLine(1))
+    self.assertEqual('echo 2', arena.GetLine(2))
+    self.assertEqual(3, arena.GetLineNumber(2))
+    self.assertEqual('one.oil', arena.GetLineSource(2).path)
+    self.assertEqual('', arena.GetLine(3))
+
+  def testReclaim(self):
+    arena = self.arena
+    arena.PushSource(source.MainFile('one.oil'))
+
+    line_id = arena.AddLine('f() { echo hi; }', 1)
+    arena.AddLineSpan(line_id, 0, 1)
+    arena.Pin()  # function definition
+
+    line_id = arena.AddLine('echo 2', 2)
+    span_id = arena.AddLineSpan(line_id, 0, 4)
+    self.assertEqual(1, span_id)
+
+    # Everything after the pin is freed
+    arena.Reclaim(0, 0)
+    self.assertEqual(1, arena.LastLineId())
+    self.assertEqual(1, arena.LastSpanId())
+    self.assertEqual(1, arena.num_freed_lines)
+    self.assertEqual(1, arena.num_freed_spans)
+
+    # IDs are reused
+    line_id = arena.AddLine('echo 3', 3)
+    self.assertEqual(1, line_id)
+    self.assertEqual(1, arena.AddLineSpan(line_id, 5, 1))
+    self.assertEqual(3, arena.GetLineNumber(arena.GetLineSpan(1).line_id))
+
+    arena.Reclaim(2, 2)  # nothing to free
+    self.assertEqual(2, arena.LastLineId())
+    self.assertEqual(2, arena.LastSpanId())
+
+    arena.PopSource()
+
+  def testMemoryReport(self):
+    arena = self.arena
+    arena.PushSource(source.MainFile('one.oil'))
+    line_id = arena.AddLine('echo hi', 1)
+    arena.PopSource()
+    for i in xrange(3):
+      arena.AddLineSpan(line_id, i, 1)
+
+    rows = alloc.MemoryReport(arena)
+    names = [name for name, _, _ in rows]
+    self.assertEqual(['line_vals', 'line_nums', 'line_srcs'], names[:3])
+    self.assertEqual(3, rows[-1][1])  # number of spans
+    for _, _, num_bytes in rows:
+      self.assertGreater(num_bytes, 0)
+
+
+class CompactArenaTest(AllocTest):
+
+  def setUp(self):
+    self.arena = alloc.CompactArena()
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -37,8 +37,11 @@ import pwd
 import time
 
 from _devbuild.gen.id_kind_asdl import Id
-from _devbuild.gen.syntax_asdl import word_part_e, redir_param_e
-from _devbuild.gen.runtime_asdl import value_e, value__Str, scope_e, Proc
+from _devbuild.gen.syntax_asdl import (
+    word_part_e, redir_param_e, command_e, command_t, command__CommandList,
+    command__Sentence,
+)
+from _devbuild.gen.runtime_asdl import value_e, scope_e, Proc
 from _devbuild.gen.types_asdl import redir_arg_type_e
 from core import error
 from core.pyerror import log
@@ -56,13 +59,14 @@ from osh.string_ops import ShellQuoteB
 import libc
 import posix_ as posix
 from typing import (
-    Dict, Tuple, List, Optional, Iterator, Union, Callable, Any, TYPE_CHECKING
+    Dict, Tuple, List, Optional, Iterator, Union, Callable, Any, cast,
+    TYPE_CHECKING
 )
 if TYPE_CHECKING:
   from _devbuild.gen.syntax_asdl import Token, compound_word
   from core.alloc import Arena
   from core.comp_ui import State
-  from core.state import Mem
+  from core.state import Mem, SearchPath
   from core.util import _DebugFile
   from frontend.parse_lib import ParseContext
   from osh.cmd_eval import CommandEvaluator
@@ -519,76 +523,19 @@ class ExternalCommandAction(CompletionAction):
 
   This is PART of compge -A command.
   """
-  def __init__(self, mem):
-    # type: (Mem) -> None
+  def __init__(self, search_path):
+    # type: (SearchPath) -> None
     """
     Args:
-      mem: for looking up Path
+      search_path: indexes the directories in $PATH
     """
-    self.mem = mem
-    # Should we list everything executable in $PATH here?  And then whenever
-    # $PATH is changed, regenerated it?
-    # Or we can cache directory listings?  What if the contents of the dir
-    # changed?
-    # Can we look at the dir timestamp?
-    #
-    # (dir, timestamp) -> list of entries perhaps?  And then every time you hit
-    # tab, do you have to check the timestamp?  It should be cached by the
-    # kernel, so yes.
-    self.ext = []
-
-    # (dir, timestamp) -> list
-    # NOTE: This cache assumes that listing a directory is slower than statting
-    # it to get the mtime.  That may not be true on all systems?  Either way
-    # you are reading blocks of metadata.  But I guess /bin on many systems is
-    # huge, and will require lots of sys calls.
-    self.cache = {}
+    self.search_path = search_path
 
   def Matches(self, comp):
     # type: (Api) -> Iterator[Union[Iterator, Iterator[str]]]
-    """
-    TODO: Cache is never cleared.
-
-    - When we get a newer timestamp, we should clear the old one.
-    - When PATH is changed, we can remove old entries.
-    """
-    val = self.mem.GetValue('PATH')
-    if val.tag_() != value_e.Str:
-      # No matches if not a string
-      return
-    assert isinstance(val, value__Str)  # for MyPy
-
-    path_dirs = val.s.split(':')
-    #log('path: %s', path_dirs)
-
-    executables = []  # type: List[str]
-    for d in path_dirs:
-      try:
-        st = posix.stat(d)
-      except OSError as e:
-        # There could be a directory that doesn't exist in the $PATH.
-        continue
-      key = (d, st.st_mtime)
-
-      dir_exes = self.cache.get(key)
-      if dir_exes is None:
-        entries = posix.listdir(d)
-        dir_exes = []
-        for name in entries:
-          path = os_path.join(d, name)
-          # TODO: Handle exception if file gets deleted in between listing and
-          # check?
-          if not posix.access(path, posix.X_OK):
-            continue
-          dir_exes.append(name)  # append the name, not the path
-
-        self.cache[key] = dir_exes
-
-      executables.extend(dir_exes)
-
     # TODO: Shouldn't do the prefix / space thing ourselves.  readline does
     # that at the END of the line.
-    for word in executables:
+    for word in self.search_path.Executables():
       if word.startswith(comp.to_complete):
         yield word
 
@@ -770,6 +717,90 @@ class RootCompleter(object):
     self.parse_ctx = parse_ctx
     self.debug_f = debug_f
 
+    # The buffer up to the end of the last complete command, e.g. 'echo hi;'.
+    # It may span several lines.  See _ParseLine().
+    self.stable_prefix = ''
+
+  def _ParseLine(self, line_until_tab):
+    # type: (str) -> None
+    """Parse the buffer to fill in parse_ctx.trail.
+
+    The trail only needs the command we're completing, so we remember where
+    the last complete command in the buffer ended.  If the next buffer starts
+    with the same text, we parse only what comes after it, which keeps
+    completion fast on long buffers.
+    """
+    arena = self.parse_ctx.arena
+
+    # Offset in the buffer where parsing starts
+    start = 0
+    n = len(self.stable_prefix)
+    # The lexer needs at least one character to start with.  It has to be
+    # whitespace, since '&' or ';' could extend the terminator to '&&' or
+    # ';;'.  Not a newline, since ParseLogicalLine() would stop there.
+    if (n and len(line_until_tab) > n and line_until_tab[n] in ' \t' and
+        line_until_tab.startswith(self.stable_prefix)):
+      start = n
+    self.debug_f.log('Parsing buffer from offset %d', start)
+
+    # Add each whole line, so token columns are relative to it.  Lines that
+    # end before the start aren't lexed.
+    lines = []  # type: List[Tuple[int, str, int]]
+    # The ID and buffer offset of each line we lex
+    line_ids = []  # type: List[int]
+    offsets = []  # type: List[int]
+    line_num = 1
+    pos = 0
+    size = len(line_until_tab)
+    while pos < size:
+      eol = line_until_tab.find('\n', pos)
+      if eol == -1:
+        eol = size
+      else:
+        eol += 1
+      line = line_until_tab[pos:eol]
+      line_id = arena.AddLine(line, line_num)
+      if eol > start:
+        lines.append((line_id, line, max(start - pos, 0)))
+        line_ids.append(line_id)
+        offsets.append(pos)
+      line_num += 1
+      pos = eol
+
+    line_reader = reader.VirtualLineReader(lines, arena)
+    c_parser = self.parse_ctx.MakeOshParser(line_reader, emit_comp_dummy=True)
+
+    # We want the output from parse_ctx, so we don't use the return value.
+    try:
+      node = c_parser.ParseLogicalLine()
+    except error.Parse as e:
+      # e.g. 'ls | ' will not parse.  Now inspect the parser state!
+      return
+
+    if node:
+      self._UpdateStablePrefix(node, line_ids, offsets, line_until_tab)
+
+  def _UpdateStablePrefix(self, node, line_ids, offsets, line_until_tab):
+    # type: (command_t, List[int], List[int], str) -> None
+    """Remember the end of the last 'cmd;' or 'cmd &' at the top level."""
+    UP_node = node
+    if node.tag_() == command_e.CommandList:
+      node = cast(command__CommandList, UP_node)
+      children = node.children
+    else:
+      children = [node]
+
+    for child in reversed(children):
+      if child.tag_() == command_e.Sentence:
+        sentence = cast(command__Sentence, child)
+        span = self.parse_ctx.arena.GetLineSpan(sentence.terminator.span_id)
+        for i, line_id in enumerate(line_ids):
+          if span.line_id == line_id:  # not from an alias expansion
+            end = offsets[i] + span.col + span.length
+            self.stable_prefix = line_until_tab[:end]
+            break
+        break
+
   def Matches(self, comp):
     # type: (Api) -> Iterator[Union[Iterator, Iterator[str]]]
     """
@@ -787,15 +818,7 @@ class RootCompleter(object):
     self.comp_ui_state.line_until_tab = line_until_tab
 
     self.parse_ctx.trail.Clear()
-    line_reader = reader.StringLineReader(line_until_tab, self.parse_ctx.arena)
-    c_parser = self.parse_ctx.MakeOshParser(line_reader, emit_comp_dummy=True)
-
-    # We want the output from parse_ctx, so we don't use the return value.
-    try:
-      c_parser.ParseLogicalLine()
-    except error.Parse as e:
-      # e.g. 'ls | ' will not parse.  Now inspect the parser state!
-      pass
+    self._ParseLine(line_until_tab)
 
     debug_f = self.debug_f
     trail = self.parse_ctx.trail
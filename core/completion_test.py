@@ -128,7 +128,7 @@ class CompletionTest(unittest.TestCase):
     parse_opts, exec_opts, mutable_opts = state.MakeOpts(mem, None)
     mem.exec_opts = exec_opts
 
-    a = completion.ExternalCommandAction(mem)
+    a = completion.ExternalCommandAction(state.SearchPath(mem))
     comp = self._CompApi([], 0, 'f')
     print(list(a.Matches(comp)))
 
@@ -262,6 +262,61 @@ class RootCompleterTest(unittest.TestCase):
     m = list(r.Matches(MockApi('var=$v')))
     m = list(r.Matches(MockApi('local var=$v')))
 
+  def testIncrementalParse(self):
+    comp_lookup = completion.Lookup()
+    comp_lookup.RegisterName('grep', BASE_OPTS, U1)
+    comp_lookup.RegisterName('__first', BASE_OPTS, U2)
+    r = _MakeRootCompleter(comp_lookup=comp_lookup)
+
+    m = list(r.Matches(MockApi('echo hi; ls -l && grep f')))
+    self.assertEqual(['echo hi; ls -l && grep foo.py ',
+                      'echo hi; ls -l && grep foo '], m)
+    self.assertEqual('echo hi;', r.stable_prefix)
+
+    # Only the part after 'echo hi; ' is parsed, with the same result
+    m = list(r.Matches(MockApi('echo hi; ls -l && grep f')))
+    self.assertEqual(['echo hi; ls -l && grep foo.py ',
+                      'echo hi; ls -l && grep foo '], m)
+
+    m = list(r.Matches(MockApi('echo hi; ls -l & g')))
+    self.assertEqual(['echo hi; ls -l & grep '], m)
+    self.assertEqual('echo hi; ls -l &', r.stable_prefix)
+
+    # Column of $ is still relative to the whole line
+    m = list(r.Matches(MockApi('echo hi; ls -l & echo $PW')))
+    self.assertEqual(['echo hi; ls -l & echo $PWD'], m)
+    self.assertEqual(len('echo hi; ls -l & echo $'),
+                     r.comp_ui_state.display_pos)
+
+    # The line was edited before the stable prefix
+    m = list(r.Matches(MockApi('echo { g')))
+    self.assertEqual([], m)
+    self.assertEqual('echo hi; ls -l &', r.stable_prefix)
+
+    # Doesn't parse, so we keep the old prefix
+    m = list(r.Matches(MockApi('echo hi; ls -l & { grep f')))
+    self.assertEqual('echo hi; ls -l &', r.stable_prefix)
+
+    # & became && or ;, so the prefix isn't reused
+    m = list(r.Matches(MockApi('ls -l & g')))
+    self.assertEqual(['ls -l & grep '], m)
+    m = list(r.Matches(MockApi('ls -l && g')))
+    self.assertEqual(['ls -l && grep '], m)
+
+    # The prefix can span lines
+    buf = 'for x in a; do\n  echo $x\ndone; echo hi; ls -l && grep f'
+    list(r.Matches(MockApi(buf)))
+    self.assertEqual('for x in a; do\n  echo $x\ndone; echo hi;',
+                     r.stable_prefix)
+    expected = [t.val for t in r.parse_ctx.trail.tokens if t.val]
+    self.assertEqual('for', expected[0])
+
+    # Only the part after 'echo hi; ' on the last line is parsed
+    list(r.Matches(MockApi(buf)))
+    self.assertEqual(['ls', '-l', 'grep', 'f'],
+                     [t.val for t in r.parse_ctx.trail.tokens if t.val])
+    self.assertEqual(expected[-4:], ['ls', '-l', 'grep', 'f'])
+
   def testCompletesHomeDirs(self):
     r = _MakeRootCompleter()
 
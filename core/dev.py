@@ -302,6 +302,7 @@ class Tracer(object):
         ps4_word = word_.ErrorWord(
             "<ERROR: Can't parse PS4: %s>" % e.UserErrorString())
       self.parse_cache[ps4] = ps4_word
+      self.parse_ctx.arena.Pin()
 
     # Mutate objects to save allocations
     if self.exec_opts.xtrace_rich():
@@ -8,27 +8,47 @@ import sys
 
 #from _devbuild.gen.option_asdl import builtin_i
 from _devbuild.gen.id_kind_asdl import Id
-from _devbuild.gen.runtime_asdl import redirect, trace
+from _devbuild.gen.runtime_asdl import redirect, redirect_arg__Path, trace
 from _devbuild.gen.syntax_asdl import (
     command_e, command__Simple, command__Pipeline, command__ControlFlow,
-    command_sub, compound_word, Token,
+    command__Sentence, command__CommandList, command__AndOr, command__If,
+    command__Case, command__LazyBody, condition_e, condition__Shell,
+    BraceGroup, word_e, word_t, word__BracedTree, word_part_e, word_part_t,
+    word_part__BracedTuple, word_part__ExtGlob, double_quoted,
+    simple_var_sub, braced_var_sub, bracket_op_e, bracket_op__ArrayIndex,
+    arith_expr_e, suffix_op_e, suffix_op__Unary, suffix_op__PatSub,
+    command_sub, compound_word, command__ExpandedAlias, command__ShAssignment,
+    command__DoGroup, command__Subshell, command__WhileUntil,
+    command__ForEach, command__ForExpr, command__DParen, command__DBracket,
+    arith_expr__UnaryAssign, arith_expr__BinaryAssign, arith_expr__Unary,
+    arith_expr__Binary, arith_expr__TernaryOp, bool_expr_e, bool_expr__WordTest,
+    bool_expr__Binary, bool_expr__Unary, bool_expr__LogicalNot,
+    bool_expr__LogicalAnd, bool_expr__LogicalOr, word_part__ArithSub,
+    suffix_op__Slice, redir_loc_e, redir_loc__Fd, redir_param_e,
+    redir_param__HereDoc, sh_lhs_expr_e, sh_lhs_expr__IndexedName,
 )
 from asdl import runtime
 from core import dev
 from core import error
 from core import process
+from core import pyutil
 from core.pyerror import e_die, log
+from core.pyutil import stderr_line
 from core import ui
 from core import vm
 from frontend import consts
 from frontend import location
+from mycpp import mylib
+from osh import word_
 
 import posix_ as posix
 
-from typing import cast, Dict, List, TYPE_CHECKING
+from typing import cast, Dict, List, Tuple, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import cmd_value__Argv, CompoundStatus, Proc
-  from _devbuild.gen.syntax_asdl import command_t
+  from _devbuild.gen.syntax_asdl import (
+      command_t, redir, arith_expr_t, bool_expr_t
+  )
   from core import optview
   from core import state
   from core.vm import _Builtin
@@ -44,6 +64,644 @@ class _ProcessSubFrame(object):
     self.span_ids = []  # type: List[int]
 
 
+# Builtins that only read shell state and write to stdout.  Not 'test',
+# because [ -t 1 ] would see the terminal instead of a pipe.
+_CAPTURE_BUILTINS = ['echo', 'printf', 'true', 'false', ':']
+
+
+class _CaptureChecker(object):
+  """Decide whether a command sub can run in the shell process.
+
+  Running it in a child process isolates its side effects.  We only skip the
+  fork when there are none to isolate: the body may only call the builtins
+  above and shell functions made of the same things, with no assignments
+  (except 'local' in a function), redirects, 'exit', or loop control flow.
+  Words may not assign, e.g. ${x=default} or $(( i++ )).
+
+  Nothing may fork either, e.g. a pipeline or a nested command sub, because
+  the child would inherit the buffer that replaces sys.stdout.
+  """
+  def __init__(self, procs):
+    # type: (Dict[str, Proc]) -> None
+    self.procs = procs
+    # Function bodies being checked, or already checked.  Reset for every
+    # command sub, because a body's answer depends on the functions it calls,
+    # which can be redefined.
+    self.bodies = {}  # type: Dict[command_t, bool]
+
+  def _Parts(self, parts):
+    # type: (List[word_part_t]) -> bool
+    for part in parts:
+      UP_part = part
+      tag = part.tag_()
+
+      if tag in (word_part_e.Literal, word_part_e.EscapedLiteral,
+                 word_part_e.SingleQuoted, word_part_e.TildeSub,
+                 word_part_e.BracedRange):
+        continue
+
+      if tag == word_part_e.DoubleQuoted:
+        dq = cast(double_quoted, UP_part)
+        if not self._Parts(dq.parts):
+          return False
+
+      elif tag == word_part_e.SimpleVarSub:
+        vsub = cast(simple_var_sub, UP_part)
+        if vsub.token.val == '$BASHPID':
+          return False
+
+      elif tag == word_part_e.BracedVarSub:
+        if not self._VarSub(cast(braced_var_sub, UP_part)):
+          return False
+
+      elif tag == word_part_e.BracedTuple:
+        tuple_part = cast(word_part__BracedTuple, UP_part)
+        for w in tuple_part.words:
+          if not self._Parts(w.parts):
+            return False
+
+      elif tag == word_part_e.ExtGlob:
+        eg = cast(word_part__ExtGlob, UP_part)
+        for w in eg.arms:
+          if not self._Parts(w.parts):
+            return False
+
+      else:
+        return False
+
+    return True
+
+  def _VarSub(self, part):
+    # type: (braced_var_sub) -> bool
+    if part.token.val == 'BASHPID':
+      return False
+
+    UP_bracket = part.bracket_op
+    if UP_bracket and UP_bracket.tag_() == bracket_op_e.ArrayIndex:
+      index = cast(bracket_op__ArrayIndex, UP_bracket)
+      UP_expr = index.expr
+      if UP_expr.tag_() == arith_expr_e.Word:
+        if not self._Parts(cast(compound_word, UP_expr).parts):
+          return False
+      elif UP_expr.tag_() != arith_expr_e.VarRef:
+        return False
+
+    UP_op = part.suffix_op
+    if UP_op is None:
+      return True
+
+    tag = UP_op.tag_()
+    if tag in (suffix_op_e.Nullary, suffix_op_e.Static):
+      return True
+
+    if tag == suffix_op_e.Unary:
+      op = cast(suffix_op__Unary, UP_op)
+      if op.tok.id in (Id.VTest_Equals, Id.VTest_ColonEquals):
+        return False
+      return self._Word(op.arg_word)
+
+    if tag == suffix_op_e.PatSub:
+      pat_sub = cast(suffix_op__PatSub, UP_op)
+      if not self._Word(pat_sub.pat):
+        return False
+      return pat_sub.replace is None or self._Word(pat_sub.replace)
+
+    return False  # Slice has arithmetic
+
+  def _Word(self, w):
+    # type: (word_t) -> bool
+    UP_w = w
+    tag = w.tag_()
+    if tag == word_e.Compound:
+      return self._Parts(cast(compound_word, UP_w).parts)
+    if tag == word_e.BracedTree:
+      return self._Parts(cast(word__BracedTree, UP_w).parts)
+    return tag == word_e.Empty
+
+  def _Proc(self, proc):
+    # type: (Proc) -> bool
+    body = proc.body
+    if body.tag_() == command_e.LazyBody:
+      lazy = cast(command__LazyBody, body)
+      if lazy.parsed is None:
+        return False  # OSH_LAZY_FUNCS hasn't parsed it yet
+      body = lazy.parsed
+
+    result = self.bodies.get(body)
+    if result is None:
+      self.bodies[body] = True  # a recursive call doesn't change the answer
+      result = self.Command(body, True)
+      self.bodies[body] = result
+    return result
+
+  def _Simple(self, node, in_func):
+    # type: (command__Simple, bool) -> bool
+    if len(node.redirects) or node.block or len(node.words) == 0:
+      return False
+    for pair in node.more_env:
+      if not self._Word(pair.val):
+        return False
+    for w in node.words:
+      if not self._Word(w):
+        return False
+
+    ok, arg0, _ = word_.StaticEval(node.words[0])
+    if not ok:
+      return False
+
+    # Resolve the name the same way RunSimpleCommand() does
+    if consts.LookupAssignBuiltin(arg0) != consts.NO_INDEX:
+      return in_func and arg0 == 'local'
+
+    if consts.LookupSpecialBuiltin(arg0) != consts.NO_INDEX:
+      return arg0 in _CAPTURE_BUILTINS
+
+    proc = self.procs.get(arg0)
+    if proc is not None:
+      return self._Proc(proc)
+
+    if arg0 == 'printf' and len(node.words) > 1:
+      ok, arg1, _ = word_.StaticEval(node.words[1])
+      # printf -v assigns, and %(...)T calls putenv('TZ')
+      if not ok or arg1.startswith('-') or '%(' in arg1:
+        return False
+
+    return arg0 in _CAPTURE_BUILTINS
+
+  def _Commands(self, nodes, in_func):
+    # type: (List[command_t], bool) -> bool
+    for child in nodes:
+      if not self.Command(child, in_func):
+        return False
+    return True
+
+  def Command(self, node, in_func):
+    # type: (command_t, bool) -> bool
+    UP_node = node
+    tag = node.tag_()
+
+    if tag == command_e.Simple:
+      return self._Simple(cast(command__Simple, UP_node), in_func)
+
+    if tag == command_e.Sentence:
+      return self.Command(cast(command__Sentence, UP_node).child, in_func)
+
+    if tag == command_e.CommandList:
+      return self._Commands(cast(command__CommandList, UP_node).children,
+                            in_func)
+
+    if tag == command_e.BraceGroup:
+      brace_group = cast(BraceGroup, UP_node)
+      if len(brace_group.redirects):
+        return False
+      return self._Commands(brace_group.children, in_func)
+
+    if tag == command_e.AndOr:
+      return self._Commands(cast(command__AndOr, UP_node).children, in_func)
+
+    if tag == command_e.If:
+      if_node = cast(command__If, UP_node)
+      if len(if_node.redirects):
+        return False
+      for arm in if_node.arms:
+        if arm.cond.tag_() != condition_e.Shell:
+          return False
+        if not self._Commands(cast(condition__Shell, arm.cond).commands,
+                              in_func):
+          return False
+        if not self._Commands(arm.action, in_func):
+          return False
+      return self._Commands(if_node.else_action, in_func)
+
+    if tag == command_e.Case:
+      case_node = cast(command__Case, UP_node)
+      if len(case_node.redirects) or not self._Word(case_node.to_match):
+        return False
+      for case_arm in case_node.arms:
+        for w in case_arm.pat_list:
+          if not self._Word(w):
+            return False
+        if not self._Commands(case_arm.action, in_func):
+          return False
+      return True
+
+    if tag == command_e.ControlFlow:
+      cflow = cast(command__ControlFlow, UP_node)
+      if not in_func or cflow.token.id != Id.ControlFlow_Return:
+        return False
+      return cflow.arg_word is None or self._Word(cflow.arg_word)
+
+    return tag == command_e.NoOp
+
+  def Check(self, node):
+    # type: (command_t) -> bool
+    """Can the body of a command sub run in the shell process?"""
+    self.bodies.clear()
+    return self.Command(node, False)
+
+
+# Builtins that 'read' from the pipe through FdState.stdin_buf
+_STDIN_BUILTINS = ['read', 'mapfile', 'readarray']
+
+# Builtins that never touch stdin or run other commands
+_NO_STDIN_BUILTINS = [
+    'echo', 'printf', 'true', 'false', ':', 'test', '[', 'shift', 'getopts',
+    'pwd', 'declare', 'typeset', 'local', 'export', 'readonly',
+]
+
+
+class _StdinChecker(object):
+  """Decide whether the last part of a pipeline is the only reader of the pipe.
+
+  Then 'read' and 'mapfile' may read ahead from it, instead of reading a byte
+  at a time.  Any other process that reads the pipe would miss what we read
+  ahead, so nothing else may use stdin: external commands need their own stdin
+  redirect, and commands in child processes, like $(cat) or ( read x ), can't
+  read it at all.  Nothing may duplicate descriptor 0 either, e.g. 3<&0.
+  """
+  def __init__(self, procs):
+    # type: (Dict[str, Proc]) -> None
+    self.procs = procs
+    # Function bodies being checked, or already checked.  Reset for every
+    # pipeline, because functions can be redefined.
+    self.bodies = {}  # type: Dict[command_t, bool]
+    self.forked_bodies = {}  # type: Dict[command_t, bool]
+
+  def _Arith(self, node):
+    # type: (arith_expr_t) -> bool
+    UP_node = node
+    tag = node.tag_()
+
+    if tag == arith_expr_e.VarRef:
+      return True
+
+    if tag == arith_expr_e.Word:
+      return self._Parts(cast(compound_word, UP_node).parts)
+
+    if tag == arith_expr_e.UnaryAssign:
+      return self._Arith(cast(arith_expr__UnaryAssign, UP_node).child)
+
+    if tag == arith_expr_e.BinaryAssign:
+      binary_assign = cast(arith_expr__BinaryAssign, UP_node)
+      return (self._Arith(binary_assign.left) and
+              self._Arith(binary_assign.right))
+
+    if tag == arith_expr_e.Unary:
+      return self._Arith(cast(arith_expr__Unary, UP_node).child)
+
+    if tag == arith_expr_e.Binary:
+      binary = cast(arith_expr__Binary, UP_node)
+      return self._Arith(binary.left) and self._Arith(binary.right)
+
+    if tag == arith_expr_e.TernaryOp:
+      ternary = cast(arith_expr__TernaryOp, UP_node)
+      return (self._Arith(ternary.cond) and self._Arith(ternary.true_expr) and
+              self._Arith(ternary.false_expr))
+
+    return False
+
+  def _Bool(self, node):
+    # type: (bool_expr_t) -> bool
+    UP_node = node
+    tag = node.tag_()
+
+    if tag == bool_expr_e.WordTest:
+      return self._Word(cast(bool_expr__WordTest, UP_node).w)
+
+    if tag == bool_expr_e.Binary:
+      binary = cast(bool_expr__Binary, UP_node)
+      return self._Word(binary.left) and self._Word(binary.right)
+
+    if tag == bool_expr_e.Unary:
+      return self._Word(cast(bool_expr__Unary, UP_node).child)
+
+    if tag == bool_expr_e.LogicalNot:
+      return self._Bool(cast(bool_expr__LogicalNot, UP_node).child)
+
+    if tag == bool_expr_e.LogicalAnd:
+      logical_and = cast(bool_expr__LogicalAnd, UP_node)
+      return self._Bool(logical_and.left) and self._Bool(logical_and.right)
+
+    if tag == bool_expr_e.LogicalOr:
+      logical_or = cast(bool_expr__LogicalOr, UP_node)
+      return self._Bool(logical_or.left) and self._Bool(logical_or.right)
+
+    return False
+
+  def _Parts(self, parts):
+    # type: (List[word_part_t]) -> bool
+    for part in parts:
+      UP_part = part
+      tag = part.tag_()
+
+      if tag in (word_part_e.Literal, word_part_e.EscapedLiteral,
+                 word_part_e.SingleQuoted, word_part_e.TildeSub,
+                 word_part_e.BracedRange, word_part_e.SimpleVarSub):
+        continue
+
+      if tag == word_part_e.DoubleQuoted:
+        if not self._Parts(cast(double_quoted, UP_part).parts):
+          return False
+
+      elif tag == word_part_e.BracedVarSub:
+        if not self._VarSub(cast(braced_var_sub, UP_part)):
+          return False
+
+      elif tag == word_part_e.CommandSub:
+        # Both $(cat) and <(cat) inherit stdin
+        if not self.Command(cast(command_sub, UP_part).child, True):
+          return False
+
+      elif tag == word_part_e.ArithSub:
+        if not self._Arith(cast(word_part__ArithSub, UP_part).anode):
+          return False
+
+      elif tag == word_part_e.BracedTuple:
+        tuple_part = cast(word_part__BracedTuple, UP_part)
+        for w in tuple_part.words:
+          if not self._Parts(w.parts):
+            return False
+
+      elif tag == word_part_e.ExtGlob:
+        eg = cast(word_part__ExtGlob, UP_part)
+        for w in eg.arms:
+          if not self._Parts(w.parts):
+            return False
+
+      else:
+        return False
+
+    return True
+
+  def _VarSub(self, part):
+    # type: (braced_var_sub) -> bool
+    UP_bracket = part.bracket_op
+    if UP_bracket and UP_bracket.tag_() == bracket_op_e.ArrayIndex:
+      if not self._Arith(cast(bracket_op__ArrayIndex, UP_bracket).expr):
+        return False
+
+    UP_op = part.suffix_op
+    if UP_op is None:
+      return True
+
+    tag = UP_op.tag_()
+    if tag in (suffix_op_e.Nullary, suffix_op_e.Static):
+      return True
+
+    if tag == suffix_op_e.Unary:
+      return self._Word(cast(suffix_op__Unary, UP_op).arg_word)
+
+    if tag == suffix_op_e.PatSub:
+      pat_sub = cast(suffix_op__PatSub, UP_op)
+      if not self._Word(pat_sub.pat):
+        return False
+      return pat_sub.replace is None or self._Word(pat_sub.replace)
+
+    if tag == suffix_op_e.Slice:
+      slice_op = cast(suffix_op__Slice, UP_op)
+      if slice_op.begin and not self._Arith(slice_op.begin):
+        return False
+      return slice_op.length is None or self._Arith(slice_op.length)
+
+    return False
+
+  def _Word(self, w):
+    # type: (word_t) -> bool
+    UP_w = w
+    tag = w.tag_()
+    if tag == word_e.Compound:
+      return self._Parts(cast(compound_word, UP_w).parts)
+    if tag == word_e.BracedTree:
+      return self._Parts(cast(word__BracedTree, UP_w).parts)
+    return tag == word_e.Empty
+
+  def _Redirects(self, redirects):
+    # type: (List[redir]) -> bool
+    for r in redirects:
+      if r.loc.tag_() != redir_loc_e.Fd:
+        return False  # {fd}<&0 would be another way to read the pipe
+
+      UP_arg = r.arg
+      if UP_arg.tag_() == redir_param_e.HereDoc:
+        if not self._Parts(cast(redir_param__HereDoc, UP_arg).stdin_parts):
+          return False
+        continue
+
+      arg_word = cast(compound_word, UP_arg)
+      if r.op.id in (Id.Redir_GreatAnd, Id.Redir_LessAnd):
+        ok, fd_str, _ = word_.StaticEval(arg_word)
+        if not ok or fd_str in ('0', '0-'):
+          return False
+      elif not self._Word(arg_word):
+        return False
+    return True
+
+  def _RedirectsStdin(self, redirects):
+    # type: (List[redir]) -> bool
+    for r in redirects:
+      UP_loc = r.loc
+      if (UP_loc.tag_() == redir_loc_e.Fd and
+          cast(redir_loc__Fd, UP_loc).fd == 0):
+        return True
+    return False
+
+  def _Proc(self, proc, forked):
+    # type: (Proc, bool) -> bool
+    body = proc.body
+    if body.tag_() == command_e.LazyBody:
+      lazy = cast(command__LazyBody, body)
+      if lazy.parsed is None:
+        return False  # OSH_LAZY_FUNCS hasn't parsed it yet
+      body = lazy.parsed
+
+    bodies = self.forked_bodies if forked else self.bodies
+    result = bodies.get(body)
+    if result is None:
+      bodies[body] = True  # a recursive call doesn't change the answer
+      result = self.Command(body, forked)
+      bodies[body] = result
+    return result
+
+  def _Simple(self, node, forked):
+    # type: (command__Simple, bool) -> bool
+    if node.block or not self._Redirects(node.redirects):
+      return False
+    for pair in node.more_env:
+      if not self._Word(pair.val):
+        return False
+    for w in node.words:
+      if not self._Word(w):
+        return False
+
+    if len(node.words) == 0 or self._RedirectsStdin(node.redirects):
+      return True  # it doesn't see the pipe
+
+    ok, arg0, _ = word_.StaticEval(node.words[0])
+    if not ok:
+      return False
+
+    # Resolve the name the same way RunSimpleCommand() does
+    if (consts.LookupAssignBuiltin(arg0) == consts.NO_INDEX and
+        consts.LookupSpecialBuiltin(arg0) == consts.NO_INDEX):
+      proc = self.procs.get(arg0)
+      if proc is not None:
+        return self._Proc(proc, forked)
+
+    if arg0 in _STDIN_BUILTINS:
+      return not forked  # a child's read ahead would be lost
+    return arg0 in _NO_STDIN_BUILTINS
+
+  def _Commands(self, nodes, forked):
+    # type: (List[command_t], bool) -> bool
+    for child in nodes:
+      if not self.Command(child, forked):
+        return False
+    return True
+
+  def Check(self, node):
+    # type: (command_t) -> bool
+    """Is the last part of a pipeline the only reader of its stdin?"""
+    self.bodies.clear()
+    self.forked_bodies.clear()
+    return self.Command(node, False)
+
+  def Command(self, node, forked):
+    # type: (command_t, bool) -> bool
+    UP_node = node
+    tag = node.tag_()
+
+    if tag == command_e.Simple:
+      return self._Simple(cast(command__Simple, UP_node), forked)
+
+    if tag == command_e.Sentence:
+      sentence = cast(command__Sentence, UP_node)
+      if sentence.terminator.id == Id.Op_Amp:
+        forked = True
+      return self.Command(sentence.child, forked)
+
+    if tag == command_e.ExpandedAlias:
+      alias = cast(command__ExpandedAlias, UP_node)
+      if not self._Redirects(alias.redirects):
+        return False
+      for pair in alias.more_env:
+        if not self._Word(pair.val):
+          return False
+      return self.Command(alias.child, forked)
+
+    if tag == command_e.ShAssignment:
+      assign = cast(command__ShAssignment, UP_node)
+      if not self._Redirects(assign.redirects):
+        return False
+      for pair in assign.pairs:
+        UP_lhs = pair.lhs
+        if UP_lhs.tag_() == sh_lhs_expr_e.IndexedName:
+          if not self._Arith(cast(sh_lhs_expr__IndexedName, UP_lhs).index):
+            return False
+        if pair.rhs and not self._Word(pair.rhs):
+          return False
+      return True
+
+    if tag == command_e.CommandList:
+      return self._Commands(cast(command__CommandList, UP_node).children,
+                            forked)
+
+    if tag == command_e.DoGroup:
+      return self._Commands(cast(command__DoGroup, UP_node).children, forked)
+
+    if tag == command_e.BraceGroup:
+      brace_group = cast(BraceGroup, UP_node)
+      if not self._Redirects(brace_group.redirects):
+        return False
+      return self._Commands(brace_group.children, forked)
+
+    if tag == command_e.AndOr:
+      return self._Commands(cast(command__AndOr, UP_node).children, forked)
+
+    if tag == command_e.Pipeline:
+      pipeline = cast(command__Pipeline, UP_node)
+      # Only the first part reads our stdin.  It runs in this process if it's
+      # the only part, e.g. ! read x
+      if len(pipeline.children) != 1:
+        forked = True
+      return self.Command(pipeline.children[0], forked)
+
+    if tag == command_e.Subshell:
+      subshell = cast(command__Subshell, UP_node)
+      if not self._Redirects(subshell.redirects):
+        return False
+      return self.Command(subshell.child, True)
+
+    if tag == command_e.If:
+      if_node = cast(command__If, UP_node)
+      if not self._Redirects(if_node.redirects):
+        return False
+      for arm in if_node.arms:
+        if arm.cond.tag_() != condition_e.Shell:
+          return False
+        if not self._Commands(cast(condition__Shell, arm.cond).commands,
+                              forked):
+          return False
+        if not self._Commands(arm.action, forked):
+          return False
+      return self._Commands(if_node.else_action, forked)
+
+    if tag == command_e.Case:
+      case_node = cast(command__Case, UP_node)
+      if (not self._Redirects(case_node.redirects) or
+          not self._Word(case_node.to_match)):
+        return False
+      for case_arm in case_node.arms:
+        for w in case_arm.pat_list:
+          if not self._Word(w):
+            return False
+        if not self._Commands(case_arm.action, forked):
+          return False
+      return True
+
+    if tag == command_e.WhileUntil:
+      while_node = cast(command__WhileUntil, UP_node)
+      if (not self._Redirects(while_node.redirects) or
+          while_node.cond.tag_() != condition_e.Shell):
+        return False
+      if not self._Commands(cast(condition__Shell, while_node.cond).commands,
+                            forked):
+        return False
+      return self.Command(while_node.body, forked)
+
+    if tag == command_e.ForEach:
+      for_each = cast(command__ForEach, UP_node)
+      if not self._Redirects(for_each.redirects):
+        return False
+      for w in for_each.iter_words:
+        if not self._Word(w):
+          return False
+      return self.Command(for_each.body, forked)
+
+    if tag == command_e.ForExpr:
+      for_expr = cast(command__ForExpr, UP_node)
+      if not self._Redirects(for_expr.redirects):
+        return False
+      for anode in [for_expr.init, for_expr.cond, for_expr.update]:
+        if anode and not self._Arith(anode):
+          return False
+      return for_expr.body is None or self.Command(for_expr.body, forked)
+
+    if tag == command_e.DParen:
+      dparen = cast(command__DParen, UP_node)
+      return self._Redirects(dparen.redirects) and self._Arith(dparen.child)
+
+    if tag == command_e.DBracket:
+      dbracket = cast(command__DBracket, UP_node)
+      return self._Redirects(dbracket.redirects) and self._Bool(dbracket.expr)
+
+    if tag == command_e.ControlFlow:
+      cflow = cast(command__ControlFlow, UP_node)
+      return cflow.arg_word is None or self._Word(cflow.arg_word)
+
+    # A function definition could make a later call read stdin
+    return tag == command_e.NoOp
+
+
 class ShellExecutor(vm._Executor):
   """
   An executor combined with the OSH language evaluators in osh/ to create a
@@ -79,6 +737,8 @@ class ShellExecutor(vm._Executor):
     self.fd_state = fd_state
     self.errfmt = errfmt
     self.process_sub_stack = []  # type: List[_ProcessSubFrame]
+    self.capture_checker = _CaptureChecker(procs)
+    self.stdin_checker = _StdinChecker(procs)
 
   def CheckCircularDeps(self):
     # type: () -> None
@@ -319,6 +979,8 @@ class ShellExecutor(vm._Executor):
     last_child = node.children[n-1]
     # Last piece of code is in THIS PROCESS.  'echo foo | read line; echo $line'
     pi.AddLast((self.cmd_ev, last_child))
+    if n > 1 and self.stdin_checker.Check(last_child):
+      pi.Init_BufferStdin()  # e.g. seq 3 | while read x; do echo $x; done
     status_out.spids.append(location.SpanForCommand(last_child))
 
     with dev.ctx_Tracer(self.tracer, 'pipeline', None):
@@ -343,40 +1005,33 @@ class ShellExecutor(vm._Executor):
 
     node = cs_part.child
 
-    # Hack for weird $(<file) construct
+    # The weird $(<file) construct reads the file in this process
+    read_file = None  # type: redir
     if node.tag_() == command_e.Simple:
       simple = cast(command__Simple, node)
-      # Detect '< file'
-      if (len(simple.words) == 0 and
-          len(simple.redirects) == 1 and
-          simple.redirects[0].op.id == Id.Redir_Less):
-        # change it to __cat < file
-        # note: cmd_eval.py _Dispatch works around lack of spid
-        tok = Token(Id.Lit_Chars, runtime.NO_SPID, '__cat')
-        cat_word = compound_word([tok])
-        # MUTATE the command.Simple node.  This will only be done the first
-        # time in the parent process.
-        simple.words.append(cat_word)
-
-    p = self._MakeProcess(node,
-                          inherit_errexit=self.exec_opts.inherit_errexit())
-
-    r, w = posix.pipe()
-    p.AddStateChange(process.StdoutToPipe(r, w))
-
-    _ = p.Start(trace.CommandSub())
-    #log('Command sub started %d', pid)
-
-    chunks = []  # type: List[str]
-    posix.close(w)  # not going to write
-    while True:
-      byte_str = posix.read(r, 4096)
-      if len(byte_str) == 0:
-        break
-      chunks.append(byte_str)
-    posix.close(r)
-
-    status = p.Wait(self.waiter)
+      # Detect '< file', but not '3< file', which yields an empty string
+      if len(simple.words) == 0 and len(simple.redirects) == 1:
+        r = simple.redirects[0]
+        UP_loc = r.loc
+        if (r.op.id == Id.Redir_Less and
+            UP_loc.tag_() == redir_loc_e.Fd and
+            cast(redir_loc__Fd, UP_loc).fd == 0):
+          read_file = r
+
+    # $(echo hi) and $(myfunc) don't need a child process when nothing can
+    # escape it.  See _CaptureChecker.
+    in_process = False
+    if mylib.PYTHON:
+      # The child would turn errexit off
+      if not self.exec_opts.errexit() or self.exec_opts.inherit_errexit():
+        in_process = self.capture_checker.Check(node)
+
+    if read_file:
+      status, stdout_str = self._ReadFileForCommandSub(read_file)
+    elif in_process:
+      status, stdout_str = self._RunCommandSubInProcess(node)
+    else:
+      status, stdout_str = self._ForkCommandSub(node)
 
     # OSH has the concept of aborting in the middle of a WORD.  We're not
     # waiting until the command is over!
@@ -402,7 +1057,80 @@ class ShellExecutor(vm._Executor):
     # Runtime errors test case: # $("echo foo > $@")
     # Why rstrip()?
     # https://unix.stackexchange.com/questions/17747/why-does-shell-command-substitution-gobble-up-a-trailing-newline-char
-    return ''.join(chunks).rstrip('\n')
+    # It returns the same string when read_to_eof() already stripped it.
+    return stdout_str.rstrip('\n')
+
+  def _ReadFileForCommandSub(self, r):
+    # type: (redir) -> Tuple[int, str]
+    """Read the file for $(< file).
+
+    Errors are reported like they are for the 'cat < file' that other shells
+    fork.
+    """
+    try:
+      result = self.cmd_ev.EvalRedirect(r)
+    except error.RedirectEval as e:
+      self.errfmt.PrettyPrintError(e)
+      return 1, ''
+    path = cast(redirect_arg__Path, result.arg).filename
+
+    try:
+      fd = posix.open(path, posix.O_RDONLY, 0)
+    except OSError as e:
+      self.errfmt.Print_("Can't open %r: %s" % (path, pyutil.strerror(e)),
+                         span_id=r.op.span_id)
+      return 1, ''
+
+    status = 0
+    contents = ''
+    try:
+      contents = posix.read_to_eof(fd, True)
+    except OSError as e:  # e.g. EISDIR
+      stderr_line('osh I/O error: %s', pyutil.strerror(e))
+      status = 2
+    posix.close(fd)
+
+    return status, contents
+
+  def _ForkCommandSub(self, node):
+    # type: (command_t) -> Tuple[int, str]
+    p = self._MakeProcess(node,
+                          inherit_errexit=self.exec_opts.inherit_errexit())
+
+    r, w = posix.pipe()
+    p.AddStateChange(process.StdoutToPipe(r, w))
+
+    _ = p.Start(trace.CommandSub())
+    #log('Command sub started %d', pid)
+
+    posix.close(w)  # not going to write
+    # One growing buffer, with trailing newlines already stripped
+    stdout_str = posix.read_to_eof(r, True)
+    posix.close(r)
+
+    status = p.Wait(self.waiter)
+    return status, stdout_str
+
+  def _RunCommandSubInProcess(self, node):
+    # type: (command_t) -> Tuple[int, str]
+    """Run the command sub with sys.stdout swapped for a buffer.
+
+    Errors are handled like they are in a child process.  $? is restored,
+    since the child can't change it.
+    """
+    last_status = self.mem.LastStatus()
+    buf = mylib.BufWriter()
+
+    saved_stdout = sys.stdout
+    sys.stdout = buf
+    try:
+      self.cmd_ev.ExecuteAndCatch(node)
+    finally:
+      sys.stdout = saved_stdout
+
+    status = self.cmd_ev.LastStatus()
+    self.mem.SetLastStatus(last_status)
+    return status, buf.getvalue()
 
   def RunProcessSub(self, cs_part):
     # type: (command_sub) -> str
@@ -4,6 +4,8 @@ main_loop.py
 Variants:
   main_loop.Interactive()    calls ParseInteractiveLine() and ExecuteAndCatch()
   main_loop.Batch()          calls ParseLogicalLine() and ExecuteAndCatch()
+  main_loop.BatchNodes()     calls ExecuteAndCatch() on already parsed nodes,
+                                   e.g. from core/parse_cache.py
   main_loop.Headless()       calls Batch() like eval and source. 
                                    We want 'echo 1\necho 2\n' to work, so we 
                                    don't bother with "the PS2 problem".
@@ -32,6 +34,7 @@ from typing import cast, Any, List, TYPE_CHECKING
 if TYPE_CHECKING:
   from core.alloc import Arena
   from core.comp_ui import _IDisplay
+  from core.state import Mem
   from core.ui import ErrorFormatter
   from frontend import parse_lib
   from osh.cmd_parse import CommandParser
@@ -81,6 +84,31 @@ class ctx_Descriptors(object):
     posix.close(self.fds[2])
 
 
+class Segment(object):
+  """The lines and spans allocated for a top-level command or 'eval'.
+
+  Call Reclaim() after the command has run and its errors have been reported.
+  Lines and spans referenced by function definitions and the like are pinned,
+  and aren't freed.  See Arena.Pin().
+  """
+  def __init__(self, arena, mem):
+    # type: (Arena, Mem) -> None
+    self.arena = arena
+    self.mem = mem
+    self.line_id = arena.LastLineId()
+    self.span_id = arena.LastSpanId()
+    self.current_spid = mem.CurrentSpanId()
+
+  def Reclaim(self):
+    # type: () -> None
+    self.arena.Reclaim(self.line_id, self.span_id)
+
+    # Don't leave $LINENO pointing at a span that was freed.  This may restore
+    # NO_SPID, which SetCurrentSpanId() doesn't accept.
+    if self.mem.CurrentSpanId() >= self.arena.LastSpanId():
+      self.mem.current_spid = self.current_spid
+
+
 if mylib.PYTHON:
   import fanos
 
@@ -133,7 +161,9 @@ if mylib.PYTHON:
       c_parser = self.parse_ctx.MakeOshParser(line_reader)
 
       # Status is unused; $_ can be queried by the headless client
+      seg = Segment(self.parse_ctx.arena, self.cmd_ev.mem)
       unused_status = Batch(self.cmd_ev, c_parser, self.parse_ctx.arena, 0)
+      seg.Reclaim()
 
       return ''  # result is always 'OK ' since there was no protocol error
 
@@ -204,6 +234,8 @@ if mylib.PYTHON:
       # - display.EraseLines() needs to be called BEFORE displaying anything, so
       # it appears in all branches.
 
+      seg = Segment(cmd_ev.arena, cmd_ev.mem)
+
       while True:  # ONLY EXECUTES ONCE
         prompt_plugin.Run()
         try:
@@ -271,6 +303,9 @@ if mylib.PYTHON:
 
       display.Reset()  # clears dupes and number of lines last displayed
 
+      # Errors have been printed, so we can free what the command used.
+      seg.Reclaim()
+
       # TODO: Replace this with a shell hook?  with 'trap', or it could be just
       # like command_not_found.  The hook can be 'echo $?' or something more
       # complicated, i.e. with timetamps.
@@ -330,15 +365,29 @@ def Batch(cmd_ev, c_parser, arena, cmd_flags=0):
   return status
 
 
-def ParseWholeFile(c_parser):
-  # type: (CommandParser) -> command_t
-  """Parse an entire shell script.
+def BatchNodes(cmd_ev, nodes, cmd_flags=0):
+  # type: (CommandEvaluator, List[command_t], int) -> int
+  """Like Batch(), but for a file that was already parsed.
 
-  This uses the same logic as Batch().  Used by:
-  - osh -n
-  - oshc translate
-  - Used by 'trap' to store code.  But 'source' and 'eval' use Batch().
+  Used with core/parse_cache.py.  Like Batch(), the last node of the main
+  program gets the Optimize flag.
   """
+  status = 0
+  n = len(nodes)
+  for i, node in enumerate(nodes):
+    flags = cmd_flags
+    if cmd_flags & cmd_eval.IsMainProgram and i == n - 1:
+      flags |= cmd_eval.Optimize
+    is_return, is_fatal = cmd_ev.ExecuteAndCatch(node, cmd_flags=flags)
+    status = cmd_ev.LastStatus()
+    if is_return or is_fatal:
+      break
+  return status
+
+
+def ParseNodes(c_parser):
+  # type: (CommandParser) -> List[command_t]
+  """Parse an entire shell script into a list of top-level commands."""
   children = []  # type: List[command_t]
   while True:
     node = c_parser.ParseLogicalLine()  # can raise ParseError
@@ -346,7 +395,19 @@ def ParseWholeFile(c_parser):
       c_parser.CheckForPendingHereDocs()  # can raise ParseError
       break
     children.append(node)
+  return children
+
+
+def ParseWholeFile(c_parser):
+  # type: (CommandParser) -> command_t
+  """Parse an entire shell script.
 
+  This uses the same logic as Batch().  Used by:
+  - osh -n
+  - oshc translate
+  - Used by 'trap' to store code.  But 'source' and 'eval' use Batch().
+  """
+  children = ParseNodes(c_parser)
   if len(children) == 1:
     return children[0]
   else:
@@ -0,0 +1,411 @@
+#!/usr/bin/env python2
+"""
+parse_cache.py - Persistent cache of the LST for 'source'd files and scripts.
+
+It's opt-in: set OSH_PARSE_CACHE_DIR to a writable directory.
+
+An entry is keyed by the file's absolute path, size, and mtime, the OSH
+version, the current parse options, and the aliases if they're expanded.  It
+stores:
+
+1. The physical lines and line_spans the parser added to the Arena.
+2. The top-level command_t nodes, flattened to tuples of
+   (class index, field values ...).
+
+Everything is written with marshal, which is builtin to the interpreter (unlike
+pickle).  Span IDs are stored relative to the first span of the file.  On a
+hit, we add the lines and spans to the Arena, and shift the span IDs while
+rebuilding the nodes, so error locations still point into the file.
+
+On a miss, we parse the whole file up front.  Files that depend on parse-time
+state that can change as they run (alias, unalias, shopt -s parse_*) aren't
+cached, because main_loop.Batch() parses them one line at a time.  We write a
+negative entry for them (and for files with parse errors), so the next run
+goes straight to Batch().
+
+TODO: Could store the file's hash too, for file systems with coarse mtimes.
+"""
+from __future__ import print_function
+
+import marshal
+import stat
+import sys
+
+from _devbuild.gen.syntax_asdl import (
+    command_t, command__ExpandedAlias, command__Simple
+)
+from asdl import pybase
+from asdl import runtime
+from core import error
+from core import main_loop
+from core.pyerror import log
+from frontend import option_def
+from frontend import reader
+from osh import word_
+from pylib import os_path
+
+import posix_ as posix
+
+from typing import List, Dict, Tuple, Optional, Any, IO, TYPE_CHECKING
+if TYPE_CHECKING:
+  from core.util import _DebugFile
+  from frontend.parse_lib import ParseContext
+
+_ = log
+
+# Bump this when the encoding changes.  The OSH version is also part of the
+# key, so changes to the LST schema don't need a bump.
+_MAGIC = 'OSH-LST-1'
+
+# Builtins that change how LATER lines are parsed.
+_ALIAS_BUILTINS = ('alias', 'unalias')
+_OPTION_BUILTINS = ('shopt', 'set')
+
+_PARSE_OPT_NAMES = option_def.ParseOptNames()
+
+
+def _IsSpanField(name):
+  # type: (str) -> bool
+  """Does this LST field hold a span ID?  See frontend/syntax.asdl."""
+  return (name in ('span_id', 'spid', 'here_end_span_id') or
+          name.endswith('_spid'))
+
+
+# Field kinds, computed once per class
+_PLAIN = 0
+_SPAN = 1
+_SPAN_LIST = 2
+
+
+def _FieldKinds(cls):
+  # type: (Any) -> List[int]
+  kinds = []  # type: List[int]
+  if issubclass(cls, pybase.SimpleObj):
+    return kinds
+  for name in cls.__slots__:
+    if name == 'spids':
+      kinds.append(_SPAN_LIST)
+    elif _IsSpanField(name):
+      kinds.append(_SPAN)
+    else:
+      kinds.append(_PLAIN)
+  return kinds
+
+
+class _Uncacheable(Exception):
+  """Raised while encoding an LST that can't be cached."""
+  pass
+
+
+class _Encoder(object):
+  """Flatten LST nodes to marshal-able values.
+
+  Span IDs become relative to span_start.
+  """
+
+  def __init__(self, span_start, span_end):
+    # type: (int, int) -> None
+    self.span_start = span_start
+    self.span_end = span_end
+
+    self.classes = []  # type: List[Tuple[str, str]]
+    self.class_index = {}  # type: Dict[Any, int]
+    self.class_kinds = {}  # type: Dict[Any, List[int]]
+
+  def _ClassIndex(self, cls):
+    # type: (Any) -> int
+    i = self.class_index.get(cls)
+    if i is None:
+      i = len(self.classes)
+      self.classes.append((cls.__module__, cls.__name__))
+      self.class_index[cls] = i
+      self.class_kinds[cls] = _FieldKinds(cls)
+    return i
+
+  def _SpanId(self, span_id):
+    # type: (int) -> int
+    if span_id == runtime.NO_SPID:
+      return span_id
+    if not (self.span_start <= span_id < self.span_end):
+      # e.g. a node that points into the caller's code
+      raise _Uncacheable('span ID %d out of range' % span_id)
+    return span_id - self.span_start
+
+  def _CheckSimple(self, node):
+    # type: (command__Simple) -> None
+    if len(node.words) == 0:
+      return
+    ok, name, _ = word_.StaticEval(node.words[0])
+    if not ok:
+      return
+
+    if name in _ALIAS_BUILTINS:
+      raise _Uncacheable(name)
+
+    if name in _OPTION_BUILTINS:
+      for w in node.words[1:]:
+        ok, arg, _ = word_.StaticEval(w)
+        if not ok:
+          if name == 'shopt':  # 'set -- $x' is common and harmless
+            raise _Uncacheable('shopt with dynamic arg')
+          continue
+        if arg in _PARSE_OPT_NAMES or arg in option_def.META_OPTIONS:
+          raise _Uncacheable('%s %s' % (name, arg))
+
+  def Encode(self, obj):
+    # type: (Any) -> Any
+    if obj is None or isinstance(obj, (bool, str, float)):
+      return obj
+
+    if isinstance(obj, pybase.SimpleObj):
+      return (self._ClassIndex(obj.__class__), int(obj))
+
+    if isinstance(obj, (int, long)):
+      return obj
+
+    if isinstance(obj, list):
+      return [self.Encode(item) for item in obj]
+
+    if not isinstance(obj, pybase.CompoundObj):
+      raise _Uncacheable('unexpected value %r' % obj)
+
+    if isinstance(obj, command__ExpandedAlias):
+      raise _Uncacheable('alias expansion')
+    if isinstance(obj, command__Simple):
+      self._CheckSimple(obj)
+
+    cls = obj.__class__
+    i = self._ClassIndex(cls)
+    kinds = self.class_kinds[cls]
+
+    fields = [i]  # type: List[Any]
+    for name, kind in zip(cls.__slots__, kinds):
+      val = getattr(obj, name)
+      if kind == _SPAN and val is not None:
+        fields.append(self._SpanId(val))
+      elif kind == _SPAN_LIST:
+        fields.append([self._SpanId(s) for s in val])
+      else:
+        fields.append(self.Encode(val))
+    return tuple(fields)
+
+
+class _Decoder(object):
+  """Rebuild LST nodes, shifting span IDs by span_base."""
+
+  def __init__(self, classes, span_base):
+    # type: (List[Tuple[str, str]], int) -> None
+    self.span_base = span_base
+
+    self.classes = []  # type: List[Any]
+    self.class_kinds = []  # type: List[List[int]]
+    for mod_name, cls_name in classes:
+      cls = getattr(sys.modules[mod_name], cls_name)
+      self.classes.append(cls)
+      self.class_kinds.append(_FieldKinds(cls))
+
+  def _SpanId(self, span_id):
+    # type: (int) -> int
+    if span_id == runtime.NO_SPID:
+      return span_id
+    return span_id + self.span_base
+
+  def Decode(self, obj):
+    # type: (Any) -> Any
+    if isinstance(obj, tuple):
+      cls = self.classes[obj[0]]
+      if issubclass(cls, pybase.SimpleObj):
+        return cls(obj[1])
+
+      node = cls.__new__(cls)
+      kinds = self.class_kinds[obj[0]]
+      for i, name in enumerate(cls.__slots__):
+        val = obj[i + 1]
+        kind = kinds[i]
+        if kind == _SPAN and val is not None:
+          val = self._SpanId(val)
+        elif kind == _SPAN_LIST:
+          val = [self._SpanId(s) for s in val]
+        else:
+          val = self.Decode(val)
+        setattr(node, name, val)
+      return node
+
+    if isinstance(obj, list):
+      return [self.Decode(item) for item in obj]
+
+    return obj
+
+
+class ParseCache(object):
+  """Load and store parsed files in a directory."""
+
+  def __init__(self, cache_dir, version_str, parse_ctx, debug_f):
+    # type: (str, str, ParseContext, _DebugFile) -> None
+    self.cache_dir = cache_dir
+    self.version_str = version_str
+    self.parse_ctx = parse_ctx
+    self.arena = parse_ctx.arena
+    self.debug_f = debug_f
+
+  def _CachePath(self, abs_path):
+    # type: (str) -> str
+    # Flatten /home/andy/lib.sh to %home%andy%lib.sh
+    return os_path.join(self.cache_dir, abs_path.replace('/', '%') + '.lst')
+
+  def _Key(self, abs_path, f):
+    # type: (str, IO[str]) -> Optional[Tuple[Any, ...]]
+    st = posix.fstat(f.fileno())
+    if not stat.S_ISREG(st.st_mode):  # e.g. osh <(echo hi)
+      return None
+    parse_opts = self.parse_ctx.parse_opts
+    opts = tuple(getattr(parse_opts, name)() for name in _PARSE_OPT_NAMES)
+    # The same file parses differently after 'alias' in the sourcing script.
+    aliases = ()  # type: Tuple[Tuple[str, str], ...]
+    if parse_opts.expand_aliases():
+      aliases = tuple(sorted(self.parse_ctx.aliases.items()))
+    return (abs_path, st.st_size, st.st_mtime, self.version_str, opts, aliases)
+
+  def _ReadEntry(self, cache_path):
+    # type: (str) -> Optional[Tuple[Any, Any]]
+    try:
+      with open(cache_path, 'rb') as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+          return None
+        return marshal.load(f)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+      return None
+
+  def _WriteEntry(self, cache_path, key, payload):
+    # type: (str, Tuple[Any, ...], Any) -> None
+    tmp_path = '%s.%d' % (cache_path, posix.getpid())
+    try:
+      try:
+        posix.mkdir(self.cache_dir, 0o755)
+      except OSError:
+        pass  # usually EEXIST; the open() below reports anything else
+      with open(tmp_path, 'wb') as f:
+        f.write(_MAGIC)
+        marshal.dump((key, payload), f)
+      posix.rename(tmp_path, cache_path)  # atomic
+    except (IOError, OSError, ValueError) as e:
+      # ValueError: marshal's nesting limit
+      self.debug_f.log('parse cache: error writing %r: %s', cache_path, e)
+      try:
+        posix.unlink(tmp_path)
+      except OSError:
+        pass
+
+  def _Load(self, payload):
+    # type: (Any) -> List[command_t]
+    arena = self.arena
+    lines, line_nums, line_srcs, spans, classes, nodes = payload
+
+    line_base = arena.LastLineId()
+    span_base = arena.LastSpanId()
+    decoder = _Decoder(classes, span_base)
+
+    # The enclosing ctx_Location() pushed the source of the file itself.
+    for line, line_num, src in zip(lines, line_nums, line_srcs):
+      if src is None:
+        arena.AddLine(line, line_num)
+      else:
+        # e.g. source.Backticks for lines that were re-parsed
+        arena.PushSource(decoder.Decode(src))
+        arena.AddLine(line, line_num)
+        arena.PopSource()
+
+    n = len(spans)
+    i = 0
+    while i < n:
+      arena.AddLineSpan(line_base + spans[i], spans[i+1], spans[i+2])
+      i += 3
+
+    return decoder.Decode(nodes)
+
+  def _Encode(self, line_start, span_start, nodes):
+    # type: (int, int, List[command_t]) -> Any
+    arena = self.arena
+    line_end = arena.LastLineId()
+    span_end = arena.LastSpanId()
+    encoder = _Encoder(span_start, span_end)
+
+    enc_nodes = encoder.Encode(nodes)
+
+    file_src = arena.GetLineSource(line_start) if line_end > line_start else None
+    lines = []  # type: List[str]
+    line_nums = []  # type: List[int]
+    line_srcs = []  # type: List[Any]
+    for line_id in xrange(line_start, line_end):
+      lines.append(arena.GetLine(line_id))
+      line_nums.append(arena.GetLineNumber(line_id))
+      src = arena.GetLineSource(line_id)
+      line_srcs.append(None if src is file_src else encoder.Encode(src))
+
+    spans = []  # type: List[int]
+    for span_id in xrange(span_start, span_end):
+      span = arena.GetLineSpan(span_id)
+      if not (line_start <= span.line_id < line_end):
+        raise _Uncacheable('span %d points outside the file' % span_id)
+      spans.append(span.line_id - line_start)
+      spans.append(span.col)
+      spans.append(span.length)
+
+    return (lines, line_nums, line_srcs, spans, encoder.classes, enc_nodes)
+
+  def _ParseWholeFile(self, f):
+    # type: (IO[str]) -> Tuple[Optional[List[command_t]], Any]
+    """Returns nodes to execute, and the payload to store."""
+    arena = self.arena
+    line_start = arena.LastLineId()
+    span_start = arena.LastSpanId()
+
+    line_reader = reader.FileReader(f, arena)
+    c_parser = self.parse_ctx.MakeOshParser(line_reader)
+    c_parser.Init_LazyFuncs(False)  # LazyBody line IDs aren't encoded
+    try:
+      nodes = main_loop.ParseNodes(c_parser)
+    except error.Parse:
+      # main_loop.Batch() will run the lines before the error, then report it.
+      self.debug_f.log('parse cache: parse error, not caching')
+      return None, None
+
+    try:
+      payload = self._Encode(line_start, span_start, nodes)
+    except (_Uncacheable, RuntimeError) as e:  # RuntimeError: deep recursion
+      self.debug_f.log('parse cache: not caching: %s', e)
+      return None, None
+
+    return nodes, payload
+
+  def Parse(self, path, f):
+    # type: (str, IO[str]) -> Optional[List[command_t]]
+    """Return the top-level nodes of the file, or None to use Batch().
+
+    Must be called inside alloc.ctx_Location() for the file.  If it returns
+    None, f is positioned at the start again.
+    """
+    abs_path = os_path.abspath(path)
+    try:
+      key = self._Key(abs_path, f)
+    except OSError:
+      return None
+    if key is None:
+      return None
+    cache_path = self._CachePath(abs_path)
+
+    entry = self._ReadEntry(cache_path)
+    if entry is not None and entry[0] == key:
+      payload = entry[1]
+      if payload is None:
+        self.debug_f.log('parse cache: %r is not cacheable', path)
+        return None
+      self.debug_f.log('parse cache: hit %r', path)
+      return self._Load(payload)
+
+    self.debug_f.log('parse cache: miss %r', path)
+    nodes, payload = self._ParseWholeFile(f)
+    self._WriteEntry(cache_path, key, payload)
+    if nodes is None:
+      f.seek(0)
+    return nodes
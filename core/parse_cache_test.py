@@ -0,0 +1,127 @@
+#!/usr/bin/env python2
+"""
+parse_cache_test.py: Tests for parse_cache.py
+"""
+
+import shutil
+import tempfile
+import unittest
+
+from _devbuild.gen.id_kind_asdl import Id
+from _devbuild.gen.syntax_asdl import command_e, source, source_e, Token
+from core import alloc
+from core import parse_cache  # module under test
+from core import test_lib
+from core import util
+from pylib import os_path
+
+
+def _TokenText(arena, tok):
+  span = arena.GetLineSpan(tok.span_id)
+  line = arena.GetLine(span.line_id)
+  return line[span.col : span.col + span.length]
+
+
+def _SpanToken(span_id):
+  return Token(Id.Unknown_Tok, span_id, None)
+
+
+class ParseCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.cache_dir = os_path.join(self.tmp_dir, 'cache')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def _MakeFile(self, name, contents):
+    path = os_path.join(self.tmp_dir, name)
+    with open(path, 'w') as f:
+      f.write(contents)
+    return path
+
+  def _Parse(self, arena, path, aliases=None):
+    parse_ctx = test_lib.InitParseContext(arena=arena, aliases=aliases)
+    cache = parse_cache.ParseCache(self.cache_dir, '0.0.0', parse_ctx,
+                                   util.NullDebugFile())
+    with open(path) as f:
+      with alloc.ctx_Location(arena, source.MainFile(path)):
+        nodes = cache.Parse(path, f)
+      pos = f.tell()
+    return nodes, pos
+
+  def testMissThenHit(self):
+    path = self._MakeFile('lib.sh', 'echo hi\nf() {\n  echo `date` $x\n}\n')
+
+    arena1 = test_lib.MakeArena('<one>')
+    nodes1, _ = self._Parse(arena1, path)
+    self.assertEqual(2, len(nodes1))
+
+    # Another process: spans are added at different offsets
+    arena2 = test_lib.MakeArena('<two>')
+    arena2.AddLine('unrelated', 1)
+    arena2.AddLineSpan(0, 0, 3)
+    nodes2, _ = self._Parse(arena2, path)
+
+    self.assertEqual(2, len(nodes2))
+    self.assertEqual(command_e.Simple, nodes2[0].tag_())
+    self.assertEqual(command_e.ShFunction, nodes2[1].tag_())
+    test_lib.AssertAsdlEqual(self, nodes1[0], nodes2[0])
+
+    # The span IDs point at the right text in the new arena.
+    tok = nodes2[0].words[0].parts[0]
+    self.assertEqual('echo', tok.val)
+    self.assertEqual('echo', _TokenText(arena2, tok))
+    self.assertEqual(1, arena2.GetLineNumber(
+        arena2.GetLineSpan(tok.span_id).line_id))
+
+    self.assertEqual(path, arena2.GetLineSource(1).path)
+
+    # 4 lines in the file, and the re-parsed backticks on line 3
+    self.assertEqual(6, arena2.LastLineId())
+    src = arena2.GetLineSource(4)
+    self.assertEqual(source_e.Backticks, src.tag_())
+    self.assertEqual('`', _TokenText(arena2, _SpanToken(src.left_spid)))
+
+  def testInvalidatedByChange(self):
+    path = self._MakeFile('lib.sh', 'echo one\n')
+    nodes, _ = self._Parse(test_lib.MakeArena('<test>'), path)
+    self.assertEqual(1, len(nodes))
+
+    self._MakeFile('lib.sh', 'echo one; echo two\necho three\n')
+    arena = test_lib.MakeArena('<test>')
+    nodes, _ = self._Parse(arena, path)
+    self.assertEqual(2, len(nodes))
+
+  def testInvalidatedByAlias(self):
+    path = self._MakeFile('lib.sh', 'greet world\n')
+    nodes, _ = self._Parse(test_lib.MakeArena('<test>'), path)
+    self.assertEqual(command_e.Simple, nodes[0].tag_())
+
+    # Not the cached entry.  The expansion is parsed from outside the file, so
+    # main_loop.Batch() parses it.
+    aliases = {'greet': 'echo ALIAS'}
+    for i in xrange(2):
+      nodes, _ = self._Parse(test_lib.MakeArena('<test>'), path,
+                             aliases=aliases)
+      self.assertEqual(None, nodes)
+
+    nodes, _ = self._Parse(test_lib.MakeArena('<test>'), path)
+    self.assertEqual(command_e.Simple, nodes[0].tag_())
+
+  def testNotCacheable(self):
+    for contents in [
+        'alias ll="ls -l"\nll\n',
+        'shopt -s parse_paren\nif (x) { echo hi }\n',
+        'echo hi\nif then\n',  # parse error
+    ]:
+      path = self._MakeFile('lib.sh', contents)
+      for i in xrange(2):
+        nodes, pos = self._Parse(test_lib.MakeArena('<test>'), path)
+        self.assertEqual(None, nodes)
+        self.assertEqual(0, pos)  # rewound for main_loop.Batch()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -69,6 +69,11 @@ NO_FD = -1
 # bookkeeping), and dash/zsh (10) and mksh (24)
 _SHELL_MIN_FD = 100
 
+# Here docs up to this size are written directly to a pipe, like dash does.
+# The write can't block, because every pipe buffer is at least this big.
+# Bigger ones go in a temp file, so we never need a process to write them.
+PIPE_SIZE = 4096
+
 
 def SaveFd(fd):
   # type: (int) -> int
@@ -85,10 +90,10 @@ class _RedirFrame(object):
 
 
 class _FdFrame(object):
-  def __init__(self):
-    # type: () -> None
+  def __init__(self, stdin_buf):
+    # type: (Optional[StdinBuffer]) -> None
     self.saved = []  # type: List[_RedirFrame]
-    self.need_wait = []  # type: List[Process]
+    self.stdin_buf = stdin_buf  # restored on Pop()
 
   def Forget(self):
     # type: () -> None
@@ -98,13 +103,73 @@ class _FdFrame(object):
         posix.close(rf.saved_fd)
 
     del self.saved[:]  # like list.clear() in Python 3.3
-    del self.need_wait[:]
+
+  def RestoresStdin(self):
+    # type: () -> bool
+    for rf in self.saved:
+      if rf.orig_fd == 0:
+        return True
+    return False
 
   def __repr__(self):
     # type: () -> str
     return '<_FdFrame %s>' % self.saved
 
 
+class StdinBuffer(object):
+  """Input that 'read' and 'mapfile' read ahead from a pipe on stdin.
+
+  Reading a pipe a byte at a time is slow, but reading ahead takes data away
+  from every other reader of the pipe.  So this is only used when the shell is
+  the only reader.  See Pipeline.Run().
+  """
+  def __init__(self, fd):
+    # type: (int) -> None
+    self.fd = fd
+    self.buf = ''
+    self.pos = 0  # the data before this has been consumed
+
+  def HasData(self):
+    # type: () -> bool
+    return self.pos < len(self.buf)
+
+  def NumUnread(self):
+    # type: () -> int
+    return len(self.buf) - self.pos
+
+  def _Fill(self):
+    # type: () -> bool
+    """Read another block, returning False at EOF."""
+    self.buf = posix.read(self.fd, PIPE_SIZE)
+    self.pos = 0
+    return len(self.buf) != 0
+
+  def ReadRecord(self, delim_char):
+    # type: (str) -> str
+    """Read up to and including delim_char, or until EOF."""
+    chunks = []  # type: List[str]
+    while True:
+      i = self.buf.find(delim_char, self.pos)
+      if i != -1:
+        chunks.append(self.buf[self.pos:i+1])
+        self.pos = i + 1
+        break
+      chunks.append(self.buf[self.pos:])
+      if not self._Fill():
+        break
+    return ''.join(chunks)
+
+  def Read(self, n):
+    # type: (int) -> str
+    """Read up to n bytes.  Like posix.read(), it returns '' at EOF."""
+    if not self.HasData() and not self._Fill():
+      return ''
+    end = min(self.pos + n, len(self.buf))
+    s = self.buf[self.pos:end]
+    self.pos = end
+    return s
+
+
 class FdState(object):
   """This is for the current process, as opposed to child processes.
 
@@ -115,15 +180,19 @@ class FdState(object):
     """
     Args:
       errfmt: for errors
-      job_state: For keeping track of _HereDocWriterThunk
+      job_state: For keeping track of processes to wait for
+      mem: For $TMPDIR, and descriptors stored in variables like {fd}
     """
     self.errfmt = errfmt
     self.job_state = job_state
-    self.cur_frame = _FdFrame()  # for the top level
+    self.cur_frame = _FdFrame(None)  # for the top level
     self.stack = [self.cur_frame]
     self.mem = mem
     self.tracer = tracer
     self.waiter = waiter
+    self.num_here_docs = 0  # for unique temp file names
+    # Set while stdin is a pipe that only the shell reads
+    self.stdin_buf = None  # type: Optional[StdinBuffer]
 
   def Open(self, path):
     # type: (str) -> mylib.LineReader
@@ -294,9 +363,37 @@ class FdState(object):
     # type: (int) -> None
     self.cur_frame.saved.append(_RedirFrame(NO_FD, fd, False))
 
-  def _PushWait(self, proc):
-    # type: (Process) -> None
-    self.cur_frame.need_wait.append(proc)
+  def _HereDocFile(self, body):
+    # type: (str) -> int
+    """Write a here doc to a temp file, and return a descriptor to read it.
+
+    The file is unlinked before we return, so nothing is left behind.
+    """
+    tmp_dir = None  # type: Optional[str]
+    if self.mem:
+      tmp_dir = state.MaybeString(self.mem, 'TMPDIR')
+    if not tmp_dir:
+      tmp_dir = '/tmp'
+
+    mode = posix.O_CREAT | posix.O_EXCL | posix.O_WRONLY
+    while True:
+      self.num_here_docs += 1
+      path = '%s/osh-here-doc-%d-%d' % (tmp_dir, posix.getpid(),
+                                        self.num_here_docs)
+      try:
+        write_fd = posix.open(path, mode, 0o600)
+        break
+      except OSError as e:
+        if e.errno != errno_.EEXIST:  # left by another process with our PID
+          raise
+
+    try:
+      posix.write(write_fd, body)
+      read_fd = posix.open(path, posix.O_RDONLY, 0)
+    finally:
+      posix.close(write_fd)
+      posix.unlink(path)
+    return read_fd
 
   def _ApplyRedirect(self, r):
     # type: (redirect) -> None
@@ -382,48 +479,41 @@ class FdState(object):
       elif case(redirect_arg_e.HereDoc):
         arg = cast(redirect_arg__HereDoc, UP_arg)
 
-        # NOTE: Do these descriptors have to be moved out of the range 0-9?
-        read_fd, write_fd = posix.pipe()
-
-        self._PushDup(read_fd, r.loc)  # stdin is now the pipe
-
-        # We can't close like we do in the filename case above?  The writer can
-        # get a "broken pipe".
-        self._PushClose(read_fd)
-
-        thunk = _HereDocWriterThunk(write_fd, arg.body)
-
-        # TODO: Use PIPE_SIZE to save a process in the case of small here docs,
-        # which are the common case.  (dash does this.)
-        start_process = True
-        #start_process = False
-
-        if start_process:
-          here_proc = Process(thunk, self.job_state, self.tracer)
-
-          # NOTE: we could close the read pipe here, but it doesn't really
-          # matter because we control the code.
-          _ = here_proc.Start(trace.HereDoc())
-          #log('Started %s as %d', here_proc, pid)
-          self._PushWait(here_proc)
-
-          # Now that we've started the child, close it in the parent.
-          posix.close(write_fd)
-
-        else:
+        if len(arg.body) <= PIPE_SIZE:
+          read_fd, write_fd = posix.pipe()
           posix.write(write_fd, arg.body)
           posix.close(write_fd)
+        else:
+          try:
+            read_fd = self._HereDocFile(arg.body)
+          except OSError as e:
+            self.errfmt.Print_(
+                "Can't write here doc: %s" % pyutil.strerror(e),
+                span_id=r.op_spid)
+            raise  # redirect failed
+
+        new_fd = self._PushDup(read_fd, r.loc)  # stdin is now the here doc
+        if new_fd == NO_FD:
+          # read_fd is already the target, e.g. 0 when stdin was closed.
+          # Close it when the redirect is undone.
+          self._PushClose(read_fd)
+        else:
+          posix.close(read_fd)
 
   def Push(self, redirects):
     # type: (List[redirect]) -> bool
     """Apply a group of redirects and remember to undo them."""
 
     #log('> fd_state.Push %s', redirects)
-    new_frame = _FdFrame()
+    new_frame = _FdFrame(self.stdin_buf)
     self.stack.append(new_frame)
     self.cur_frame = new_frame
 
     for r in redirects:
+      # The buffer doesn't belong to what's on stdin now
+      if r.loc.tag_() == redir_loc_e.Fd and cast(redir_loc__Fd, r.loc).fd == 0:
+        self.stdin_buf = None
+
       #log('apply %s', r)
       self.errfmt.PushLocation(r.op_spid)
       try:
@@ -436,25 +526,30 @@ class FdState(object):
     #log('done applying %d redirects', len(redirects))
     return True
 
-  def PushStdinFromPipe(self, r):
-    # type: (int) -> bool
+  def PushStdinFromPipe(self, r, buffered):
+    # type: (int, bool) -> bool
     """Save the current stdin and make it come from descriptor 'r'.
 
     'r' is typically the read-end of a pipe.  For 'lastpipe'/ZSH semantics of
 
     echo foo | read line; echo $line
+
+    If 'buffered' is set, the caller has checked that no other process reads
+    the pipe, so builtins may read ahead into self.stdin_buf.
     """
-    new_frame = _FdFrame()
+    new_frame = _FdFrame(self.stdin_buf)
     self.stack.append(new_frame)
     self.cur_frame = new_frame
 
     self._PushDup(r, redir_loc.Fd(0))
+    self.stdin_buf = StdinBuffer(0) if buffered else None
     return True
 
   def Pop(self):
     # type: () -> None
     frame = self.stack.pop()
     #log('< Pop %s', frame)
+    self.stdin_buf = frame.stdin_buf
     for rf in reversed(frame.saved):
       if rf.saved_fd == NO_FD:
         #log('Close %d', orig)
@@ -474,14 +569,17 @@ class FdState(object):
         posix.close(rf.saved_fd)
         #log('dup2 %s %s', saved, orig)
 
-    # Wait for here doc processes to finish.
-    for proc in frame.need_wait:
-      unused_status = proc.Wait(self.waiter)
-
   def MakePermanent(self):
     # type: () -> None
     self.cur_frame.Forget()
 
+    # e.g. exec < file.  Enclosing frames pushed after stdin was last
+    # redirected must not bring back a buffer for the old stdin on Pop().
+    for frame in reversed(self.stack):
+      if frame.RestoresStdin():
+        break
+      frame.stdin_buf = self.stdin_buf
+
 
 class ChildStateChange(object):
 
@@ -550,6 +648,12 @@ class ExternalProgram(object):
     self.fd_state = fd_state
     self.errfmt = errfmt
     self.debug_f = debug_f
+    self.use_spawn = True
+
+  def Init_Spawn(self, b):
+    # type: (bool) -> None
+    """Whether to start external commands with posix_spawn()."""
+    self.use_spawn = b
 
   def Exec(self, argv0_path, cmd_val, environ):
     # type: (str, cmd_value__Argv, Dict[str, str]) -> None
@@ -563,8 +667,38 @@ class ExternalProgram(object):
     self._Exec(argv0_path, cmd_val.argv, cmd_val.arg_spids[0], environ, True)
     assert False, "This line should never execute" # NO RETURN
 
-  def _Exec(self, argv0_path, argv, argv0_spid, environ, should_retry):
-    # type: (str, List[str], int, Dict[str, str], bool) -> None
+  def Spawn(self, argv0_path, cmd_val, environ):
+    # type: (str, cmd_value__Argv, Dict[str, str]) -> int
+    """Start a program with posix_spawn() rather than fork() and exec().
+
+    fork() has to copy the page tables of the shell's heap, which is slow when
+    the heap is big.  posix_spawn() doesn't.
+
+    Returns:
+      The PID, or -1 if the program couldn't be started.  The caller then
+      falls back to fork() and exec(), which reports the error.
+    """
+    if not self.use_spawn:
+      return -1
+
+    argv0_path, argv = self._MaybeHijack(argv0_path, cmd_val.argv)
+    setsigdef = pyos.SignalState_ChildDefaults()
+    try:
+      pid = posix.posix_spawn(argv0_path, argv, environ, setsigdef)
+    except OSError as e:
+      # Run with /bin/sh when there's no shebang, like _Exec()
+      if e.errno != errno_.ENOEXEC:
+        return -1
+      new_argv = ['/bin/sh', argv0_path]
+      new_argv.extend(argv[1:])
+      try:
+        pid = posix.posix_spawn('/bin/sh', new_argv, environ, setsigdef)
+      except OSError:
+        return -1
+    return pid
+
+  def _MaybeHijack(self, argv0_path, argv):
+    # type: (str, List[str]) -> Tuple[str, List[str]]
     if len(self.hijack_shebang):
       try:
         f = self.fd_state.Open(argv0_path)
@@ -584,6 +718,11 @@ class ExternalProgram(object):
             pass
         finally:
           f.close()
+    return argv0_path, argv
+
+  def _Exec(self, argv0_path, argv, argv0_spid, environ, should_retry):
+    # type: (str, List[str], int, Dict[str, str], bool) -> None
+    argv0_path, argv = self._MaybeHijack(argv0_path, argv)
 
     # TODO: If there is an error, like the file isn't executable, then we should
     # exit, and the parent will reap it.  Should it capture stderr?
@@ -643,6 +782,14 @@ class Thunk(object):
     """Display for the 'jobs' list."""
     raise NotImplementedError()
 
+  def Spawn(self):
+    # type: () -> int
+    """Start this thunk without forking the shell.
+
+    Returns the PID, or -1 if the caller should fork() and call Run().
+    """
+    return -1
+
   def __str__(self):
     # type: () -> str
     # For debugging
@@ -676,6 +823,10 @@ class ExternalThunk(Thunk):
     """
     self.ext_prog.Exec(self.argv0_path, self.cmd_val, self.environ)
 
+  def Spawn(self):
+    # type: () -> int
+    return self.ext_prog.Spawn(self.argv0_path, self.cmd_val, self.environ)
+
 
 class SubProgramThunk(Thunk):
   """A subprogram that can be executed in another process."""
@@ -723,38 +874,6 @@ class SubProgramThunk(Thunk):
     posix._exit(status)
 
 
-class _HereDocWriterThunk(Thunk):
-  """Write a here doc to one end of a pipe.
-
-  May be be executed in either a child process or the main shell process.
-  """
-  def __init__(self, w, body_str):
-    # type: (int, str) -> None
-    self.w = w
-    self.body_str = body_str
-
-  def DisplayLine(self):
-    # type: () -> str
-
-    # You can hit Ctrl-Z and the here doc writer will be suspended!  Other
-    # shells don't have this problem because they use temp files!  That's a bit
-    # unfortunate.
-    return '[here doc writer]'
-
-  def Run(self):
-    # type: () -> None
-    """
-    do_exit: For small pipelines
-    """
-    #log('Writing %r', self.body_str)
-    posix.write(self.w, self.body_str)
-    #log('Wrote %r', self.body_str)
-    posix.close(self.w)
-    #log('Closed %d', self.w)
-
-    exit(0)  # Could this fail?
-
-
 class Job(object):
   """Interface for both Process and Pipeline.
 
@@ -865,20 +984,31 @@ class Process(Job):
     #
     # The whole job control mechanism is complicated and hacky.
 
-    pid = posix.fork()
-    if pid < 0:
-      # When does this happen?
-      raise RuntimeError('Fatal error in posix.fork()')
+    pid = -1
+    if len(self.state_changes) == 0:
+      # An external command that isn't part of a pipeline.  Redirects have
+      # already been applied in the shell, so the child inherits them.
+      pid = self.thunk.Spawn()
+
+    if pid == -1:
+      pid = posix.fork()
+      if pid < 0:
+        # When does this happen?
+        raise RuntimeError('Fatal error in posix.fork()')
 
-    elif pid == 0:  # child
-      pyos.SignalState_AfterForkingChild()
+      elif pid == 0:  # child
+        pyos.SignalState_AfterForkingChild()
 
-      for st in self.state_changes:
-        st.Apply()
+        for st in self.state_changes:
+          st.Apply()
 
-      self.tracer.SetProcess(posix.getpid())
-      self.thunk.Run()
-      # Never returns
+        self.tracer.SetProcess(posix.getpid())
+        self.thunk.Run()
+        # Never returns
+
+      self.job_state.num_forks += 1
+    else:
+      self.job_state.num_spawns += 1
 
     #log('STARTED process %s, pid = %d', self, pid)
     self.tracer.OnProcessStart(pid, why)
@@ -961,6 +1091,7 @@ class Pipeline(Job):
     # Optional for foreground
     self.last_thunk = None  # type: Tuple[CommandEvaluator, command_t]
     self.last_pipe = None  # type: Tuple[int, int]
+    self.buffer_stdin = False
 
     self.sigpipe_status_ok = sigpipe_status_ok
 
@@ -1006,6 +1137,12 @@ class Pipeline(Job):
 
     self.last_pipe = (r, w)  # So we can connect it to last_thunk
 
+  def Init_BufferStdin(self):
+    # type: () -> None
+    """The last part is the only reader of the last pipe, so builtins can read
+    ahead from it."""
+    self.buffer_stdin = True
+
   def Start(self, waiter):
     # type: (Waiter) -> None
     # TODO: pipelines should be put in their own process group with setpgid().
@@ -1090,7 +1227,7 @@ class Pipeline(Job):
     if self.last_pipe is not None:
       r, w = self.last_pipe  # set in AddLast()
       posix.close(w)  # we will not write here
-      fd_state.PushStdinFromPipe(r)
+      fd_state.PushStdinFromPipe(r, self.buffer_stdin)
 
       # TODO: determine fork_external here, so we can go BEYOND lastpipe.  Not
       # only do we run builtins in the same process.  External processes will
@@ -1158,6 +1295,10 @@ class JobState(object):
     self.last_stopped_pid = -1  # type: int  # for basic 'fg' implementation
     self.job_id = 1  # Strictly increasing
 
+    # How child processes were started.  Logged to the debug file at exit.
+    self.num_forks = 0
+    self.num_spawns = 0
+
   # TODO: This isn't a PID.  This is a process group ID?
   #
   # What should the table look like?
@@ -23,6 +23,8 @@ from core import state
 from osh import builtin_misc
 from mycpp import mylib
 
+import posix_ as posix
+
 Process = process.Process
 ExternalThunk = process.ExternalThunk
 
@@ -82,17 +84,60 @@ class ProcessTest(unittest.TestCase):
                  redirect_arg.Path(PATH))
 
     self.fd_state.Push([r])
-    line1, _ = builtin_misc._ReadUntilDelim('\n')
+    line1, _ = builtin_misc._ReadUntilDelim('\n', None)
+    # read looks ahead in a regular file, but leaves the offset after the line
+    self.assertEqual(4, posix.lseek(0, 0, posix.SEEK_CUR))
     self.fd_state.Pop()
 
     self.fd_state.Push([r])
-    line2, _ = builtin_misc._ReadUntilDelim('\n')
+    line2, _ = builtin_misc._ReadUntilDelim('\n', None)
     self.fd_state.Pop()
 
     # sys.stdin.readline() would erroneously return 'two' because of buffering.
     self.assertEqual('one', line1)
     self.assertEqual('one', line2)
 
+  def testHereDoc(self):
+    # Small ones are written to a pipe, and big ones to a temp file
+    for body in ['one\ntwo\n', 'x' * (process.PIPE_SIZE + 1) + '\ntwo\n']:
+      r = redirect(Id.Redir_DLess, runtime.NO_SPID, redir_loc.Fd(0),
+                   redirect_arg.HereDoc(body))
+
+      self.fd_state.Push([r])
+      line1, _ = builtin_misc._ReadUntilDelim('\n', None)
+      line2, _ = builtin_misc._ReadUntilDelim('\n', None)
+      self.fd_state.Pop()
+
+      self.assertEqual(body.split('\n')[0], line1)
+      self.assertEqual('two', line2)
+
+  def testStdinBuffer(self):
+    r, w = posix.pipe()
+    posix.write(w, 'one\ntwo\nthree')
+    posix.close(w)
+
+    self.fd_state.PushStdinFromPipe(r, True)
+    stdin_buf = self.fd_state.stdin_buf
+    self.assertEqual(('one', False), builtin_misc._ReadUntilDelim('\n', stdin_buf))
+    self.assertEqual(True, stdin_buf.HasData())
+
+    # A redirect hides the buffer until it's undone
+    here_doc = redirect(Id.Redir_DLess, runtime.NO_SPID, redir_loc.Fd(0),
+                        redirect_arg.HereDoc('x\n'))
+    self.fd_state.Push([here_doc])
+    self.assertEqual(None, self.fd_state.stdin_buf)
+    self.assertEqual('x\n', builtin_misc._ReadLine(self.fd_state.stdin_buf))
+    self.fd_state.Pop()
+
+    self.assertEqual('tw', stdin_buf.Read(2))
+    self.assertEqual('o\n', builtin_misc._ReadLine(stdin_buf))
+    self.assertEqual(('three', True), builtin_misc._ReadUntilDelim('\n', stdin_buf))
+    self.assertEqual('', builtin_misc._ReadAll(stdin_buf))
+
+    self.fd_state.Pop()
+    posix.close(r)
+    self.assertEqual(None, self.fd_state.stdin_buf)
+
   def testProcess(self):
 
     # 3 fds.  Does Python open it?  Shell seems to have it too.  Maybe it
@@ -114,6 +159,19 @@ class ProcessTest(unittest.TestCase):
     # 12 file descriptors open!
     print('FDS AFTER', os.listdir('/dev/fd'))
 
+  def testSpawn(self):
+    why = trace.External(['true'])
+    p = self._ExtProc(['true'])
+    self.assertEqual(0, p.RunWait(self.waiter, why))
+    self.assertEqual(1, self.job_state.num_spawns)
+    self.assertEqual(0, self.job_state.num_forks)
+
+    self.ext_prog.Init_Spawn(False)
+    p = self._ExtProc(['true'])
+    self.assertEqual(0, p.RunWait(self.waiter, why))
+    self.assertEqual(1, self.job_state.num_spawns)
+    self.assertEqual(1, self.job_state.num_forks)
+
   def testPipeline(self):
     node = _CommandNode('uniq -c', self.arena)
     cmd_ev = test_lib.InitCommandEvaluator(arena=self.arena, ext_prog=self.ext_prog)
@@ -6,16 +6,18 @@ Like py{error,util}.py, it won't be translated to C++.
 """
 from __future__ import print_function
 
+import errno
 import pwd
 import resource
 import signal
 import select
+import stat
 import termios  # for read -n
 import time
 
 import posix_ as posix
 
-from typing import Optional, Tuple, cast, Any, TYPE_CHECKING
+from typing import Optional, Tuple, List, cast, Any, TYPE_CHECKING
 
 if TYPE_CHECKING:
   from core.comp_ui import _IDisplay
@@ -129,6 +131,100 @@ def InputAvailable(fd):
   return len(r) != 0
 
 
+def IsRegularFile(fd):
+  # type: (int) -> bool
+  """Whether we can read ahead on fd and seek back, e.g. for 'read'."""
+  try:
+    st = posix.fstat(fd)
+  except OSError:
+    return False
+  return stat.S_ISREG(st.st_mode)
+
+
+def DirMtime(path):
+  # type: (str) -> float
+  """Returns the mtime of a $PATH directory, or -1.0 if it can't be stat'd."""
+  try:
+    st = posix.stat(path)
+  except OSError:
+    return -1.0
+  return st.st_mtime
+
+
+def ListDir(path):
+  # type: (str) -> List[str]
+  """Returns the names in a directory, or an empty list on error."""
+  try:
+    return posix.listdir(path)
+  except OSError:
+    return []
+
+
+# Errors that mean a way of copying doesn't work for these descriptors, e.g.
+# splice() without a pipe, or sendfile() to a file opened with O_APPEND.
+_COPY_UNSUPPORTED = [
+    errno.EINVAL, errno.ENOSYS, errno.EXDEV, errno.EBADF, errno.EOPNOTSUPP,
+]
+
+_COPY_SIZE = 1 << 24  # bytes per system call
+
+
+def _SendFile(src_fd, dst_fd, count):
+  # type: (int, int, int) -> int
+  return posix.sendfile(dst_fd, src_fd, count)
+
+
+def _KernelCopy(copy_func, src_fd, dst_fd):
+  # type: (Any, int, int) -> int
+  """Returns 0 at EOF, -1 if copy_func doesn't work here, or an errno."""
+  while True:
+    try:
+      n = copy_func(src_fd, dst_fd, _COPY_SIZE)
+    except OSError as e:
+      if e.errno == errno.EINTR:
+        continue
+      if e.errno in _COPY_UNSUPPORTED:
+        return -1  # Any data we copied is accounted for by the file offsets
+      return e.errno
+    if n == 0:
+      return 0
+
+
+def CopyFd(src_fd, dst_fd):
+  # type: (int, int) -> int
+  """Copy from src_fd to dst_fd until EOF, for the __cat builtin.
+
+  The kernel does the copying when it can: copy_file_range() between regular
+  files, sendfile() from a regular file, and splice() to or from a pipe.  We
+  fall back to read() and write().
+
+  Returns 0 for success and nonzero errno for error.
+  """
+  copy_funcs = []  # type: List[Any]
+  if IsRegularFile(src_fd):
+    if IsRegularFile(dst_fd):
+      copy_funcs.append(posix.copy_file_range)
+    copy_funcs.append(_SendFile)
+  copy_funcs.append(posix.splice)
+
+  for copy_func in copy_funcs:
+    err = _KernelCopy(copy_func, src_fd, dst_fd)
+    if err != -1:
+      return err
+
+  # Note: posix.read() and posix.write() retry on EINTR
+  try:
+    while True:
+      chunk = posix.read(src_fd, 65536)
+      if len(chunk) == 0:
+        return 0
+      while len(chunk):
+        n = posix.write(dst_fd, chunk)
+        chunk = chunk[n:]
+  except OSError as e:
+    return e.errno
+
+
 def SignalState_AfterForkingChild():
   # type: () -> None
   """Not a member of SignalState since we didn't do dependency injection."""
@@ -145,6 +241,16 @@ def SignalState_AfterForkingChild():
   signal.signal(signal.SIGTSTP, signal.SIG_DFL)
 
 
+def SignalState_ChildDefaults():
+  # type: () -> List[int]
+  """The signals that SignalState_AfterForkingChild() resets.
+
+  For processes started with posix_spawn(), which doesn't run any code in the
+  child.
+  """
+  return [signal.SIGQUIT, signal.SIGPIPE, signal.SIGTSTP]
+
+
 class SignalState(object):
   """All changes to global signal state go through this object."""
 
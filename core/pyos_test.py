@@ -0,0 +1,60 @@
+#!/usr/bin/env python2
+"""
+pyos_test.py: Tests for pyos.py
+"""
+from __future__ import print_function
+
+import errno
+import unittest
+
+from core import pyos  # module under test
+
+import posix_ as posix
+
+
+def _WriteFile(path, contents):
+  # type: (str, str) -> None
+  with open(path, 'w') as f:
+    f.write(contents)
+
+
+class PyosTest(unittest.TestCase):
+
+  def testCopyFd(self):
+    contents = ''.join('line %d\n' % i for i in xrange(10000))
+    _WriteFile('_tmp/pyos-in.txt', contents)
+
+    # File to file, and file to file with O_APPEND, which sendfile() doesn't
+    # allow
+    for flags in [posix.O_TRUNC, posix.O_APPEND]:
+      src = posix.open('_tmp/pyos-in.txt', posix.O_RDONLY, 0)
+      dst = posix.open('_tmp/pyos-out.txt',
+                       posix.O_WRONLY | posix.O_CREAT | flags, 0o644)
+      _WriteFile('_tmp/pyos-out.txt', '')
+      self.assertEqual(0, pyos.CopyFd(src, dst))
+      posix.close(src)
+      posix.close(dst)
+      with open('_tmp/pyos-out.txt') as f:
+        self.assertEqual(contents, f.read())
+
+    # Starting in the middle of a file, to a pipe
+    _WriteFile('_tmp/pyos-in.txt', 'abcdefghijk')
+    src = posix.open('_tmp/pyos-in.txt', posix.O_RDONLY, 0)
+    posix.lseek(src, 7, posix.SEEK_SET)
+    r, w = posix.pipe()
+    self.assertEqual(0, pyos.CopyFd(src, w))
+    posix.close(w)
+    self.assertEqual('hijk', posix.read(r, 100))
+    posix.close(src)
+    posix.close(r)
+
+    # Bad descriptor
+    r, w = posix.pipe()
+    posix.write(w, 'x')
+    posix.close(w)
+    self.assertEqual(errno.EBADF, pyos.CopyFd(r, w))
+    posix.close(r)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -86,6 +86,25 @@ def LoadOilGrammar(loader):
   return oil_grammar
 
 
+class LazyOilGrammar(object):
+  """Load the Oil grammar on first use.
+
+  Most shell scripts don't contain Oil expressions, so startup shouldn't pay
+  for unmarshaling the grammar.  The ParseContext instances share this.
+  """
+
+  def __init__(self, loader):
+    # type: (_ResourceLoader) -> None
+    self.loader = loader
+    self.oil_grammar = None  # type: grammar.Grammar
+
+  def Get(self):
+    # type: () -> grammar.Grammar
+    if self.oil_grammar is None:
+      self.oil_grammar = LoadOilGrammar(self.loader)
+    return self.oil_grammar
+
+
 class _ResourceLoader(object):
 
   def Get(self, rel_path):
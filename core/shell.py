@@ -14,12 +14,11 @@ from _devbuild.gen.syntax_asdl import source
 from asdl import runtime
 
 from core import alloc
-from core import comp_ui
 from core import dev
 from core import error
 from core import executor
-from core import completion
 from core import main_loop
+from core import parse_cache as parse_cache_lib
 from core import pyos
 from core import process
 from core import shell_native
@@ -40,12 +39,9 @@ from frontend import reader
 from frontend import py_reader
 from frontend import parse_lib
 
-from oil_lang import expr_eval
 from oil_lang import builtin_oil
-from oil_lang import funcs_builtin
 
 from osh import builtin_assign
-from osh import builtin_comp
 from osh import builtin_meta
 from osh import builtin_misc
 from osh import builtin_lib
@@ -70,11 +66,140 @@ import posix_ as posix
 from typing import List, Dict, Optional, Any, TYPE_CHECKING
 
 if TYPE_CHECKING:
-  from _devbuild.gen.runtime_asdl import Proc
+  from _devbuild.gen.runtime_asdl import Proc, cmd_value__Argv
+  from core import comp_ui
+  from core import completion
+  from oil_lang import expr_eval
+  from _devbuild.gen.syntax_asdl import command_t
 
 
-def _InitDefaultCompletions(cmd_ev, complete_builtin, comp_lookup):
-  # type: (cmd_eval.CommandEvaluator, builtin_comp.Complete, completion.Lookup) -> None
+class _LazyOilEvaluator(object):
+  """Create the OilEvaluator the first time it's used.
+
+  Most shell scripts never evaluate an Oil expression, so they don't need to
+  import oil_lang/expr_eval.py, or define len(), split(), etc.
+  """
+
+  def __init__(self, mem, procs, splitter, globber, errfmt):
+    # type: (state.Mem, Dict[str, Proc], split.SplitContext, glob_.Globber, ui.ErrorFormatter) -> None
+    self.mem = mem
+    self.procs = procs
+    self.splitter = splitter
+    self.globber = globber
+    self.errfmt = errfmt
+
+    # Set by vm.InitCircularDeps()
+    self.shell_ex = None  # type: vm._Executor
+    self.word_ev = None  # type: word_eval.AbstractWordEvaluator
+
+    self.expr_ev = None  # type: expr_eval.OilEvaluator
+
+  def CheckCircularDeps(self):
+    # type: () -> None
+    assert self.shell_ex is not None
+    assert self.word_ev is not None
+
+  def _Init(self):
+    # type: () -> expr_eval.OilEvaluator
+    from oil_lang import expr_eval
+    from oil_lang import funcs_builtin
+
+    mem = self.mem
+    funcs_builtin.Init(mem)
+
+    # split() builtin
+    # TODO: Accept IFS as a named arg?  split('a b', IFS=' ')
+    splitter = self.splitter
+    funcs_builtin.SetGlobalFunc(
+        mem, 'split', lambda s, ifs=None: splitter.SplitForWordEval(s, ifs=ifs))
+
+    # glob() builtin
+    globber = self.globber
+    funcs_builtin.SetGlobalFunc(
+        mem, 'glob', lambda s: globber.OilFuncCall(s))
+
+    expr_ev = expr_eval.OilEvaluator(mem, self.procs, splitter, self.errfmt)
+    expr_ev.shell_ex = self.shell_ex
+    expr_ev.word_ev = self.word_ev
+    expr_ev.CheckCircularDeps()
+    return expr_ev
+
+  def __getattr__(self, name):
+    # type: (str) -> Any
+    """Called for attributes not on this object, e.g. EvalExpr."""
+    if self.expr_ev is None:
+      self.expr_ev = self._Init()
+    return getattr(self.expr_ev, name)
+
+
+class _LazyCompletion(object):
+  """Import the completion modules when they're first needed.
+
+  That is, when the shell is interactive, or when a script uses 'complete',
+  'compgen', etc.
+  """
+
+  def __init__(self, mem, parse_ctx, search_path, errfmt):
+    # type: (state.Mem, parse_lib.ParseContext, state.SearchPath, ui.ErrorFormatter) -> None
+    self.mem = mem
+    self.parse_ctx = parse_ctx
+    self.search_path = search_path
+    self.errfmt = errfmt
+
+    # Set after the evaluators are created
+    self.cmd_ev = None  # type: cmd_eval.CommandEvaluator
+    self.word_ev = None  # type: word_eval.AbstractWordEvaluator
+    self.splitter = None  # type: split.SplitContext
+
+    self.comp_lookup = None  # type: completion.Lookup
+    self.compopt_state = None  # type: completion.OptionState
+    self.builtins = {}  # type: Dict[int, vm._Builtin]
+
+  def Init(self):
+    # type: () -> None
+    if self.comp_lookup is not None:
+      return
+
+    from core import completion
+    from osh import builtin_comp
+
+    self.comp_lookup = completion.Lookup()
+    # Global state to work around readline interfaces
+    self.compopt_state = completion.OptionState()
+
+    spec_builder = builtin_comp.SpecBuilder(self.cmd_ev, self.parse_ctx,
+                                            self.word_ev, self.splitter,
+                                            self.comp_lookup, self.search_path)
+    b = self.builtins
+    b[builtin_i.complete] = builtin_comp.Complete(spec_builder,
+                                                  self.comp_lookup)
+    b[builtin_i.compgen] = builtin_comp.CompGen(spec_builder)
+    b[builtin_i.compopt] = builtin_comp.CompOpt(self.compopt_state,
+                                                self.errfmt)
+    b[builtin_i.compadjust] = builtin_comp.CompAdjust(self.mem)
+
+
+class _LazyCompBuiltin(vm._Builtin):
+  """complete, compgen, compopt, and compadjust."""
+
+  def __init__(self, comp, builtin_id):
+    # type: (_LazyCompletion, int) -> None
+    self.comp = comp
+    self.builtin_id = builtin_id
+
+  def Run(self, cmd_val):
+    # type: (cmd_value__Argv) -> int
+    self.comp.Init()
+    return self.comp.builtins[self.builtin_id].Run(cmd_val)
+
+
+def _InitDefaultCompletions(cmd_ev, comp):
+  # type: (cmd_eval.CommandEvaluator, _LazyCompletion) -> None
+  from core import completion
+
+  comp.Init()
+  complete_builtin = comp.builtins[builtin_i.complete]
+  comp_lookup = comp.comp_lookup
 
   # register builtins and words
   complete_builtin.Run(shell_native.MakeBuiltinArgv(['-E', '-A', 'command']))
@@ -92,6 +217,12 @@ def _InitDefaultCompletions(cmd_ev, complete_builtin, comp_lookup):
     comp_lookup.RegisterName('slowc', {}, C1)
 
 
+def _PromptState():
+  # type: () -> comp_ui.PromptState
+  from core import comp_ui
+  return comp_ui.PromptState()
+
+
 def SourceStartupFile(fd_state, rc_path, lang, parse_ctx, cmd_ev):
   # type: (process.FdState, str, str, parse_lib.ParseContext, cmd_eval.CommandEvaluator) -> None
 
@@ -117,7 +248,7 @@ def SourceStartupFile(fd_state, rc_path, lang, parse_ctx, cmd_ev):
     return
 
   arena = parse_ctx.arena
-  rc_line_reader = reader.FileLineReader(f, arena)
+  rc_line_reader = reader.FileReader(f, arena)
   rc_c_parser = parse_ctx.MakeOshParser(rc_line_reader)
 
   with alloc.ctx_Location(arena, source.SourcedFile(rc_path)):
@@ -245,7 +376,12 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
     return 2
   flag = arg_types.main(attrs.attrs)
 
-  arena = alloc.Arena()
+  # Packed span storage, for comparing memory usage.  See
+  # benchmarks/arena_mem.py.
+  if environ.get('OSH_COMPACT_ARENA', '') == '1':
+    arena = alloc.CompactArena()  # type: alloc.Arena
+  else:
+    arena = alloc.Arena()
   errfmt = ui.ErrorFormatter(arena)
 
   help_builtin = builtin_misc.Help(loader, errfmt)
@@ -286,8 +422,6 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   version_str = pyutil.GetVersion(loader)
   state.InitMem(mem, environ, version_str)
 
-  funcs_builtin.Init(mem)
-
   procs = {}  # type: Dict[str, Proc]
 
   if attrs.show_options:  # special case: sh -o
@@ -302,12 +436,16 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   # feedback between runtime and parser
   aliases = {}  # type: Dict[str, str]
 
-  oil_grammar = pyutil.LoadOilGrammar(loader)
+  # The grammar is loaded when the first Oil expression is parsed.
+  oil_grammar = pyutil.LazyOilGrammar(loader)
 
   if flag.one_pass_parse and not exec_opts.noexec():
     raise error.Usage('--one-pass-parse requires noexec (-n)')
-  parse_ctx = parse_lib.ParseContext(arena, parse_opts, aliases, oil_grammar)
+  parse_ctx = parse_lib.ParseContext(arena, parse_opts, aliases, None)
+  parse_ctx.Init_LazyGrammar(oil_grammar)
   parse_ctx.Init_OnePassParse(flag.one_pass_parse)
+  # Function bodies in files are brace-matched, and parsed on the first call
+  parse_ctx.Init_LazyFuncs(environ.get('OSH_LAZY_FUNCS', '') == '1')
 
   # Three ParseContext instances SHARE aliases.
   comp_arena = alloc.Arena()
@@ -316,16 +454,16 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   # one_pass_parse needs to be turned on to complete inside backticks.  TODO:
   # fix the issue where ` gets erased because it's not part of
   # set_completer_delims().
-  comp_ctx = parse_lib.ParseContext(comp_arena, parse_opts, aliases,
-                                    oil_grammar)
+  comp_ctx = parse_lib.ParseContext(comp_arena, parse_opts, aliases, None)
+  comp_ctx.Init_LazyGrammar(oil_grammar)
   comp_ctx.Init_Trail(trail1)
   comp_ctx.Init_OnePassParse(True)
 
   hist_arena = alloc.Arena()
   hist_arena.PushSource(source.Unused('history'))
   trail2 = parse_lib.Trail()
-  hist_ctx = parse_lib.ParseContext(hist_arena, parse_opts, aliases,
-                                    oil_grammar)
+  hist_ctx = parse_lib.ParseContext(hist_arena, parse_opts, aliases, None)
+  hist_ctx.Init_LazyGrammar(oil_grammar)
   hist_ctx.Init_Trail(trail2)
 
   # Deps helps manages dependencies.  These dependencies are circular:
@@ -335,6 +473,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   # - prompt_ev needs word_ev for $PS1, which needs prompt_ev for @P
   cmd_deps = cmd_eval.Deps()
   cmd_deps.mutable_opts = mutable_opts
+  cmd_deps.parse_ctx = parse_ctx
 
   # TODO: In general, cmd_deps are shared between the mutually recursive
   # evaluators.  Some of the four below are only shared between a builtin and
@@ -394,31 +533,22 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   interp = environ.get('OSH_HIJACK_SHEBANG', '')
   search_path = state.SearchPath(mem)
   ext_prog = process.ExternalProgram(interp, fd_state, errfmt, debug_f)
+  # OSH_SPAWN=0 starts external commands with fork() and exec()
+  ext_prog.Init_Spawn(environ.get('OSH_SPAWN', '') != '0')
 
   splitter = split.SplitContext(mem)
 
-  # split() builtin
-  # TODO: Accept IFS as a named arg?  split('a b', IFS=' ')
-  funcs_builtin.SetGlobalFunc(
-      mem, 'split', lambda s, ifs=None: splitter.SplitForWordEval(s, ifs=ifs))
-
-  # glob() builtin
+  # For the glob() builtin.
   # TODO: This is instantiation is duplicated in osh/word_eval.py
   globber = glob_.Globber(exec_opts)
-  funcs_builtin.SetGlobalFunc(
-      mem, 'glob', lambda s: globber.OilFuncCall(s))
 
   # This could just be OSH_DEBUG_STREAMS='debug crash' ?  That might be
   # stuffing too much into one, since a .json crash dump isn't a stream.
   crash_dump_dir = environ.get('OSH_CRASH_DUMP_DIR', '')
   cmd_deps.dumper = dev.CrashDumper(crash_dump_dir)
 
-  comp_lookup = completion.Lookup()
-
-  # Various Global State objects to work around readline interfaces
-  compopt_state = completion.OptionState()
-  comp_ui_state = comp_ui.State()
-  prompt_state = comp_ui.PromptState()
+  # 'complete' and friends, and the interactive completer
+  comp = _LazyCompletion(mem, parse_ctx, search_path, errfmt)
 
   dir_stack = state.DirStack()
 
@@ -436,7 +566,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   shell_native.AddPure(builtins, mem, procs, modules, mutable_opts, aliases,
                        search_path, errfmt)
   shell_native.AddIO(builtins, mem, dir_stack, exec_opts, splitter, parse_ctx,
-                     errfmt)
+                     fd_state, errfmt)
   AddProcess(builtins, mem, shell_ex, ext_prog, fd_state, job_state, waiter,
              tracer, search_path, errfmt)
 
@@ -452,7 +582,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
 
   arith_ev = sh_expr_eval.ArithEvaluator(mem, exec_opts, parse_ctx, errfmt)
   bool_ev = sh_expr_eval.BoolEvaluator(mem, exec_opts, parse_ctx, errfmt)
-  expr_ev = expr_eval.OilEvaluator(mem, procs, splitter, errfmt)
+  # Oil's builtin functions like len() are defined when this is first used
+  expr_ev = _LazyOilEvaluator(mem, procs, splitter, globber, errfmt)
   word_ev = word_eval.NormalWordEvaluator(mem, exec_opts, mutable_opts,
                                           splitter, errfmt)
 
@@ -481,8 +612,15 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   builtins[builtin_i.eval] = builtin_meta.Eval(parse_ctx, exec_opts, cmd_ev,
                                                tracer)
 
+  # Opt-in cache of parsed 'source' files and scripts.
+  parse_cache = None  # type: Optional[parse_cache_lib.ParseCache]
+  parse_cache_dir = environ.get('OSH_PARSE_CACHE_DIR', '')
+  if len(parse_cache_dir):
+    parse_cache = parse_cache_lib.ParseCache(parse_cache_dir, version_str,
+                                             parse_ctx, debug_f)
+
   source_builtin = builtin_meta.Source(parse_ctx, search_path, cmd_ev,
-                                       fd_state, tracer, errfmt)
+                                       fd_state, tracer, errfmt, parse_cache)
   builtins[builtin_i.source] = source_builtin
   builtins[builtin_i.dot] = source_builtin
 
@@ -493,13 +631,12 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   # Another block builtin
   builtins[builtin_i.json] = builtin_oil.Json(mem, cmd_ev, errfmt)
 
-  spec_builder = builtin_comp.SpecBuilder(cmd_ev, parse_ctx, word_ev, splitter,
-                                          comp_lookup)
-  complete_builtin = builtin_comp.Complete(spec_builder, comp_lookup)
-  builtins[builtin_i.complete] = complete_builtin
-  builtins[builtin_i.compgen] = builtin_comp.CompGen(spec_builder)
-  builtins[builtin_i.compopt] = builtin_comp.CompOpt(compopt_state, errfmt)
-  builtins[builtin_i.compadjust] = builtin_comp.CompAdjust(mem)
+  comp.cmd_ev = cmd_ev
+  comp.word_ev = word_ev
+  comp.splitter = splitter
+  for builtin_id in (builtin_i.complete, builtin_i.compgen, builtin_i.compopt,
+                     builtin_i.compadjust):
+    builtins[builtin_id] = _LazyCompBuiltin(comp, builtin_id)
 
   builtins[builtin_i.trap] = builtin_process.Trap(sig_state, cmd_deps.traps,
                                                   cmd_deps.trap_nodes,
@@ -508,6 +645,9 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   # History evaluation is a no-op if line_input is None.
   hist_ev = history.Evaluator(line_input, hist_ctx, debug_f)
 
+  script_f = None  # type: Optional[mylib.LineReader]
+  prompt_state = None  # type: Optional[comp_ui.PromptState]
+
   if flag.c is not None:
     arena.PushSource(source.CFlag())
     line_reader = reader.StringLineReader(flag.c, arena)  # type: reader._Reader
@@ -516,6 +656,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
 
   elif flag.i:  # force interactive
     arena.PushSource(source.Stdin(' -i'))
+    prompt_state = _PromptState()
     line_reader = py_reader.InteractiveLineReader(
         arena, prompt_ev, hist_ev, line_input, prompt_state)
     mutable_opts.set_interactive()
@@ -530,6 +671,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
         stdin = mylib.Stdin()
         if stdin.isatty():
           arena.PushSource(source.Interactive())
+          prompt_state = _PromptState()
           line_reader = py_reader.InteractiveLineReader(
               arena, prompt_ev, hist_ev, line_input, prompt_state)
           mutable_opts.set_interactive()
@@ -544,7 +686,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
         stderr_line("osh: Couldn't open %r: %s", script_name,
                     posix.strerror(e.errno))
         return 1
-      line_reader = reader.FileLineReader(f, arena)
+      line_reader = reader.FileReader(f, arena)
+      script_f = f
 
   # TODO: assert arena.NumSourcePaths() == 1
   # TODO: .rc file needs its own arena.
@@ -566,7 +709,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
 
     # This is like an interactive shell, so we copy some initialization from
     # below.  Note: this may need to be tweaked.
-    _InitDefaultCompletions(cmd_ev, complete_builtin, comp_lookup)
+    _InitDefaultCompletions(cmd_ev, comp)
 
     # NOTE: called AFTER _InitDefaultCompletions.
     try:
@@ -589,6 +732,14 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
     return status
 
   if exec_opts.interactive():
+    from core import comp_ui
+    from core import completion
+
+    # Global state to work around readline interfaces
+    comp_ui_state = comp_ui.State()
+    if prompt_state is None:  # -c and -i
+      prompt_state = _PromptState()
+
     # bash: 'set -o emacs' is the default only in the interactive shell
     mutable_opts.set_emacs()
     mutable_opts.set_redefine_proc()
@@ -604,8 +755,10 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
       ev.prompt_ev = prompt_ev
       ev.CheckCircularDeps()
 
-      root_comp = completion.RootCompleter(ev, mem, comp_lookup, compopt_state,
-                                           comp_ui_state, comp_ctx, debug_f)
+      comp.Init()
+      root_comp = completion.RootCompleter(ev, mem, comp.comp_lookup,
+                                           comp.compopt_state, comp_ui_state,
+                                           comp_ctx, debug_f)
 
       term_width = 0
       if flag.completion_display == 'nice':
@@ -623,7 +776,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
       history_filename = os_path.join(home_dir, '.config/oil/history_%s' % lang)
       comp_ui.InitReadline(line_input, history_filename, root_comp, display,
                            debug_f)
-      _InitDefaultCompletions(cmd_ev, complete_builtin, comp_lookup)
+      _InitDefaultCompletions(cmd_ev, comp)
 
     else:  # Without readline module
       display = comp_ui.MinimalDisplay(comp_ui_state, prompt_state, debug_f)
@@ -672,9 +825,17 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
     if flag.parser_mem_dump is not None:
       raise error.Usage('--parser-mem-dump can only be used with -n')
 
+    nodes = None  # type: Optional[List[command_t]]
+    if parse_cache is not None and script_f is not None:
+      nodes = parse_cache.Parse(script_name, script_f)
+
     try:
-      status = main_loop.Batch(cmd_ev, c_parser, arena,
-                               cmd_flags=cmd_eval.IsMainProgram)
+      if nodes is None:
+        status = main_loop.Batch(cmd_ev, c_parser, arena,
+                                 cmd_flags=cmd_eval.IsMainProgram)
+      else:
+        status = main_loop.BatchNodes(cmd_ev, nodes,
+                                      cmd_flags=cmd_eval.IsMainProgram)
     except util.UserExit as e:
       status = e.status
     box = [status]
@@ -683,6 +844,11 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
 
   # NOTE: 'exit 1' is ControlFlow and gets here, but subshell/commandsub
   # don't because they call sys.exit().
+  debug_f.log('Started %d processes with fork() and %d with posix_spawn()',
+              job_state.num_forks, job_state.num_spawns)
+  hits, misses = libc.regex_cache_stats()
+  debug_f.log('Regex cache: %d hits, %d misses', hits, misses)
+
   if flag.runtime_mem_dump is not None:
     input_path = '/proc/%d/status' % posix.getpid()
     pyutil.CopyFile(input_path, flag.runtime_mem_dump)
@@ -96,16 +96,16 @@ def AddPure(b, mem, procs, modules, mutable_opts, aliases, search_path, errfmt):
   b[builtin_i.module] = builtin_pure.Module(modules, mem.exec_opts, errfmt)
 
 
-def AddIO(b, mem, dir_stack, exec_opts, splitter, parse_ctx, errfmt):
-  # type: (Dict[int, vm._Builtin], state.Mem, state.DirStack, optview.Exec, split.SplitContext, parse_lib.ParseContext, ui.ErrorFormatter) -> None
-  mapfile = builtin_misc.MapFile(mem, errfmt)
+def AddIO(b, mem, dir_stack, exec_opts, splitter, parse_ctx, fd_state, errfmt):
+  # type: (Dict[int, vm._Builtin], state.Mem, state.DirStack, optview.Exec, split.SplitContext, parse_lib.ParseContext, process.FdState, ui.ErrorFormatter) -> None
+  mapfile = builtin_misc.MapFile(mem, errfmt, fd_state)
 
   b[builtin_i.echo] = builtin_pure.Echo(exec_opts)
   b[builtin_i.mapfile] = mapfile
   b[builtin_i.readarray] = mapfile
 
-  b[builtin_i.read] = builtin_misc.Read(splitter, mem, parse_ctx)
-  b[builtin_i.cat] = builtin_misc.Cat()  # for $(<file)
+  b[builtin_i.read] = builtin_misc.Read(splitter, mem, parse_ctx, fd_state)
+  b[builtin_i.cat] = builtin_misc.Cat(errfmt)
 
   # test / [ differ by need_right_bracket
   b[builtin_i.test] = builtin_bracket.Test(False, exec_opts, mem, errfmt)
@@ -201,7 +201,12 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
     return 2
   flag = arg_types.main(attrs.attrs)
 
-  arena = alloc.Arena()
+  # Packed span storage, for comparing memory usage.  See
+  # benchmarks/arena_mem.py.
+  if environ.get('OSH_COMPACT_ARENA', '') == '1':
+    arena = alloc.CompactArena()  # type: alloc.Arena
+  else:
+    arena = alloc.Arena()
   errfmt = ui.ErrorFormatter(arena)
 
   help_builtin = builtin_misc.Help(loader, errfmt)
@@ -263,6 +268,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
     e_usage('--one-pass-parse requires noexec (-n)')
   parse_ctx = parse_lib.ParseContext(arena, parse_opts, aliases, oil_grammar)
   parse_ctx.Init_OnePassParse(flag.one_pass_parse)
+  # Function bodies in files are brace-matched, and parsed on the first call
+  parse_ctx.Init_LazyFuncs(environ.get('OSH_LAZY_FUNCS', '') == '1')
 
   # Three ParseContext instances SHARE aliases.
   comp_arena = alloc.Arena()
@@ -290,6 +297,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   # - prompt_ev needs word_ev for $PS1, which needs prompt_ev for @P
   cmd_deps = cmd_eval.Deps()
   cmd_deps.mutable_opts = mutable_opts
+  cmd_deps.parse_ctx = parse_ctx
 
   # TODO: In general, cmd_deps are shared between the mutually recursive
   # evaluators.  Some of the four below are only shared between a builtin and
@@ -342,6 +350,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   interp = environ.get('OSH_HIJACK_SHEBANG', '')
   search_path = state.SearchPath(mem)
   ext_prog = process.ExternalProgram(interp, fd_state, errfmt, debug_f)
+  # OSH_SPAWN=0 starts external commands with fork() and exec()
+  ext_prog.Init_Spawn(environ.get('OSH_SPAWN', '') != '0')
 
   splitter = split.SplitContext(mem)
 
@@ -367,7 +377,8 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
   modules = {}  # type: Dict[str, bool]
 
   AddPure(builtins, mem, procs, modules, mutable_opts, aliases, search_path, errfmt)
-  AddIO(builtins, mem, dir_stack, exec_opts, splitter, parse_ctx, errfmt)
+  AddIO(builtins, mem, dir_stack, exec_opts, splitter, parse_ctx, fd_state,
+        errfmt)
 
   builtins[builtin_i.help] = help_builtin
 
@@ -446,7 +457,7 @@ def Main(lang, arg_r, environ, login_shell, loader, line_input):
         stderr_line("osh: Couldn't open %r: %s", script_name,
                     pyutil.strerror(e))
         return 1
-      line_reader = reader.FileLineReader(f, arena)
+      line_reader = reader.FileReader(f, arena)
 
   # TODO: assert arena.NumSourcePaths() == 1
   # TODO: .rc file needs its own arena.
@@ -65,13 +65,98 @@ SetNameref    = 1 << 4
 ClearNameref  = 1 << 5
 
 
+# Forget directories that aren't in $PATH once we've indexed this many
+_MAX_PATH_DIRS = 64
+
+# Don't trust the index of a directory modified this recently
+_RACY_SECONDS = 1.0
+
+
+def _Executables(path_dir, names):
+  # type: (str, List[str]) -> List[str]
+  return [
+      name for name in names
+      if posix.access(os_path.join(path_dir, name), posix.X_OK)
+  ]
+
+
+class _PathDir(object):
+  """The names in a $PATH directory, valid until its mtime changes."""
+
+  def __init__(self, mtime, names):
+    # type: (float, Dict[str, bool]) -> None
+    self.mtime = mtime
+    self.names = names
+    self.executables = None  # type: List[str]  # for completion
+
+
 class SearchPath(object):
-  """For looking up files in $PATH."""
+  """For looking up files in $PATH.
+
+  Absolute directories in $PATH are indexed, so a lookup only checks the
+  directories that have an entry with that name.  The indexes of the
+  directories before a hit, or of all of them on a miss, are validated by
+  their mtime, and a directory is listed again if it changed.
+  """
 
   def __init__(self, mem):
     # type: (Mem) -> None
     self.mem = mem
-    self.cache = {}  # type: Dict[str, str]
+    self.cache = {}  # type: Dict[str, str]  # for 'hash'
+
+    self.path_val = None  # type: value__Str  # what path_dirs was split from
+    self.path_dirs = []  # type: List[str]
+    self.dirs = {}  # type: Dict[str, _PathDir]
+
+  def _PathDirs(self):
+    # type: () -> List[str]
+    val = self.mem.GetValue('PATH')
+    UP_val = val
+    if val.tag_() != value_e.Str:
+      return []  # treat as empty path
+    val = cast(value__Str, UP_val)
+
+    if val is not self.path_val:  # PATH was assigned
+      self.path_val = val
+      self.path_dirs = val.s.split(':')
+      # Like bash, forget the locations of commands
+      self.cache.clear()
+
+      if len(self.dirs) > _MAX_PATH_DIRS:
+        dirs = {}  # type: Dict[str, _PathDir]
+        for path_dir in self.path_dirs:
+          if path_dir in self.dirs:
+            dirs[path_dir] = self.dirs[path_dir]
+        self.dirs = dirs
+
+    return self.path_dirs
+
+  def _Dir(self, path_dir, validate):
+    # type: (str, bool) -> Optional[_PathDir]
+    """Returns the index of an absolute directory, or None if it's missing."""
+    d = self.dirs.get(path_dir)
+    if d is not None and not validate:
+      return d
+
+    mtime = pyos.DirMtime(path_dir)
+    if mtime < 0.0:
+      mylib.dict_remove(self.dirs, path_dir)
+      return None
+
+    if d is None or d.mtime != mtime:
+      names = {}  # type: Dict[str, bool]
+      for name in pyos.ListDir(path_dir):
+        names[name] = True
+
+      # Files created in the same clock tick as the listing don't change the
+      # mtime, so list a recently changed directory again next time.
+      now, _, _ = pyos.Time()
+      if mtime > now - _RACY_SECONDS:
+        mtime = -1.0
+
+      d = _PathDir(mtime, names)
+      self.dirs[path_dir] = d
+    return d
 
   def Lookup(self, name, exec_required=True):
     # type: (str, bool) -> Optional[str]
@@ -84,17 +169,33 @@ class SearchPath(object):
       else:
         return None
 
-    # TODO: Could cache this computation to avoid allocating every time for all
-    # the splitting.
-    val = self.mem.GetValue('PATH')
-    UP_val = val
-    if val.tag_() == value_e.Str:
-      val = cast(value__Str, UP_val)
-      path_list = val.s.split(':')
-    else:
-      path_list = []  # treat as empty path
+    path_dirs = self._PathDirs()
+    n = len(path_dirs)
+    i = self._Search(name, path_dirs, n, exec_required, False)
+
+    # The file may have been created in an earlier directory since we listed
+    # it, so check their mtimes.
+    limit = n if i == -1 else i
+    j = self._Search(name, path_dirs, limit, exec_required, True)
+    if j != -1:
+      i = j
+
+    if i == -1:
+      return None
+    return os_path.join(path_dirs[i], name)
+
+  def _Search(self, name, path_dirs, limit, exec_required, validate):
+    # type: (str, List[str], int, bool, bool) -> int
+    """Returns the index of the first directory with the file, or -1."""
+    for i in xrange(limit):
+      path_dir = path_dirs[i]
+      # Relative entries like '' and '.' depend on the current dir, so they
+      # aren't indexed.
+      if path_dir.startswith('/'):
+        d = self._Dir(path_dir, validate)
+        if d is None or name not in d.names:
+          continue
 
-    for path_dir in path_list:
       full_path = os_path.join(path_dir, name)
 
       # NOTE: dash and bash only check for EXISTENCE in 'command -v' (and 'type
@@ -106,12 +207,14 @@ class SearchPath(object):
         found = path_stat.exists(full_path)  # for 'source'
 
       if found:
-        return full_path
+        return i
 
-    return None
+    return -1
 
   def CachedLookup(self, name):
     # type: (str) -> Optional[str]
+    self._PathDirs()  # clears the cache if PATH changed
+
     if name in self.cache:
       return self.cache[name]
 
@@ -129,11 +232,29 @@ class SearchPath(object):
     # type: () -> None
     """For hash -r."""
     self.cache.clear()
+    self.dirs.clear()
 
   def CachedCommands(self):
     # type: () -> List[str]
+    self._PathDirs()  # clears the cache if PATH changed
     return self.cache.values()
 
+  def Executables(self):
+    # type: () -> List[str]
+    """Names of executable files in $PATH, for completion."""
+    executables = []  # type: List[str]
+    for path_dir in self._PathDirs():
+      if path_dir.startswith('/'):
+        d = self._Dir(path_dir, True)
+        if d is None:
+          continue
+        if d.executables is None:
+          d.executables = _Executables(path_dir, d.names.keys())
+        executables.extend(d.executables)
+      else:
+        executables.extend(_Executables(path_dir, pyos.ListDir(path_dir)))
+    return executables
+
 
 class ctx_Source(object):
   """For source builtin."""
@@ -963,6 +1084,10 @@ class Mem(object):
     self.argv_stack = [_ArgFrame(argv)]
     self.var_stack = [{}]  # type: List[Dict[str, cell]]
 
+    # What GetExported() returns, or None when an exported cell has changed
+    # since it was computed.
+    self.exported_cache = None  # type: Dict[str, str]
+
     self.arena = arena
 
     # The debug_stack isn't strictly necessary for execution.  We use it for
@@ -1107,7 +1232,7 @@ class Mem(object):
   def PopCall(self):
     # type: () -> None
     self._PopDebugStack()
-    self.var_stack.pop()
+    self._PopScope()
     self.argv_stack.pop()
 
   def PushSource(self, source_name, argv):
@@ -1138,7 +1263,15 @@ class Mem(object):
   def PopTemp(self):
     # type: () -> None
     self._PopDebugStack()
-    self.var_stack.pop()
+    self._PopScope()
+
+  def _PopScope(self):
+    # type: () -> None
+    scope = self.var_stack.pop()
+    for _, cell in iteritems(scope):
+      if cell.exported:  # e.g. FOO=bar in 'FOO=bar ls'
+        self.exported_cache = None
+        break
 
   def TopNamespace(self):
     # type: () -> Dict[str, runtime_asdl.cell]
@@ -1435,6 +1568,9 @@ class Mem(object):
                                                              ref_required)
 
         if cell:
+          if cell.exported:  # its value or flag may change
+            self.exported_cache = None
+
           # Clear before checking readonly bit.
           # NOTE: Could be cell.flags &= flag_clear_mask 
           if flags & ClearExport:
@@ -1456,6 +1592,7 @@ class Mem(object):
           # NOTE: Could be cell.flags |= flag_set_mask 
           if flags & SetExport:
             cell.exported = True
+            self.exported_cache = None
           if flags & SetReadOnly:
             cell.readonly = True
           if flags & SetNameref:
@@ -1471,6 +1608,8 @@ class Mem(object):
                                    bool(flags & SetNameref),
                                    val)
           name_map[cell_name] = cell
+          if cell.exported:
+            self.exported_cache = None
 
         # Maintain invariant that only strings and undefined cells can be
         # exported.
@@ -1609,6 +1748,8 @@ class Mem(object):
     """
     cell = self.var_stack[0][name]
     cell.val = new_val
+    if cell.exported:
+      self.exported_cache = None
 
   def GetValue(self, name, which_scopes=scope_e.Shopt):
     # type: (str, scope_t) -> value_t
@@ -1772,6 +1913,8 @@ class Mem(object):
         # Make variables in higher scopes visible.
         # example: test/spec.sh builtin-vars -r 24 (ble.sh)
         del name_map[cell_name]
+        if cell.exported:
+          self.exported_cache = None
 
         # alternative that some shells use:
         #   name_map[cell_name].val = value.Undef()
@@ -1857,6 +2000,8 @@ class Mem(object):
     cell, name_map = self._ResolveNameOnly(name, self.ScopesForReading())
     if cell:
       if flag & ClearExport:
+        if cell.exported:
+          self.exported_cache = None
         cell.exported = False
       if flag & ClearNameref:
         cell.nameref = False
@@ -1866,11 +2011,17 @@ class Mem(object):
 
   def GetExported(self):
     # type: () -> Dict[str, str]
-    """Get all the variables that are marked exported."""
-    # TODO: This is run on every SimpleCommand.  Should we have a dirty flag?
-    # We have to notice these things:
-    # - If an exported variable is changed.
-    # - If the set of exported variables changes.
+    """Get all the variables that are marked exported.
+
+    This is run for every external command, so the result is cached until
+    one of these things happens:
+    - An exported variable is changed, or exported or unexported.
+    - An exported variable is unset, or its scope is popped.
+
+    Callers must not mutate the returned dict.
+    """
+    if self.exported_cache is not None:
+      return self.exported_cache
 
     exported = {}  # type: Dict[str, str]
     # Search from globals up.  Names higher on the stack will overwrite names
@@ -1882,6 +2033,7 @@ class Mem(object):
         if cell.exported and cell.val.tag_() == value_e.Str:
           val = cast(value__Str, cell.val)
           exported[name] = val.s
+    self.exported_cache = exported
     return exported
 
   def VarNames(self):
@@ -5,6 +5,7 @@ state_test.py: Tests for state.py
 
 import unittest
 import os.path
+import shutil
 
 from _devbuild.gen.runtime_asdl import scope_e, lvalue, value, value_e
 from core import error
@@ -59,6 +60,48 @@ class MemTest(unittest.TestCase):
     else:
         self.assertEqual(search_path.Lookup('env'), '/usr/bin/env')
 
+  def testSearchPathIndex(self):
+    mem = _InitMem()
+    search_path = state.SearchPath(mem)
+
+    tmp_dir = os.path.abspath('_tmp/search-path')
+    if os.path.exists(tmp_dir):
+      shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    mem.SetValue(lvalue.Named('PATH'), value.Str(tmp_dir + ':/bin:/usr/bin'),
+                 scope_e.GlobalOnly)
+    self.assertEqual(None, search_path.CachedLookup('foo'))
+
+    # A new file is found, even within the directory's mtime resolution
+    foo = os.path.join(tmp_dir, 'foo')
+    with open(foo, 'w') as f:
+      f.write('echo hi\n')
+    self.assertEqual(None, search_path.Lookup('foo'))
+    self.assertEqual(foo, search_path.Lookup('foo', exec_required=False))
+    os.chmod(foo, 0o755)
+    self.assertEqual(foo, search_path.CachedLookup('foo'))
+    self.assertIn('foo', search_path.Executables())
+
+    # Assigning PATH clears the hash table, like bash
+    self.assertEqual([foo], search_path.CachedCommands())
+    mem.SetValue(lvalue.Named('PATH'), value.Str('/bin:/usr/bin'),
+                 scope_e.GlobalOnly)
+    self.assertEqual([], search_path.CachedCommands())
+    self.assertEqual(None, search_path.CachedLookup('foo'))
+
+    # A file created in an earlier directory shadows the indexed one
+    dir_a = os.path.join(tmp_dir, 'a')
+    dir_b = os.path.join(tmp_dir, 'b')
+    os.makedirs(dir_a)
+    os.makedirs(dir_b)
+    mem.SetValue(lvalue.Named('PATH'), value.Str(dir_a + ':' + dir_b),
+                 scope_e.GlobalOnly)
+    for d in [dir_b, dir_a]:
+      bar = os.path.join(d, 'bar')
+      with open(bar, 'w') as f:
+        f.write('echo hi\n')
+      os.chmod(bar, 0o755)
+      self.assertEqual(bar, search_path.Lookup('bar'))
 
   def testPushTemp(self):
     mem = _InitMem()
@@ -269,6 +312,40 @@ class MemTest(unittest.TestCase):
     e = mem.GetExported()
     self.assertEqual('u', e['U'])
 
+  def testExportedCache(self):
+    mem = _InitMem()
+    mem.SetValue(
+        lvalue.Named('E'), value.Str('1'), scope_e.Dynamic,
+        flags=state.SetExport)
+    e = mem.GetExported()
+    self.assertEqual('1', e['E'])
+
+    # Unexported variables don't invalidate it
+    mem.SetValue(lvalue.Named('x'), value.Str('y'), scope_e.Dynamic)
+    self.assertIs(e, mem.GetExported())
+
+    mem.SetValue(lvalue.Named('E'), value.Str('2'), scope_e.Dynamic)
+    self.assertEqual('2', mem.GetExported()['E'])
+
+    # FOO=bar ls
+    mem.PushTemp()
+    mem.SetValue(
+        lvalue.Named('FOO'), value.Str('bar'), scope_e.LocalOnly,
+        flags=state.SetExport)
+    self.assertEqual('bar', mem.GetExported()['FOO'])
+    mem.PopTemp()
+    self.assertNotIn('FOO', mem.GetExported())
+
+    # export -n E
+    mem.ClearFlag('E', state.ClearExport)
+    self.assertNotIn('E', mem.GetExported())
+
+    mem.SetValue(
+        lvalue.Named('E'), None, scope_e.Dynamic, flags=state.SetExport)
+    self.assertEqual('2', mem.GetExported()['E'])
+    mem.Unset(lvalue.Named('E'), scope_e.Dynamic)
+    self.assertNotIn('E', mem.GetExported())
+
   def testUnset(self):
     mem = _InitMem()
     # unset a
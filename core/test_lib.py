@@ -208,6 +208,7 @@ def InitCommandEvaluator(parse_ctx=None, comp_lookup=None, arena=None, mem=None,
   cmd_deps = cmd_eval.Deps()
   cmd_deps.mutable_opts = mutable_opts
   cmd_deps.trap_nodes = []
+  cmd_deps.parse_ctx = parse_ctx
 
   search_path = state.SearchPath(mem)
 
@@ -242,7 +243,7 @@ def InitCommandEvaluator(parse_ctx=None, comp_lookup=None, arena=None, mem=None,
                       prompt_ev, tracer)
 
   spec_builder = builtin_comp.SpecBuilder(cmd_ev, parse_ctx, word_ev, splitter,
-                                          comp_lookup)
+                                          comp_lookup, search_path)
   # Add some builtins that depend on the executor!
   complete_builtin = builtin_comp.Complete(spec_builder, comp_lookup)
   builtins[builtin_i.complete] = complete_builtin
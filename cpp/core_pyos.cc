@@ -1,17 +1,22 @@
 // core_pyos.cc
 
 #include "core_pyos.h"  // undefined errno
+#include <dirent.h>  // opendir()
 #include <errno.h>
+#include <fcntl.h>  // splice()
 #include <pwd.h>
 #include <signal.h>
-#include <unistd.h>  // getuid()
+#include <sys/resource.h>  // getrusage()
+#include <sys/sendfile.h>
+#include <sys/time.h>  // gettimeofday()
+#include <unistd.h>  // getuid(), copy_file_range()
 
 static Str* CopyStr(const char* s) {
   int n = strlen(s);
   char* buf = static_cast<char*>(malloc(n + 1));
   strcpy(buf, s);  // includes NUL terminator
 
-  return new Str(s, n);
+  return new Str(buf, n);
 }
 
 namespace pyos {
@@ -47,10 +52,125 @@ Str* GetHomeDir(Str* user_name) {
   return CopyStr(entry->pw_dir);
 }
 
+// See CopyFd() in core/pyos.py
+Tuple3<double, double, double> Time() {
+  struct timeval now;
+  ::gettimeofday(&now, nullptr);
+  struct rusage ru;
+  ::getrusage(RUSAGE_SELF, &ru);
+  return Tuple3<double, double, double>(
+      now.tv_sec + now.tv_usec / 1e6,
+      ru.ru_utime.tv_sec + ru.ru_utime.tv_usec / 1e6,
+      ru.ru_stime.tv_sec + ru.ru_stime.tv_usec / 1e6);
+}
+
+double DirMtime(Str* path) {
+  mylib::Str0 path0(path);
+  struct stat st;
+  if (::stat(path0.Get(), &st) < 0) {
+    return -1.0;
+  }
+  return st.st_mtim.tv_sec + st.st_mtim.tv_nsec / 1e9;
+}
+
+List<Str*>* ListDir(Str* path) {
+  auto result = new List<Str*>();
+  mylib::Str0 path0(path);
+  DIR* dir = ::opendir(path0.Get());
+  if (dir == nullptr) {
+    return result;
+  }
+  while (struct dirent* ent = ::readdir(dir)) {
+    if (strcmp(ent->d_name, ".") == 0 || strcmp(ent->d_name, "..") == 0) {
+      continue;
+    }
+    result->append(CopyStr(ent->d_name));
+  }
+  ::closedir(dir);
+  return result;
+}
+
+static bool CopyUnsupported(int err) {
+  return err == EINVAL || err == ENOSYS || err == EXDEV || err == EBADF ||
+         err == EOPNOTSUPP;
+}
+
+const int kCopySize = 1 << 24;
+
+// Returns 0 at EOF, -1 if this way of copying doesn't work, or an errno.
+static int KernelCopy(int how, int src_fd, int dst_fd) {
+  while (true) {
+    ssize_t n;
+    switch (how) {
+    case 0:
+      n = copy_file_range(src_fd, nullptr, dst_fd, nullptr, kCopySize, 0);
+      break;
+    case 1:
+      n = sendfile(dst_fd, src_fd, nullptr, kCopySize);
+      break;
+    default:
+      n = splice(src_fd, nullptr, dst_fd, nullptr, kCopySize, SPLICE_F_MOVE);
+      break;
+    }
+    if (n == 0) {
+      return 0;
+    }
+    if (n < 0) {
+      if (errno == EINTR) {
+        continue;
+      }
+      return CopyUnsupported(errno) ? -1 : errno;
+    }
+  }
+}
+
+int CopyFd(int src_fd, int dst_fd) {
+  int first = 2;  // splice() only
+  if (IsRegularFile(src_fd)) {
+    first = IsRegularFile(dst_fd) ? 0 : 1;
+  }
+  for (int how = first; how <= 2; ++how) {
+    int err = KernelCopy(how, src_fd, dst_fd);
+    if (err != -1) {
+      return err;
+    }
+  }
+
+  char buf[65536];
+  while (true) {
+    ssize_t n = read(src_fd, buf, sizeof(buf));
+    if (n == 0) {
+      return 0;
+    }
+    if (n < 0) {
+      if (errno == EINTR) {
+        continue;
+      }
+      return errno;
+    }
+    char* p = buf;
+    while (n > 0) {
+      ssize_t written = write(dst_fd, p, n);
+      if (written < 0) {
+        if (errno == EINTR) {
+          continue;
+        }
+        return errno;
+      }
+      p += written;
+      n -= written;
+    }
+  }
+}
+
 void SignalState_AfterForkingChild() {
   signal(SIGQUIT, SIG_DFL);
   signal(SIGPIPE, SIG_DFL);
   signal(SIGTSTP, SIG_DFL);
 }
 
+List<int>* SignalState_ChildDefaults() {
+  return new List<int>({SIGQUIT, SIGPIPE, SIGTSTP});
+}
+
 }  // namespace pyos
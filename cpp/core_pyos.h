@@ -3,6 +3,7 @@
 #ifndef CORE_PYOS_H
 #define CORE_PYOS_H
 
+#include <sys/stat.h>
 #include <termios.h>
 
 #include "mylib.h"
@@ -26,9 +27,7 @@ inline Str* OsType() {
   return new Str("TODO");
 }
 
-inline Tuple3<double, double, double> Time() {
-  assert(0);
-}
+Tuple3<double, double, double> Time();
 
 inline void PrintTimes() {
   assert(0);
@@ -48,7 +47,21 @@ inline bool InputAvailable(int fd) {
   assert(0);
 }
 
+inline bool IsRegularFile(int fd) {
+  struct stat st;
+  if (::fstat(fd, &st) < 0) {
+    return false;
+  }
+  return S_ISREG(st.st_mode);
+}
+
+double DirMtime(Str* path);
+List<Str*>* ListDir(Str* path);
+
+int CopyFd(int src_fd, int dst_fd);
+
 void SignalState_AfterForkingChild();
+List<int>* SignalState_ChildDefaults();
 
 class SignalState {
  public:
@@ -12,5 +12,6 @@ int EACCES = EACCES;
 int ENOENT = ENOEXEC;
 int ECHILD = ECHILD;
 int EINTR = EINTR;
+int EEXIST = EEXIST;
 
 }  // namespace errno_
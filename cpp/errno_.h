@@ -14,6 +14,7 @@
 #undef ENOENT
 #undef ECHILD
 #undef EINTR
+#undef EEXIST
 
 namespace errno_ {
 
@@ -23,6 +24,7 @@ extern int EACCES;
 extern int ENOENT;
 extern int ECHILD;
 extern int EINTR;
+extern int EEXIST;
 
 }  // namespace errno_
 
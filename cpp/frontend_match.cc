@@ -115,4 +115,135 @@ int MatchOption(Str* s) {
   return id;
 }
 
+// IFS splitting.  This follows _IFS_EDGES in frontend/consts.py, like
+// native/fastlex.c.  Keep them in sync.
+
+enum { CH_White, CH_Gray, CH_Black, CH_Backslash, CH_Sentinel };
+
+enum {
+  ST_Start,
+  ST_White1,
+  ST_Gray,
+  ST_White2,
+  ST_Black,
+  ST_Backslash,
+  ST_Done,
+  ST_Invalid
+};
+
+enum { EMIT_Nothing, EMIT_Part, EMIT_Delim, EMIT_Empty, EMIT_Escape };
+
+struct IfsEdge {
+  unsigned char new_state;
+  unsigned char emit;
+};
+
+// Indexed by state, then char kind
+static const IfsEdge kIfsEdges[6][5] = {
+    // ST_Start.  Leading whitespace was already skipped.
+    {{ST_Invalid, EMIT_Nothing},
+     {ST_Gray, EMIT_Empty},
+     {ST_Black, EMIT_Nothing},
+     {ST_Backslash, EMIT_Nothing},
+     {ST_Done, EMIT_Nothing}},
+    // ST_White1
+    {{ST_White1, EMIT_Nothing},
+     {ST_Gray, EMIT_Nothing},
+     {ST_Black, EMIT_Delim},
+     {ST_Backslash, EMIT_Delim},
+     {ST_Done, EMIT_Nothing}},
+    // ST_Gray
+    {{ST_White2, EMIT_Nothing},
+     {ST_Gray, EMIT_Empty},
+     {ST_Black, EMIT_Delim},
+     {ST_Black, EMIT_Delim},
+     {ST_Done, EMIT_Delim}},
+    // ST_White2
+    {{ST_White2, EMIT_Nothing},
+     {ST_Gray, EMIT_Empty},
+     {ST_Black, EMIT_Delim},
+     {ST_Backslash, EMIT_Delim},
+     {ST_Done, EMIT_Delim}},
+    // ST_Black
+    {{ST_White1, EMIT_Part},
+     {ST_Gray, EMIT_Part},
+     {ST_Black, EMIT_Nothing},
+     {ST_Backslash, EMIT_Part},
+     {ST_Done, EMIT_Part}},
+    // ST_Backslash
+    {{ST_Black, EMIT_Escape},
+     {ST_Black, EMIT_Escape},
+     {ST_Black, EMIT_Escape},
+     {ST_Black, EMIT_Escape},
+     {ST_Done, EMIT_Escape}},
+};
+
+List<Tuple2<runtime_asdl::span_t, int>*>* IfsSplit(Str* s,
+                                                    Str* ifs_whitespace,
+                                                    Str* ifs_other,
+                                                    bool allow_escape) {
+  using runtime_asdl::span_e;
+  typedef Tuple2<runtime_asdl::span_t, int> Span;
+
+  auto spans = new List<Span*>();
+  const unsigned char* str = reinterpret_cast<const unsigned char*>(s->data_);
+  int n = s->len_;
+  if (n == 0) {
+    return spans;
+  }
+
+  // Classify each byte once
+  unsigned char kinds[256];
+  memset(kinds, CH_Black, sizeof(kinds));
+  for (int i = 0; i < ifs_other->len_; ++i) {
+    kinds[static_cast<unsigned char>(ifs_other->data_[i])] = CH_Gray;
+  }
+  for (int i = 0; i < ifs_whitespace->len_; ++i) {
+    kinds[static_cast<unsigned char>(ifs_whitespace->data_[i])] = CH_White;
+  }
+  if (allow_escape && kinds['\\'] == CH_Black) {
+    kinds['\\'] = CH_Backslash;
+  }
+
+  // Ad hoc rule from POSIX: ignore leading whitespace.
+  int i = 0;
+  while (i < n && kinds[str[i]] == CH_White) {
+    i++;
+  }
+  if (i != 0) {
+    spans->append(new Span(span_e::Delim, i));
+  }
+  if (i == n) {
+    return spans;  // only whitespace
+  }
+
+  int state = ST_Start;
+  while (state != ST_Done) {
+    int ch = i < n ? kinds[str[i]] : CH_Sentinel;
+    IfsEdge edge = kIfsEdges[state][ch];
+    assert(edge.new_state != ST_Invalid);
+
+    switch (edge.emit) {
+    case EMIT_Part:
+      spans->append(new Span(span_e::Black, i));
+      break;
+    case EMIT_Delim:
+      spans->append(new Span(span_e::Delim, i));  // ignored delimiter
+      break;
+    case EMIT_Empty:
+      // ignored delimiter, then an EMPTY part that is NOT ignored
+      spans->append(new Span(span_e::Delim, i));
+      spans->append(new Span(span_e::Black, i));
+      break;
+    case EMIT_Escape:
+      spans->append(new Span(span_e::Backslash, i));
+      break;
+    }
+
+    state = edge.new_state;
+    i++;
+  }
+  return spans;
+}
+
 }  // namespace match
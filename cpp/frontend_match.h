@@ -8,6 +8,7 @@
 #include "id_kind_asdl.h"  // syntax.asdl depends on this
 using id_kind_asdl::Id_t;  // TODO: proper ASDL modules
 
+#include "runtime_asdl.h"
 #include "syntax_asdl.h"
 #include "types_asdl.h"
 
@@ -61,6 +62,12 @@ bool IsValidVarName(Str* s);
 
 int MatchOption(Str* s);
 
+// IFS splitting, returning (span, end_index) pairs
+List<Tuple2<runtime_asdl::span_t, int>*>* IfsSplit(Str* s,
+                                                    Str* ifs_whitespace,
+                                                    Str* ifs_other,
+                                                    bool allow_escape);
+
 }  // namespace match
 
 #endif  // MATCH_H
@@ -4,6 +4,8 @@
 #include <glob.h>
 #include <regex.h>
 
+#include <vector>
+
 namespace libc {
 
 List<Str*>* glob(Str* pat) {
@@ -62,6 +64,62 @@ List<Str*>* glob(Str* pat) {
   return matches;
 }
 
+// A small cache of compiled regexes, like the one in native/libc.c.  The
+// most recently used entry is first.
+
+const int REGEX_CACHE_SIZE = 32;
+
+struct RegexEntry {
+  char* pattern;
+  int cflags;
+  regex_t re;
+};
+
+static RegexEntry* regex_cache[REGEX_CACHE_SIZE];
+static int regex_cache_len = 0;
+static int regex_cache_hits = 0;
+static int regex_cache_misses = 0;
+
+// Raises RuntimeError if the pattern is invalid.
+static regex_t* CompileRegex(const char* pattern, int cflags) {
+  for (int i = 0; i < regex_cache_len; ++i) {
+    RegexEntry* e = regex_cache[i];
+    if (e->cflags == cflags && strcmp(e->pattern, pattern) == 0) {
+      memmove(regex_cache + 1, regex_cache, i * sizeof(RegexEntry*));
+      regex_cache[0] = e;
+      regex_cache_hits++;
+      return &e->re;
+    }
+  }
+  regex_cache_misses++;
+
+  auto e = static_cast<RegexEntry*>(malloc(sizeof(RegexEntry)));
+  int status = regcomp(&e->re, pattern, cflags);
+  if (status != 0) {
+    char* error_string = static_cast<char*>(malloc(80));
+    regerror(status, &e->re, error_string, 80);
+    free(e);
+    throw new RuntimeError(new Str(error_string));
+  }
+  e->pattern = strdup(pattern);
+  e->cflags = cflags;
+
+  if (regex_cache_len == REGEX_CACHE_SIZE) {
+    RegexEntry* last = regex_cache[--regex_cache_len];
+    regfree(&last->re);
+    free(last->pattern);
+    free(last);
+  }
+  memmove(regex_cache + 1, regex_cache, regex_cache_len * sizeof(RegexEntry*));
+  regex_cache[0] = e;
+  regex_cache_len++;
+  return &e->re;
+}
+
+Tuple2<int, int> regex_cache_stats() {
+  return Tuple2<int, int>(regex_cache_hits, regex_cache_misses);
+}
+
 // Raises RuntimeError if the pattern is invalid.  TODO: Use a different
 // exception?
 List<Str*>* regex_match(Str* pattern, Str* str) {
@@ -70,18 +128,14 @@ List<Str*>* regex_match(Str* pattern, Str* str) {
   mylib::Str0 pattern0(pattern);
   mylib::Str0 str0(str);
 
-  regex_t pat;
-  if (regcomp(&pat, pattern0.Get(), REG_EXTENDED) != 0) {
-    // TODO: check error code, as in func_regex_parse()
-    throw new RuntimeError(new Str("Invalid regex syntax (regex_match)"));
-  }
+  regex_t* pat = CompileRegex(pattern0.Get(), REG_EXTENDED);
 
-  int outlen = pat.re_nsub + 1;  // number of captures
+  int outlen = pat->re_nsub + 1;  // number of captures
 
   int match;
   const char* s0 = str0.Get();
   regmatch_t* pmatch = (regmatch_t*)malloc(sizeof(regmatch_t) * outlen);
-  if (match = (regexec(&pat, s0, outlen, pmatch, 0) == 0)) {
+  if (match = (regexec(pat, s0, outlen, pmatch, 0) == 0)) {
     int i;
     for (i = 0; i < outlen; i++) {
       int len = pmatch[i].rm_eo - pmatch[i].rm_so;
@@ -91,7 +145,6 @@ List<Str*>* regex_match(Str* pattern, Str* str) {
   }
 
   free(pmatch);
-  regfree(&pat);
 
   if (!match) {
     return nullptr;
@@ -112,7 +165,6 @@ Tuple2<int, int>* regex_first_group_match(Str* pattern, Str* str, int pos) {
   mylib::Str0 pattern0(pattern);
   mylib::Str0 str0(str);
 
-  regex_t pat;
   regmatch_t m[NMATCH];
 
   const char* old_locale = setlocale(LC_CTYPE, NULL);
@@ -124,14 +176,10 @@ Tuple2<int, int>* regex_first_group_match(Str* pattern, Str* str, int pos) {
   // Could have been checked by regex_parse for [[ =~ ]], but not for glob
   // patterns like ${foo/x*/y}.
 
-  if (regcomp(&pat, pattern0.Get(), REG_EXTENDED) != 0) {
-    throw new RuntimeError(
-        new Str("Invalid regex syntax (func_regex_first_group_match)"));
-  }
+  regex_t* pat = CompileRegex(pattern0.Get(), REG_EXTENDED);
 
   // Match at offset 'pos'
-  int result = regexec(&pat, str0.Get() + pos, NMATCH, m, 0 /*flags*/);
-  regfree(&pat);
+  int result = regexec(pat, str0.Get() + pos, NMATCH, m, 0 /*flags*/);
 
   setlocale(LC_CTYPE, old_locale);
 
@@ -145,4 +193,76 @@ Tuple2<int, int>* regex_first_group_match(Str* pattern, Str* str, int pos) {
   return new Tuple2<int, int>(pos + start, pos + end);
 }
 
+// Length of the UTF-8 character that starts with byte c.
+static int Utf8CharLen(unsigned char c) {
+  if (c >= 0xF0) return 4;
+  if (c >= 0xE0) return 3;
+  if (c >= 0xC0) return 2;
+  return 1;
+}
+
+Str* regex_sub_all(Str* pattern, Str* str, Str* replace_str) {
+  mylib::Str0 pattern0(pattern);
+  mylib::Str0 str0(str);
+  const char* s = str0.Get();
+  int str_len = len(str);
+
+  const char* old_locale = setlocale(LC_CTYPE, NULL);
+
+  if (setlocale(LC_CTYPE, "") == NULL) {
+    throw new RuntimeError(new Str("Invalid locale for LC_CTYPE"));
+  }
+
+  regex_t* pat = CompileRegex(pattern0.Get(), REG_EXTENDED);
+
+  // Collect (start, end) pairs, then copy everything into the result once.
+  std::vector<int> spans;
+  int result_len = str_len;
+
+  // An empty string is searched once, so ${s//*/x} with s='' gives x
+  int pos = 0;
+  do {
+    regmatch_t m;
+    int eflags = pos == 0 ? 0 : REG_NOTBOL;
+    if (regexec(pat, s + pos, 1, &m, eflags) != 0) {
+      break;
+    }
+    int start = pos + m.rm_so;
+    int end = pos + m.rm_eo;
+    if (start == end && start == str_len && str_len > 0) {
+      break;  // Don't replace an empty match at the end
+    }
+    spans.push_back(start);
+    spans.push_back(end);
+    result_len += len(replace_str) - (end - start);
+
+    if (end > start) {
+      pos = end;
+    } else {
+      pos = end + Utf8CharLen(static_cast<unsigned char>(s[end]));
+    }
+  } while (pos < str_len);
+
+  setlocale(LC_CTYPE, old_locale);
+
+  if (spans.empty()) {
+    return str;
+  }
+
+  char* buf = static_cast<char*>(malloc(result_len + 1));
+  char* out = buf;
+  int prev_end = 0;
+  for (size_t i = 0; i < spans.size(); i += 2) {
+    int start = spans[i];
+    memcpy(out, s + prev_end, start - prev_end);
+    out += start - prev_end;
+    memcpy(out, replace_str->data_, len(replace_str));
+    out += len(replace_str);
+    prev_end = spans[i + 1];
+  }
+  memcpy(out, s + prev_end, str_len - prev_end);
+  buf[result_len] = '\0';
+  return new Str(buf, result_len);
+}
+
 }  // namespace libc
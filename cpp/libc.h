@@ -33,8 +33,12 @@ List<Str*>* glob(Str* pat);
 
 List<Str*>* regex_match(Str* pattern, Str* str);
 
+Tuple2<int, int> regex_cache_stats();
+
 Tuple2<int, int>* regex_first_group_match(Str* pattern, Str* str, int pos);
 
+Str* regex_sub_all(Str* pattern, Str* str, Str* replace_str);
+
 inline void print_time(double real, double user, double sys) {
   assert(0);
 }
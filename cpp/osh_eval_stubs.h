@@ -31,6 +31,16 @@ class OilEvaluator {
 };
 }  // namespace expr_eval
 
+// The parse cache uses marshal, so it's only in the Python build.
+namespace parse_cache {
+class ParseCache {
+ public:
+  List<syntax_asdl::command_t*>* Parse(Str* path, mylib::LineReader* f) {
+    assert(0);
+  }
+};
+}  // namespace parse_cache
+
 namespace builtin_process {
 class _TrapHandler {
  public:
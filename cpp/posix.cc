@@ -2,7 +2,10 @@
 
 #include "posix.h"
 
+#include <errno.h>
 #include <fcntl.h>     // open
+#include <signal.h>    // sigset_t
+#include <spawn.h>     // posix_spawn
 #include <sys/wait.h>  // WUNTRACED
 #include <unistd.h>
 
@@ -12,10 +15,13 @@
 #undef W_OK
 #undef O_APPEND
 #undef O_CREAT
+#undef O_EXCL
 #undef O_RDONLY
 #undef O_RDWR
 #undef O_WRONLY
 #undef O_TRUNC
+#undef SEEK_CUR
+#undef SEEK_SET
 
 namespace posix {
 
@@ -25,14 +31,94 @@ int R_OK = R_OK;
 int W_OK = W_OK;
 int O_APPEND = O_APPEND_;
 int O_CREAT = O_CREAT_;
+int O_EXCL = O_EXCL_;
 int O_RDONLY = O_RDONLY_;
 int O_RDWR = O_RDWR_;
 int O_WRONLY = O_WRONLY_;
 int O_TRUNC = O_TRUNC_;
+int SEEK_CUR = SEEK_CUR_;
+int SEEK_SET = SEEK_SET_;
 
 int open(Str* path, int mode, int perms) {
   mylib::Str0 path0(path);
   return ::open(path0.Get(), mode, perms);
 }
 
+Str* read_to_eof(int fd, bool strip_newlines) {
+  int cap = 4096;
+  int len = 0;
+  char* buf = static_cast<char*>(malloc(cap + 1));
+  while (true) {
+    if (len == cap) {
+      cap *= 2;
+      buf = static_cast<char*>(realloc(buf, cap + 1));
+    }
+    int n = ::read(fd, buf + len, cap - len);
+    if (n > 0) {
+      len += n;
+    } else if (n == 0) {  // EOF
+      break;
+    } else if (errno != EINTR) {
+      free(buf);
+      throw new AssertionError();  // TODO: throw with errno
+    }
+  }
+  if (strip_newlines) {
+    while (len > 0 && buf[len - 1] == '\n') {
+      len--;
+    }
+  }
+  buf[len] = '\0';
+  return new Str(buf, len);
+}
+
+int posix_spawn(Str* path, List<Str*>* argv, Dict<Str*, Str*>* environ,
+                List<int>* setsigdef) {
+  mylib::Str0 path0(path);
+
+  int n = len(argv);
+  // never deallocated, like execve()
+  char** _argv = static_cast<char**>(malloc((n + 1) * sizeof(char*)));
+  for (int i = 0; i < n; ++i) {
+    mylib::Str0 arg0(argv->index(i));
+    _argv[i] = strdup(arg0.Get());
+  }
+  _argv[n] = nullptr;
+
+  char** _env =
+      static_cast<char**>(malloc((len(environ) + 1) * sizeof(char*)));
+  int env_i = 0;
+  for (DictIter<Str*, Str*> it(environ); !it.Done(); it.Next()) {
+    Str* k = it.Key();
+    Str* v = it.Value();
+    char* pair = static_cast<char*>(malloc(len(k) + len(v) + 2));
+    memcpy(pair, k->data_, len(k));
+    pair[len(k)] = '=';
+    memcpy(pair + len(k) + 1, v->data_, len(v));
+    pair[len(k) + 1 + len(v)] = '\0';
+    _env[env_i++] = pair;
+  }
+  _env[env_i] = nullptr;
+
+  sigset_t sigdef;
+  sigemptyset(&sigdef);
+  for (int i = 0; i < len(setsigdef); ++i) {
+    sigaddset(&sigdef, setsigdef->index(i));
+  }
+
+  posix_spawnattr_t attr;
+  posix_spawnattr_init(&attr);
+  posix_spawnattr_setsigdefault(&attr, &sigdef);
+  posix_spawnattr_setflags(&attr, POSIX_SPAWN_SETSIGDEF);
+
+  pid_t pid;
+  int err = ::posix_spawn(&pid, path0.Get(), nullptr, &attr, _argv, _env);
+  posix_spawnattr_destroy(&attr);
+  if (err != 0) {
+    errno = err;
+    return -1;
+  }
+  return pid;
+}
+
 }  // namespace posix
@@ -14,20 +14,26 @@
 #define W_OK_ W_OK
 #define O_APPEND_ O_APPEND
 #define O_CREAT_ O_CREAT
+#define O_EXCL_ O_EXCL
 #define O_RDONLY_ O_RDONLY
 #define O_RDWR_ O_RDWR
 #define O_WRONLY_ O_WRONLY
 #define O_TRUNC_ O_TRUNC
+#define SEEK_CUR_ SEEK_CUR
+#define SEEK_SET_ SEEK_SET
 
 #undef X_OK
 #undef R_OK
 #undef W_OK
 #undef O_APPEND
 #undef O_CREAT
+#undef O_EXCL
 #undef O_RDONLY
 #undef O_RDWR
 #undef O_WRONLY
 #undef O_TRUNC
+#undef SEEK_CUR
+#undef SEEK_SET
 
 namespace posix {
 
@@ -37,10 +43,13 @@ extern int R_OK;
 extern int W_OK;
 extern int O_APPEND;
 extern int O_CREAT;
+extern int O_EXCL;
 extern int O_RDONLY;
 extern int O_RDWR;
 extern int O_WRONLY;
 extern int O_TRUNC;
+extern int SEEK_CUR;
+extern int SEEK_SET;
 
 inline int access(Str* pathname, int mode) {
   // Are there any errno I care about?
@@ -155,6 +164,22 @@ inline Str* read(int fd, int num_requested) {
 
 int open(Str* path, int mode, int perms);
 
+// Read until EOF into a buffer that doubles in size.
+Str* read_to_eof(int fd, bool strip_newlines);
+
+inline int lseek(int fd, int pos, int how) {
+  off_t result = ::lseek(fd, pos, how);
+  if (result < 0) {
+    throw new AssertionError();  // TODO: throw with errno
+  }
+  return result;
+}
+
+inline void unlink(Str* path) {
+  mylib::Str0 path0(path);
+  ::unlink(path0.Get());  // TODO: raise on error
+}
+
 inline mylib::LineReader* fdopen(int fd, Str* c_mode) {
   mylib::Str0 c_mode0(c_mode);
   FILE* f = ::fdopen(fd, c_mode0.Get());
@@ -182,6 +207,11 @@ inline void execve(Str* argv0, List<Str*>* argv, Dict<Str*, Str*>* environ) {
   ::execve(_argv0.Get(), _argv, nullptr);
 }
 
+// Returns the PID.  Unlike the Python version, errors return -1 rather than
+// raising, and core/process.py falls back to fork().
+int posix_spawn(Str* path, List<Str*>* argv, Dict<Str*, Str*>* environ,
+                List<int>* setsigdef);
+
 // Dummy exception posix::error
 class error {};
 
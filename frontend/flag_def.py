@@ -131,6 +131,9 @@ READ_SPEC.ShortFlag('-q', long_name='--qsn')
 
 MAPFILE_SPEC = FlagSpec('mapfile')
 MAPFILE_SPEC.ShortFlag('-t')
+MAPFILE_SPEC.ShortFlag('-d', args.String)
+MAPFILE_SPEC.ShortFlag('-n', args.Int)  # max number of lines, 0 for all
+MAPFILE_SPEC.ShortFlag('-s', args.Int)  # number of lines to skip
 
 
 CD_SPEC = FlagSpec('cd')
@@ -17,7 +17,7 @@ from mycpp import mylib
 from frontend import consts
 from frontend import match
 
-from typing import Callable, List, Tuple, Optional, Counter, TYPE_CHECKING
+from typing import Callable, Dict, List, Tuple, Optional, Counter, TYPE_CHECKING
 if TYPE_CHECKING:
   from core.alloc import Arena
   from core import optview
@@ -27,6 +27,13 @@ if TYPE_CHECKING:
 # Special immutable tokens
 _EOL_TOK = Token(Id.Eol_Tok, runtime.NO_SPID, None)
 
+# Flyweights for whitespace and line continuations, which the parsers skip
+# over.  They still get arena spans, so the spans add up to the source file
+# (tools/osh2oil.py relies on that), but they don't need a Token each.
+_SPACE_TOK = Token(Id.WS_Space, runtime.NO_SPID, None)
+_IGNORED_SPACE_TOK = Token(Id.Ignored_Space, runtime.NO_SPID, None)
+_LINE_CONT_TOK = Token(Id.Ignored_LineCont, runtime.NO_SPID, None)
+
 
 class LineLexer(object):
   def __init__(self, line, arena):
@@ -152,9 +159,99 @@ class LineLexer(object):
       self.last_span_id = span_id
     #log('LineLexer.Read() span ID %d for %s', span_id, tok_type)
 
-    t = Token(tok_type, span_id, tok_val)
     self.line_pos = end_pos
-    return t
+    if tok_type == Id.WS_Space:
+      return _SPACE_TOK
+    if tok_type == Id.Ignored_Space:
+      return _IGNORED_SPACE_TOK
+    if tok_type == Id.Ignored_LineCont:
+      return _LINE_CONT_TOK
+    return Token(tok_type, span_id, tok_val)
+
+
+if mylib.PYTHON:
+  _NO_VAL_IDS = {}  # type: Dict[Id_t, bool]
+
+  def _NoValIds():
+    # type: () -> Dict[Id_t, bool]
+    """Token IDs whose values we never look at.  See LineLexer.Read."""
+    if not _NO_VAL_IDS:
+      from _devbuild.gen.id_kind import ID_TO_KIND  # break circular dep
+
+      no_val = (Kind.Arith, Kind.Op, Kind.WS, Kind.Ignored, Kind.Eof)
+      for id_, kind in ID_TO_KIND.iteritems():
+        if kind in no_val:
+          _NO_VAL_IDS[id_] = True
+    return _NO_VAL_IDS
+
+  class BatchLineLexer(LineLexer):
+    """A LineLexer that matches the rest of the line in one native call.
+
+    match.LineTokens returns a flat [id, end_pos, ...] list.  We keep it as
+    long as the word parser keeps reading in the same lex_mode from where the
+    last token ended.  Any mode switch, unread, or new line starts a new batch
+    from the current position, so the tokens are the same as LineLexer's.
+
+    The C++ translation doesn't need this, since re2c is called directly.
+    """
+    def __init__(self, line, arena):
+      # type: (str, Arena) -> None
+      self.toks = None  # type: List[int]
+      self.toks_index = 0
+      self.toks_mode = None  # type: lex_mode_t
+      self.toks_pos = -1  # line_pos the batch is valid at
+      self.no_val = _NoValIds()
+      LineLexer.__init__(self, line, arena)
+
+    def Reset(self, line, line_id, line_pos):
+      # type: (str, int, int) -> None
+      LineLexer.Reset(self, line, line_id, line_pos)
+      self.toks_pos = -1
+
+    def Read(self, lex_mode):
+      # type: (lex_mode_t) -> Token
+      line_pos = self.line_pos
+
+      if line_pos != self.toks_pos or lex_mode != self.toks_mode:
+        self.toks = match.LineTokens(lex_mode, self.line, line_pos)
+        self.toks_index = 0
+        self.toks_mode = lex_mode
+
+      toks = self.toks
+      i = self.toks_index
+      tok_type = toks[i]
+      end_pos = toks[i+1]
+
+      if tok_type == Id.Eol_Tok:  # Do NOT add a span for this sentinel!
+        self.toks_pos = line_pos  # Eol again on the next call
+        return _EOL_TOK
+
+      if tok_type in self.no_val:
+        tok_val = None  # type: Optional[str]
+      else:
+        tok_val = self.line[line_pos:end_pos]
+
+      if self.arena_skip:  # make another token from the last span
+        assert self.last_span_id != runtime.NO_SPID
+        span_id = self.last_span_id
+        self.arena_skip = False
+      else:
+        span_id = self.arena.AddLineSpan(self.line_id, line_pos,
+                                         end_pos - line_pos)
+        self.last_span_id = span_id
+
+      i += 2
+      self.toks_index = i
+      # The batch stops early at an empty match
+      self.toks_pos = end_pos if i < len(toks) else -1
+      self.line_pos = end_pos
+      if tok_type == Id.WS_Space:
+        return _SPACE_TOK
+      if tok_type == Id.Ignored_Space:
+        return _IGNORED_SPACE_TOK
+      if tok_type == Id.Ignored_LineCont:
+        return _LINE_CONT_TOK
+      return Token(tok_type, span_id, tok_val)
 
 
 class Lexer(object):
@@ -264,8 +361,8 @@ class Lexer(object):
     # type: (lex_mode_t) -> Token
     while True:
       t = self._Read(lex_mode)
-      # TODO: Change to ALL IGNORED types, once you have SPACE_TOK.  This means
-      # we don't have to handle them in the VSub_1/VSub_2/etc. states.
+      # TODO: Change to ALL IGNORED types, now that we have _SPACE_TOK.  This
+      # means we don't have to handle them in the VSub_1/VSub_2/etc. states.
       if t.id != Id.Ignored_LineCont:
         break
 
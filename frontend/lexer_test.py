@@ -6,10 +6,26 @@ lexer_test.py: Tests for lexer.py
 import unittest
 
 from _devbuild.gen.id_kind_asdl import Id
+from _devbuild.gen.types_asdl import lex_mode_e
+from core import test_lib
 from core.test_lib import Tok
+from frontend import lexer  # module under test
+from frontend import match
 from frontend.lexer_def import LEXER_DEF
 
 
+def _ReadAll(line_lexer, line, modes):
+  """Read tokens with a list of lex modes, like the word parser does."""
+  line_lexer.Reset(line, 0, 0)
+  toks = []
+  for i, lex_mode in enumerate(modes):
+    if i == 3:
+      line_lexer.MaybeUnreadOne()
+    t = line_lexer.Read(lex_mode)
+    toks.append((t.id, t.val, t.span_id))
+  return toks
+
+
 class TokenTest(unittest.TestCase):
 
   def testToken(self):
@@ -35,6 +51,49 @@ class TokenTest(unittest.TestCase):
     print("Number of lex states: %d" % len(LEXER_DEF))
     print("Number of token dispatches: %d" % total)
 
+  def testBatchLineLexer(self):
+    if not match.LineTokens:
+      print('SKIPPING: fastlex not available')
+      return
+
+    line = 'echo "${x}" $((1+2)) # done\n'
+    modes = [
+        lex_mode_e.ShCommand, lex_mode_e.ShCommand, lex_mode_e.ShCommand,
+        lex_mode_e.DQ, lex_mode_e.DQ, lex_mode_e.VSub_1, lex_mode_e.VSub_2,
+        lex_mode_e.DQ, lex_mode_e.ShCommand, lex_mode_e.ShCommand,
+        lex_mode_e.Arith, lex_mode_e.Arith, lex_mode_e.Arith,
+        lex_mode_e.Arith, lex_mode_e.Arith, lex_mode_e.ShCommand,
+        lex_mode_e.ShCommand, lex_mode_e.Comment, lex_mode_e.ShCommand,
+        lex_mode_e.ShCommand, lex_mode_e.ShCommand,
+    ]
+
+    expected = _ReadAll(
+        lexer.LineLexer('', test_lib.MakeArena('')), line, modes)
+    actual = _ReadAll(
+        lexer.BatchLineLexer('', test_lib.MakeArena('')), line, modes)
+    self.assertEqual(expected, actual)
+
+    # The last two reads are both past the end
+    self.assertEqual(Id.Eol_Tok, actual[-1][0])
+    self.assertEqual(Id.Eol_Tok, actual[-2][0])
+
+  def testFlyweights(self):
+    arena = test_lib.MakeArena('')
+    line_lexer = lexer.LineLexer('', arena)
+    line_lexer.Reset('a  b \\\n', 0, 0)
+
+    toks = [line_lexer.Read(lex_mode_e.ShCommand) for _ in xrange(5)]
+    self.assertEqual(
+        [Id.Lit_Chars, Id.WS_Space, Id.Lit_Chars, Id.WS_Space,
+         Id.Ignored_LineCont],
+        [t.id for t in toks])
+
+    # Spaces share a Token, but still have spans, so they add up to the line.
+    self.assertIs(toks[1], toks[3])
+    self.assertEqual(5, arena.LastSpanId())
+    span = arena.GetLineSpan(1)
+    self.assertEqual((1, 2), (span.col, span.length))
+
   def testLineId(self):
     # TODO: Test that the lexer gives line_ids when passed an arena.
     # This might be more relevant if we start deallocating memroy.
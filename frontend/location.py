@@ -12,6 +12,7 @@ from _devbuild.gen.syntax_asdl import (
     command_e, command_t, command__Simple, command__Pipeline, command__AndOr,
     command__DoGroup, command__Sentence, command__Subshell,
     command__WhileUntil, command__If, command__Case, command__TimeBlock,
+    command__LazyBody,
     BraceGroup,
 
     arith_expr_e, arith_expr_t, compound_word, Token,
@@ -57,6 +58,9 @@ def SpanForCommand(node):
   if tag == command_e.BraceGroup:
     node = cast(BraceGroup, UP_node)
     return node.spids[0]  # { spid
+  if tag == command_e.LazyBody:
+    node = cast(command__LazyBody, UP_node)
+    return node.spids[0]  # { spid
   if tag == command_e.Subshell:
     node = cast(command__Subshell, UP_node)
     return node.spids[0]  # ( spid
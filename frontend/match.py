@@ -3,11 +3,17 @@ match.py - match with generated re2c code or Python regexes.
 """
 
 from _devbuild.gen.id_kind_asdl import Id, Id_t
+from _devbuild.gen.runtime_asdl import (
+    span_e, span_t, emit_i, char_kind_i, state_i
+)
 from _devbuild.gen.types_asdl import lex_mode_t
+from frontend import consts
 from frontend import lexer_def
 from frontend import option_def
 
-from typing import Iterator, Tuple, Callable, Dict, List, Any, TYPE_CHECKING
+from typing import (
+    Iterator, Tuple, Callable, Dict, List, Any, TYPE_CHECKING, cast
+)
 
 # bin/osh should work without compiling fastlex?  But we want all the unit
 # tests to run with a known version of it.
@@ -130,8 +136,90 @@ def _MatchBraceRangeToken_Fast(line, start_pos):
 #  return tok_type, end_pos
 
 
+def _IfsSplit_Fast(s, ifs_whitespace, ifs_other, allow_escape):
+  # type: (str, str, str, bool) -> List[Tuple[span_t, int]]
+  """Returns a list of (span, end_index) pairs."""
+  return cast('List[Tuple[span_t, int]]',
+              fastlex.IfsSplit(s, ifs_whitespace, ifs_other, allow_escape))
+
+
+def _IfsSplit_Slow(s, ifs_whitespace, ifs_other, allow_escape):
+  # type: (str, str, str, bool) -> List[Tuple[span_t, int]]
+  """Follow the IFS state machine in frontend/consts.py.
+
+  Returns a list of (span, end_index) pairs.  native/fastlex.c has the same
+  loop.
+  """
+  n = len(s)
+  spans = [] # type: List[Tuple[span_t, int]]
+
+  if n == 0:
+    return spans  # empty
+
+  # Ad hoc rule from POSIX: ignore leading whitespace.
+  # "IFS white space shall be ignored at the beginning and end of the input"
+  # This can't really be handled by the state machine.
+
+  i = 0
+  while i < n and s[i] in ifs_whitespace:
+    i += 1
+
+  # Append an ignored span.
+  if i != 0:
+    spans.append((span_e.Delim, i))
+
+  # String is ONLY whitespace.  We want to skip the last span after the
+  # while loop.
+  if i == n:
+    return spans
+
+  state = state_i.Start
+  while state != state_i.Done:
+    if i < n:
+      c = s[i]
+      if c in ifs_whitespace:
+        ch = char_kind_i.DE_White
+      elif c in ifs_other:
+        ch = char_kind_i.DE_Gray
+      elif allow_escape and c == '\\':
+        ch = char_kind_i.Backslash
+      else:
+        ch = char_kind_i.Black
+    elif i == n:
+      ch = char_kind_i.Sentinel  # one more iterations for the end of string
+    else:
+      raise AssertionError()  # shouldn't happen
+
+    new_state, action = consts.IfsEdge(state, ch)
+    if new_state == state_i.Invalid:
+      raise AssertionError(
+          'Invalid transition from %r with %r' % (state, ch))
+
+    if action == emit_i.Part:
+      spans.append((span_e.Black, i))
+    elif action == emit_i.Delim:
+      spans.append((span_e.Delim, i))  # ignored delimiter
+    elif action == emit_i.Empty:
+      spans.append((span_e.Delim, i))  # ignored delimiter
+      spans.append((span_e.Black, i))  # EMPTY part that is NOT ignored
+    elif action == emit_i.Escape:
+      spans.append((span_e.Backslash, i))  # \
+    elif action == emit_i.Nothing:
+      pass
+    else:
+      raise AssertionError()
+
+    state = new_state
+    i += 1
+
+  return spans
+
+
 if fastlex:
   OneToken = _MatchOshToken_Fast
+  # Flat list of [id, end_pos, ...] for the rest of the line.  Only fastlex
+  # has it, since it's slower with regexes.  See lexer.BatchLineLexer.
+  LineTokens = fastlex.MatchOshTokens
   ECHO_MATCHER = _MatchEchoToken_Fast
   GLOB_MATCHER = _MatchGlobToken_Fast
   PS1_MATCHER = _MatchPS1Token_Fast
@@ -141,8 +229,10 @@ if fastlex:
   IsValidVarName = fastlex.IsValidVarName
   ShouldHijack = fastlex.ShouldHijack
   MatchOption = fastlex.MatchOption
+  IfsSplit = _IfsSplit_Fast
 else:
   OneToken = _MatchOshToken_Slow(lexer_def.LEXER_DEF)
+  LineTokens = None
   ECHO_MATCHER = _MatchTokenSlow(lexer_def.ECHO_E_DEF)
   GLOB_MATCHER = _MatchTokenSlow(lexer_def.GLOB_DEF)
   PS1_MATCHER = _MatchTokenSlow(lexer_def.PS1_DEF)
@@ -169,6 +259,8 @@ else:
     # type: (str) -> int
     return _OPTION_DICT.get(s, 0)  # 0 means not found
 
+  IfsSplit = _IfsSplit_Slow
+
 
 class SimpleLexer(object):
 
@@ -4,6 +4,7 @@ match_test.py: Tests for match.py
 """
 from __future__ import print_function
 
+import itertools
 import unittest
 
 from _devbuild.gen.id_kind_asdl import Id, Id_str
@@ -48,5 +49,17 @@ class MatchTest(unittest.TestCase):
         break
 
 
+  def testIfsSplit(self):
+    # fastlex must follow the same state machine
+    for ws, other in [(' \t\n', ''), (' ', ':'), ('', ':-'), ('\t', '')]:
+      for n in range(5):
+        for chars in itertools.product('a :-\t\\', repeat=n):
+          s = ''.join(chars)
+          for allow_escape in (True, False):
+            self.assertEqual(
+                match._IfsSplit_Slow(s, ws, other, allow_escape),
+                match._IfsSplit_Fast(s, ws, other, allow_escape),
+                '%r %r %r %s' % (s, ws, other, allow_escape))
+
 if __name__ == '__main__':
   unittest.main()
@@ -29,6 +29,7 @@ if TYPE_CHECKING:
       command__Data, command__Enum, command__Class, command__Import
   )
   from core.alloc import Arena
+  from core.pyutil import LazyOilGrammar
   from core.util import DebugFile
   from core import optview
   from frontend.lexer import Lexer
@@ -183,6 +184,7 @@ if TYPE_CHECKING:
   AliasesInFlight = List[Tuple[str, int]]
 
 
+
 if mylib.PYTHON:
   def MakeGrammarNames(oil_grammar):
     # type: (Grammar) -> Dict[int, str]
@@ -228,25 +230,21 @@ class ParseContext(object):
     self.parse_opts = parse_opts
     self.aliases = aliases
 
-    self.e_parser = expr_parse.ExprParser(self, oil_grammar)
-    # NOTE: The transformer is really a pure function.
-    if oil_grammar:
-      self.tr = expr_to_ast.Transformer(oil_grammar)
-      if mylib.PYTHON:
-        names = MakeGrammarNames(oil_grammar)
-    else:  # hack for unit tests, which pass None
-      self.tr = None
-      if mylib.PYTHON:  # TODO: Simplify
-        names = {}
-
+    # The Oil expression parser is created on first use, since most shell
+    # scripts don't have any Oil expressions.  See _ExprParser().
+    self.oil_grammar = oil_grammar
+    self.e_parser = None  # type: expr_parse.ExprParser
+    self.tr = None  # type: expr_to_ast.Transformer
     if mylib.PYTHON:
-      self.p_printer = expr_parse.ParseTreePrinter(names)  # print raw nodes
+      self.lazy_grammar = None  # type: LazyOilGrammar
+      self.p_printer = None  # type: expr_parse.ParseTreePrinter
 
     self.parsing_expr = False  # "single-threaded" state
 
     # Completion state lives here since it may span multiple parsers.
     self.trail = _BaseTrail()  # no-op by default
     self.one_pass_parse = False
+    self.lazy_funcs = False
 
   def Init_Trail(self, trail):
     # type: (_BaseTrail) -> None
@@ -256,6 +254,39 @@ class ParseContext(object):
     # type: (bool) -> None
     self.one_pass_parse = b
 
+  def Init_LazyFuncs(self, b):
+    # type: (bool) -> None
+    self.lazy_funcs = b
+
+  if mylib.PYTHON:
+    def Init_LazyGrammar(self, lazy_grammar):
+      # type: (LazyOilGrammar) -> None
+      """Load the grammar when the first Oil expression is parsed."""
+      self.lazy_grammar = lazy_grammar
+
+  def _ExprParser(self):
+    # type: () -> expr_parse.ExprParser
+    if self.e_parser is None:
+      if mylib.PYTHON:
+        if self.oil_grammar is None and self.lazy_grammar is not None:
+          self.oil_grammar = self.lazy_grammar.Get()
+      oil_grammar = self.oil_grammar
+
+      self.e_parser = expr_parse.ExprParser(self, oil_grammar)
+      # NOTE: The transformer is really a pure function.
+      if oil_grammar:
+        self.tr = expr_to_ast.Transformer(oil_grammar)
+        if mylib.PYTHON:
+          names = MakeGrammarNames(oil_grammar)
+      else:  # hack for unit tests, which pass None
+        self.tr = None
+        if mylib.PYTHON:  # TODO: Simplify
+          names = {}
+
+      if mylib.PYTHON:
+        self.p_printer = expr_parse.ParseTreePrinter(names)  # print raw nodes
+    return self.e_parser
+
   def _MakeLexer(self, line_reader):
     # type: (_Reader) -> Lexer
     """Helper function.
@@ -264,6 +295,9 @@ class ParseContext(object):
     better.
     """
     line_lexer = lexer.LineLexer('', self.arena)
+    if mylib.PYTHON:
+      if match.LineTokens:  # fastlex can match whole lines
+        line_lexer = lexer.BatchLineLexer('', self.arena)
     return lexer.Lexer(line_lexer, line_reader)
 
   def MakeOshParser(self, line_reader, emit_comp_dummy=False):
@@ -315,7 +349,7 @@ class ParseContext(object):
     """Helper Oil expression parsing."""
     self.parsing_expr = True
     try:
-      return self.e_parser.Parse(lexer, start_symbol)
+      return self._ExprParser().Parse(lexer, start_symbol)
     finally:
       self.parsing_expr = False
 
@@ -329,7 +363,8 @@ class ParseContext(object):
 
     self.parsing_expr = True
     try:
-      pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.oil_var_decl)
+      pnode, last_token = self._ExprParser().Parse(lexer,
+                                                   grammar_nt.oil_var_decl)
     finally:
       self.parsing_expr = False
 
@@ -345,7 +380,7 @@ class ParseContext(object):
     """ setvar d['a'] += 1 """
 
     # TODO: Create an ExprParser so it's re-entrant.
-    pnode, last_token = self.e_parser.Parse(lexer,
+    pnode, last_token = self._ExprParser().Parse(lexer,
                                             grammar_nt.oil_place_mutation)
     if 0:
       self.p_printer.Print(pnode)
@@ -371,7 +406,7 @@ class ParseContext(object):
   def ParseOilExpr(self, lexer, start_symbol):
     # type: (Lexer, int) -> Tuple[expr_t, Token]
     """ if (x > 0) { ... }, while, etc. """
-    pnode, last_token = self.e_parser.Parse(lexer, start_symbol)
+    pnode, last_token = self._ExprParser().Parse(lexer, start_symbol)
 
     if 0:
       self.p_printer.Print(pnode)
@@ -382,7 +417,7 @@ class ParseContext(object):
   def ParseOilForExpr(self, lexer, start_symbol):
     # type: (Lexer, int) -> Tuple[List[name_type], expr_t, Token]
     """ for (x Int, y Int in foo) """
-    pnode, last_token = self.e_parser.Parse(lexer, start_symbol)
+    pnode, last_token = self._ExprParser().Parse(lexer, start_symbol)
 
     if 0:
       self.p_printer.Print(pnode)
@@ -393,7 +428,7 @@ class ParseContext(object):
   def ParseProc(self, lexer, out):
     # type: (Lexer, command__Proc) -> Token
     """ proc f(x, y, @args) { """
-    pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.oil_proc)
+    pnode, last_token = self._ExprParser().Parse(lexer, grammar_nt.oil_proc)
 
     if 0:
       self.p_printer.Print(pnode)
@@ -404,7 +439,7 @@ class ParseContext(object):
   def ParseFunc(self, lexer, out):
     # type: (Lexer, command__Func) -> Token
     """ func f(x Int, y Int = 0, ...args; z Int = 3, ...named) { x = 42 } """
-    pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.named_func)
+    pnode, last_token = self._ExprParser().Parse(lexer, grammar_nt.named_func)
 
     if 0:
       self.p_printer.Print(pnode)
@@ -415,7 +450,7 @@ class ParseContext(object):
   def ParseDataType(self, lexer, out):
     # type: (Lexer, command__Data) -> Token
     """ data Point(x Int, y Int) """
-    pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.tea_data)
+    pnode, last_token = self._ExprParser().Parse(lexer, grammar_nt.tea_data)
 
     if 0:
       self.p_printer.Print(pnode)
@@ -426,7 +461,7 @@ class ParseContext(object):
   def ParseEnum(self, lexer, out):
     # type: (Lexer, command__Enum) -> Token
     """ enum cflow { Break, Continue, Return(status Int) } """
-    pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.tea_enum)
+    pnode, last_token = self._ExprParser().Parse(lexer, grammar_nt.tea_enum)
 
     if 0:
       self.p_printer.Print(pnode)
@@ -437,7 +472,7 @@ class ParseContext(object):
   def ParseClass(self, lexer, out):
     # type: (Lexer, command__Class) -> Token
     """ class Lexer { var Token; func Next() { echo } } """
-    pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.tea_class)
+    pnode, last_token = self._ExprParser().Parse(lexer, grammar_nt.tea_class)
 
     if 0:
       self.p_printer.Print(pnode)
@@ -448,7 +483,7 @@ class ParseContext(object):
   def ParseImport(self, lexer, out):
     # type: (Lexer, command__Import) -> Token
     """ use 'foo/bar' as spam, Foo, Z as Y """
-    pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.tea_import)
+    pnode, last_token = self._ExprParser().Parse(lexer, grammar_nt.tea_import)
 
     if 0:
       self.p_printer.Print(pnode)
@@ -463,7 +498,7 @@ class ParseContext(object):
       line_lexer = lexer.LineLexer('', self.arena)
       lx = lexer.Lexer(line_lexer, line_reader)
 
-      pnode, last_token = self.e_parser.Parse(lx, grammar_nt.tea_module)
+      pnode, last_token = self._ExprParser().Parse(lx, grammar_nt.tea_module)
 
       if 1:
         self.p_printer.Print(pnode)
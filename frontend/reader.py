@@ -17,6 +17,11 @@ if TYPE_CHECKING:
   from _devbuild.gen.syntax_asdl import Token
   from core.alloc import Arena
 
+if mylib.PYTHON:
+  import stat
+
+  import posix_ as posix
+
 
 class _Reader(object):
   def __init__(self, arena):
@@ -44,6 +49,16 @@ class _Reader(object):
     """Called after command execution in main_loop.py."""
     pass
 
+  def SkipFunctionBody(self):
+    # type: () -> Tuple[int, int]
+    """Add the lines of a function body to the arena without lexing them.
+
+    Returns:
+      The ID of the first line and the number of lines.  The ID is -1 if the
+      reader can't find the end of the body; nothing is consumed then.
+    """
+    return -1, 0
+
   def LastLineHint(self):
     # type: () -> bool
     """A hint if we're on the last line, for optimization.
@@ -99,6 +114,155 @@ def StringLineReader(s, arena):
   # type: (str, Arena) -> FileLineReader
   return FileLineReader(mylib.BufLineReader(s), arena)
 
+
+if mylib.PYTHON:
+  def _LineIsComplete(line):
+    # type: (str) -> bool
+    """Whether quotes, backticks, and $( are closed on this line.
+
+    Otherwise a closing brace on a later line could be inside a string or a
+    command sub.  This doesn't lex the line exactly, but when it's wrong, it
+    says the line is incomplete.
+    """
+    quote = ''  # the quote we're in, if any
+    depth = 0  # of unclosed (
+    n = len(line)
+    i = 0
+    while i < n:
+      c = line[i]
+      if quote == "'":
+        if c == "'":
+          quote = ''
+      elif c == '\\':
+        i += 1  # skip the escaped char
+      elif quote == '"':
+        if c == '"':
+          quote = ''
+        elif c == '`' or line.startswith('$(', i):
+          return False
+      elif quote == '`':
+        if c == '`':
+          quote = ''
+      elif c in '\'"`':
+        quote = c
+      elif c == '(':
+        depth += 1
+      elif c == ')' and depth > 0:  # case patterns end with )
+        depth -= 1
+      elif c == '#' and (i == 0 or line[i-1] in ' \t;&|'):
+        break  # comment
+      i += 1
+    return quote == '' and depth == 0
+
+  class BufferLineReader(_Reader):
+    """For script files and sourced files.
+
+    The whole file is read into one string, and the arena only records the
+    offset of each line.  See Arena.AddLineAt().
+    """
+
+    def __init__(self, buf, arena):
+      # type: (str, Arena) -> None
+      """
+      Args:
+        buf: The contents of the file.
+      """
+      _Reader.__init__(self, arena)
+      self.buf = buf
+      self.size = len(buf)
+      self.pos = 0
+      self.last_line_hint = False
+
+    def GetLine(self):
+      # type: () -> Tuple[int, Optional[str], int]
+      start = self.pos
+      if start == self.size:
+        eof_line = None  # type: Optional[str]
+        return -1, eof_line, 0
+
+      end = self.buf.find('\n', start)
+      if end == -1:
+        end = self.size
+        self.last_line_hint = True  # like FileLineReader
+      else:
+        end += 1
+      self.pos = end
+
+      line = self.buf[start:end]
+      line_id = self.arena.AddLineAt(self.buf, start, self.line_num)
+      self.line_num += 1
+      return line_id, line, 0
+
+    def SkipFunctionBody(self):
+      # type: () -> Tuple[int, int]
+      """Skip to a closing brace in column 0, e.g.
+
+      f() {
+        echo hi
+      }
+
+      The lines aren't lexed, so we give up on anything that could hide a
+      closing brace: unindented lines, here docs, line continuations, and
+      quotes or command subs that span lines.  The brace line itself is left
+      for the lexer.
+      """
+      buf = self.buf
+      pos = self.pos
+      starts = []  # type: List[int]
+      while True:
+        if pos == self.size:
+          return -1, 0  # let the parser report the missing }
+
+        end = buf.find('\n', pos)
+        end = self.size if end == -1 else end + 1
+        line = buf[pos:end]
+
+        c = line[0]
+        if c == '}':
+          if len(line) == 1 or line[1] in ' \t\r\n;&|<>)':
+            break
+          return -1, 0
+        if c not in ' \t\n#' or '<<' in line or line.endswith('\\\n'):
+          return -1, 0
+        if not _LineIsComplete(line):
+          return -1, 0
+
+        starts.append(pos)
+        pos = end
+
+      first_line_id = self.arena.LastLineId()
+      for start in starts:
+        self.arena.AddLineAt(buf, start, self.line_num)
+        self.line_num += 1
+      self.pos = pos
+      return first_line_id, len(starts)
+
+    def LastLineHint(self):
+      # type: () -> bool
+      # Unlike a pipe, we know when the whole file has been consumed, so the
+      # last command of a script can be optimized even if it ends with \n.
+      return self.last_line_hint or self.pos == self.size
+
+
+def FileReader(f, arena):
+  # type: (mylib.LineReader, Arena) -> _Reader
+  """Return a reader for a script or sourced file.
+
+  Regular files are read all at once.  Others, like pipes, are read line by
+  line.
+
+  We don't mmap() regular files, because accessing the mapping after the file
+  is truncated raises SIGBUS.  An editor or 'git checkout' can do that while a
+  script is running.
+  """
+  if mylib.PYTHON:
+    try:
+      if stat.S_ISREG(posix.fstat(f.fileno()).st_mode):
+        return BufferLineReader(f.read(), arena)
+    except AttributeError:  # e.g. StringIO
+      pass
+  return FileLineReader(f, arena)
+
 # TODO: Should be BufLineReader(Str)?
 # This doesn't have to copy.  It just has a pointer.
 
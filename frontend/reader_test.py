@@ -4,6 +4,7 @@ reader_test.py: Tests for reader.py
 """
 
 import cStringIO
+import tempfile
 import unittest
 
 from _devbuild.gen.syntax_asdl import source
@@ -34,16 +35,85 @@ class ReaderTest(unittest.TestCase):
     lines = [(0, 'one\n', 0), (1, 'two', 0)]
     r3 = reader.VirtualLineReader(lines, a3)
 
-    for a in [a1, a2, a3]:
+    a4 = alloc.Arena()
+    r4 = reader.BufferLineReader('one\ntwo', a4)
+
+    for a in [a1, a2, a3, a4]:
       a.PushSource(source.MainFile('reader_test.py'))
 
-    for r in [r1, r2, r3]:
+    for r in [r1, r2, r3, r4]:
       print(r)
       # Lines are added to the arena with a line_id.
       self.assertEqual((0, 'one\n', 0), r.GetLine())
       self.assertEqual((1, 'two', 0), r.GetLine())
       self.assertEqual((-1, None, 0), r.GetLine())
 
+    self.assertEqual('two', a4.GetLine(1))
+    self.assertEqual(2, a4.GetLineNumber(1))
+
+  def testSkipFunctionBody(self):
+    arena = test_lib.MakeArena('<reader_test.py>')
+    r = reader.BufferLineReader('f() {\n  echo hi\n\n}\necho\n', arena)
+    r.GetLine()
+    self.assertEqual((1, 2), r.SkipFunctionBody())
+    self.assertEqual('  echo hi\n', arena.GetLine(1))
+    self.assertEqual(3, arena.GetLineNumber(2))
+    self.assertEqual((3, '}\n', 0), r.GetLine())
+
+    for body in [
+        'echo hi\n}\n',  # not indented
+        '  cat <<EOF\n}\nEOF\n}\n',
+        '  echo \\\n}\n}\n',
+        '  echo\n}x\n',
+        '  echo\n',  # no closing brace
+        "  x='a\n}\n'\n}\n",  # in a multi-line string
+        '  echo "a\n}\n"\n}\n',
+        '  x=$(echo\n}\n)\n}\n',
+        '  x=`echo\n}\n`\n}\n',
+        '  x="$(echo \n}\n)"\n}\n',
+    ]:
+      arena = test_lib.MakeArena('<reader_test.py>')
+      r = reader.BufferLineReader('f() {\n' + body, arena)
+      r.GetLine()
+      self.assertEqual((-1, 0), r.SkipFunctionBody())
+      self.assertEqual(1, arena.LastLineId())
+      self.assertEqual(2, r.GetLine()[0] + 1)  # nothing consumed
+
+    # Quotes and parens closed on the same line are OK
+    arena = test_lib.MakeArena('<reader_test.py>')
+    r = reader.BufferLineReader(
+        "f() {\n  echo 'a' \"b\" $(c) `d` # it's\n  case x in x) ;; esac\n}\n",
+        arena)
+    r.GetLine()
+    self.assertEqual((1, 2), r.SkipFunctionBody())
+
+    r = reader.StringLineReader('  echo hi\n}\n', arena)
+    self.assertEqual((-1, 0), r.SkipFunctionBody())
+
+  def testFileReader(self):
+    arena = test_lib.MakeArena('<reader_test.py>')
+
+    with open(__file__) as f:
+      r = reader.FileReader(f, arena)
+      self.assertEqual(reader.BufferLineReader, r.__class__)
+      line_id, line, _ = r.GetLine()
+      self.assertEqual('#!/usr/bin/env python2\n', line)
+      self.assertEqual(None, arena.line_vals[line_id])  # not copied
+      self.assertEqual(line, arena.GetLine(line_id))
+
+    r = reader.FileReader(cStringIO.StringIO('one\n'), arena)
+    self.assertEqual(reader.FileLineReader, r.__class__)
+
+    # The file can be truncated while it's being read
+    with tempfile.NamedTemporaryFile() as tmp:
+      tmp.write('echo 1\necho 2\n')
+      tmp.flush()
+      with open(tmp.name) as f:
+        r = reader.FileReader(f, arena)
+      tmp.truncate(0)
+      self.assertEqual('echo 1\n', r.GetLine()[1])
+      self.assertEqual('echo 2\n', r.GetLine()[1])
+
 
 if __name__ == '__main__':
   unittest.main()
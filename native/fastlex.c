@@ -52,6 +52,64 @@ fastlex_MatchOshToken(PyObject *self, PyObject *args) {
   return Py_BuildValue("(ii)", id, end_pos);
 }
 
+// Like MatchOshToken, but match all the tokens from start_pos to the end of
+// the line, in a single lexer mode.  Returns a flat list of
+// [id, end_pos, id, end_pos, ...], ending with Eol_Tok.
+//
+// This saves a call and a tuple per token.  The caller must stop using the
+// list when the lexer mode changes.
+static PyObject *
+fastlex_MatchOshTokens(PyObject *self, PyObject *args) {
+  int lex_mode;
+
+  unsigned char* line;
+  int line_len;
+
+  int start_pos;
+  if (!PyArg_ParseTuple(args, "is#i",
+                        &lex_mode, &line, &line_len, &start_pos)) {
+    return NULL;
+  }
+
+  if (start_pos > line_len) {
+    PyErr_Format(PyExc_ValueError,
+                 "Invalid MatchOshTokens call (start_pos = %d, line_len = %d)",
+                 start_pos, line_len);
+    return NULL;
+  }
+
+  PyObject* result = PyList_New(0);
+  if (result == NULL) {
+    return NULL;
+  }
+
+  int pos = start_pos;
+  while (1) {
+    int id;
+    int end_pos;
+    MatchOshToken(lex_mode, line, line_len, pos, &id, &end_pos);
+
+    PyObject* py_id = PyInt_FromLong(id);
+    PyObject* py_end = PyInt_FromLong(end_pos);
+    if (py_id == NULL || py_end == NULL ||
+        PyList_Append(result, py_id) < 0 || PyList_Append(result, py_end) < 0) {
+      Py_XDECREF(py_id);
+      Py_XDECREF(py_end);
+      Py_DECREF(result);
+      return NULL;
+    }
+    Py_DECREF(py_id);
+    Py_DECREF(py_end);
+
+    // Stop at the end, and at empty matches, which would loop forever.
+    if (id == id__Eol_Tok || end_pos == pos) {
+      break;
+    }
+    pos = end_pos;
+  }
+  return result;
+}
+
 static PyObject *
 fastlex_MatchEchoToken(PyObject *self, PyObject *args) {
   unsigned char* line;
@@ -208,12 +266,161 @@ fastlex_ShouldHijack(PyObject *self, PyObject *args) {
   return PyBool_FromLong(ShouldHijack(name, len));
 }
 
+// IFS splitting.  This follows _IFS_EDGES in frontend/consts.py, like
+// _IfsSplit_Slow in frontend/match.py.  Keep them in sync.
+
+enum { CH_White, CH_Gray, CH_Black, CH_Backslash, CH_Sentinel };
+
+enum {
+  ST_Start, ST_White1, ST_Gray, ST_White2, ST_Black, ST_Backslash, ST_Done,
+  ST_Invalid
+};
+
+enum { EMIT_Nothing, EMIT_Part, EMIT_Delim, EMIT_Empty, EMIT_Escape };
+
+// span_e in core/runtime.asdl
+enum { SPAN_Black = 1, SPAN_Delim = 2, SPAN_Backslash = 3 };
+
+typedef struct {
+  unsigned char new_state;
+  unsigned char emit;
+} IfsEdge;
+
+// Indexed by state, then char kind
+static const IfsEdge kIfsEdges[6][5] = {
+  // ST_Start.  Leading whitespace was already skipped.
+  {{ST_Invalid, EMIT_Nothing}, {ST_Gray, EMIT_Empty}, {ST_Black, EMIT_Nothing},
+   {ST_Backslash, EMIT_Nothing}, {ST_Done, EMIT_Nothing}},
+  // ST_White1
+  {{ST_White1, EMIT_Nothing}, {ST_Gray, EMIT_Nothing}, {ST_Black, EMIT_Delim},
+   {ST_Backslash, EMIT_Delim}, {ST_Done, EMIT_Nothing}},
+  // ST_Gray
+  {{ST_White2, EMIT_Nothing}, {ST_Gray, EMIT_Empty}, {ST_Black, EMIT_Delim},
+   {ST_Black, EMIT_Delim}, {ST_Done, EMIT_Delim}},
+  // ST_White2
+  {{ST_White2, EMIT_Nothing}, {ST_Gray, EMIT_Empty}, {ST_Black, EMIT_Delim},
+   {ST_Backslash, EMIT_Delim}, {ST_Done, EMIT_Delim}},
+  // ST_Black
+  {{ST_White1, EMIT_Part}, {ST_Gray, EMIT_Part}, {ST_Black, EMIT_Nothing},
+   {ST_Backslash, EMIT_Part}, {ST_Done, EMIT_Part}},
+  // ST_Backslash
+  {{ST_Black, EMIT_Escape}, {ST_Black, EMIT_Escape}, {ST_Black, EMIT_Escape},
+   {ST_Black, EMIT_Escape}, {ST_Done, EMIT_Escape}},
+};
+
+// Append a (span, end_index) tuple.  Returns -1 on error.
+static int AppendSpan(PyObject* spans, int span, int end_index) {
+  PyObject* pair = Py_BuildValue("(ii)", span, end_index);
+  if (pair == NULL) {
+    return -1;
+  }
+  int ret = PyList_Append(spans, pair);
+  Py_DECREF(pair);
+  return ret;
+}
+
+// Split a string by IFS.  Returns a list of (span, end_index) pairs, like
+// IfsSplitter.Split() in osh/split.py.
+static PyObject *
+fastlex_IfsSplit(PyObject *self, PyObject *args) {
+  unsigned char* s;
+  int n;
+  unsigned char* ws_chars;
+  int ws_len;
+  unsigned char* other_chars;
+  int other_len;
+  int allow_escape;
+
+  if (!PyArg_ParseTuple(args, "s#s#s#i", &s, &n, &ws_chars, &ws_len,
+                        &other_chars, &other_len, &allow_escape)) {
+    return NULL;
+  }
+
+  // Classify each byte once
+  unsigned char kinds[256];
+  memset(kinds, CH_Black, sizeof(kinds));
+  int i;
+  for (i = 0; i < other_len; ++i) {
+    kinds[other_chars[i]] = CH_Gray;
+  }
+  for (i = 0; i < ws_len; ++i) {
+    kinds[ws_chars[i]] = CH_White;
+  }
+  if (allow_escape && kinds['\\'] == CH_Black) {
+    kinds['\\'] = CH_Backslash;
+  }
+
+  PyObject* spans = PyList_New(0);
+  if (spans == NULL) {
+    return NULL;
+  }
+  if (n == 0) {
+    return spans;
+  }
+
+  // Ad hoc rule from POSIX: ignore leading whitespace.
+  i = 0;
+  while (i < n && kinds[s[i]] == CH_White) {
+    i++;
+  }
+  if (i != 0 && AppendSpan(spans, SPAN_Delim, i) < 0) {
+    goto error;
+  }
+  if (i == n) {
+    return spans;  // only whitespace
+  }
+
+  int state = ST_Start;
+  while (state != ST_Done) {
+    int ch = i < n ? kinds[s[i]] : CH_Sentinel;
+    IfsEdge edge = kIfsEdges[state][ch];
+    if (edge.new_state == ST_Invalid) {
+      PyErr_Format(PyExc_AssertionError,
+                   "Invalid IFS transition from %d with %d", state, ch);
+      goto error;
+    }
+
+    int ret = 0;
+    switch (edge.emit) {
+    case EMIT_Part:
+      ret = AppendSpan(spans, SPAN_Black, i);
+      break;
+    case EMIT_Delim:
+      ret = AppendSpan(spans, SPAN_Delim, i);  // ignored delimiter
+      break;
+    case EMIT_Empty:
+      // ignored delimiter, then an EMPTY part that is NOT ignored
+      ret = AppendSpan(spans, SPAN_Delim, i);
+      if (ret == 0) {
+        ret = AppendSpan(spans, SPAN_Black, i);
+      }
+      break;
+    case EMIT_Escape:
+      ret = AppendSpan(spans, SPAN_Backslash, i);
+      break;
+    }
+    if (ret < 0) {
+      goto error;
+    }
+
+    state = edge.new_state;
+    i++;
+  }
+  return spans;
+
+error:
+  Py_DECREF(spans);
+  return NULL;
+}
+
 #ifdef OVM_MAIN
 #include "native/fastlex.c/methods.def"
 #else
 static PyMethodDef methods[] = {
   {"MatchOshToken", fastlex_MatchOshToken, METH_VARARGS,
    "(lexer mode, line, start_pos) -> (id, end_pos)."},
+  {"MatchOshTokens", fastlex_MatchOshTokens, METH_VARARGS,
+   "(lexer mode, line, start_pos) -> [id, end_pos, ...] up to Eol_Tok."},
   {"MatchEchoToken", fastlex_MatchEchoToken, METH_VARARGS,
    "(line, start_pos) -> (id, end_pos)."},
   {"MatchGlobToken", fastlex_MatchGlobToken, METH_VARARGS,
@@ -230,6 +437,8 @@ static PyMethodDef methods[] = {
    "Is it a valid var name?"},
   // Should we hijack this shebang line?
   {"ShouldHijack", fastlex_ShouldHijack, METH_VARARGS, ""},
+  {"IfsSplit", fastlex_IfsSplit, METH_VARARGS,
+   "(s, ifs_whitespace, ifs_other, allow_escape) -> [(span, end_index), ...]"},
   {NULL, NULL},
 };
 #endif
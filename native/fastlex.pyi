@@ -1,9 +1,10 @@
-from typing import Tuple
+from typing import List, Tuple
 
 def IsValidVarName(s: str) -> bool: ...
 def ShouldHijack(s: str) -> bool: ...
 
 def MatchOshToken(lex_mode_enum_id: int, line: str, start_pos: int) -> Tuple[int, int]: ...
+def MatchOshTokens(lex_mode_enum_id: int, line: str, start_pos: int) -> List[int]: ...
 def MatchPS1Token(line: str, start_pos: int) -> Tuple[int, int]: ...
 def MatchEchoToken(line: str, start_pos: int) -> Tuple[int, int]: ...
 def MatchHistoryToken(line: str, start_pos: int) -> Tuple[int, int]: ...
@@ -11,3 +12,5 @@ def MatchGlobToken(line: str, start_pos: int) -> Tuple[int, int]: ...
 def MatchBraceRangeToken(line: str, start_pos: int) -> Tuple[int, int]: ...
 
 def MatchOption(s: str) -> int: ...
+
+def IfsSplit(s: str, ifs_whitespace: str, ifs_other: str, allow_escape: bool) -> List[Tuple[int, int]]: ...
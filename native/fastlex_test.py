@@ -51,6 +51,29 @@ class LexTest(unittest.TestCase):
     line = 'end of file\0'
     TokenizeLineOuter(line)
 
+  def testMatchOshTokens(self):
+    line = 'echo "hi"\n'
+    toks = fastlex.MatchOshTokens(lex_mode_e.ShCommand, line, 0)
+
+    # Same as calling MatchOshToken in a loop, up to and including Eol_Tok
+    expected = []
+    pos = 0
+    while True:
+      tok_type, pos = MatchOshToken(lex_mode_e.ShCommand, line, pos)
+      expected.extend([tok_type, pos])
+      if tok_type == Id.Eol_Tok:
+        break
+    self.assertEqual(expected, toks)
+    self.assertEqual(Id.Left_DoubleQuote, toks[4])
+
+    toks = fastlex.MatchOshTokens(lex_mode_e.DQ, line, 6)
+    self.assertEqual([Id.Lit_Chars, 8, Id.Right_DoubleQuote, 9], toks[:4])
+
+    self.assertEqual([Id.Eol_Tok, 4],
+                     fastlex.MatchOshTokens(lex_mode_e.ShCommand, 'line', 4))
+    self.assertRaises(ValueError, fastlex.MatchOshTokens,
+                      lex_mode_e.ShCommand, 'line', 5)
+
   def testMatchOption(self):
     #log('MatchOption')
     CASES = [
@@ -94,5 +117,15 @@ class LexTest(unittest.TestCase):
     self.assertEqual(False, fastlex.IsValidVarName('var_name-foo'))
 
 
+  def testIfsSplit(self):
+    # span_e.Black = 1, span_e.Delim = 2, span_e.Backslash = 3
+    self.assertEqual([], fastlex.IfsSplit('', ' ', '', True))
+    self.assertEqual(
+        [(2, 1), (1, 2), (2, 3), (1, 4), (3, 5), (1, 7)],
+        fastlex.IfsSplit(' a b\\ c ', ' \t\n', '', True))
+    self.assertEqual(
+        [(1, 1), (2, 2), (1, 3), (2, 4), (1, 4), (2, 5)],
+        fastlex.IfsSplit('a:b::', ' ', ':', True))
+
 if __name__ == '__main__':
   unittest.main()
@@ -160,23 +160,88 @@ func_glob(PyObject *self, PyObject *args) {
   return matches;
 }
 
+// A small cache of compiled regexes, so that [[ $x =~ $pat ]] and
+// ${x//pat/rep} in a loop don't call regcomp() each time.  The most recently
+// used entry is first, and the last one is evicted when it's full.
+
+#define REGEX_CACHE_SIZE 32
+
+typedef struct {
+  char* pattern;
+  int cflags;
+  regex_t re;
+} RegexEntry;
+
+static RegexEntry* regex_cache[REGEX_CACHE_SIZE];
+static int regex_cache_len = 0;
+static long regex_cache_hits = 0;
+static long regex_cache_misses = 0;
+
+// Returns a regex owned by the cache, or NULL with an exception set.
+static regex_t* CompileRegex(const char* pattern, int cflags) {
+  int i;
+  RegexEntry* e;
+  for (i = 0; i < regex_cache_len; i++) {
+    e = regex_cache[i];
+    if (e->cflags == cflags && strcmp(e->pattern, pattern) == 0) {
+      memmove(regex_cache + 1, regex_cache, i * sizeof(RegexEntry*));
+      regex_cache[0] = e;
+      regex_cache_hits++;
+      return &e->re;
+    }
+  }
+  regex_cache_misses++;
+
+  e = malloc(sizeof(RegexEntry));
+  if (e == NULL) {
+    PyErr_NoMemory();
+    return NULL;
+  }
+  int status = regcomp(&e->re, pattern, cflags);
+  if (status != 0) {
+    char error_string[80];
+    regerror(status, &e->re, error_string, 80);
+    PyErr_SetString(PyExc_RuntimeError, error_string);
+    free(e);
+    return NULL;
+  }
+  e->pattern = strdup(pattern);
+  if (e->pattern == NULL) {
+    regfree(&e->re);
+    free(e);
+    PyErr_NoMemory();
+    return NULL;
+  }
+  e->cflags = cflags;
+
+  if (regex_cache_len == REGEX_CACHE_SIZE) {
+    RegexEntry* last = regex_cache[--regex_cache_len];
+    regfree(&last->re);
+    free(last->pattern);
+    free(last);
+  }
+  memmove(regex_cache + 1, regex_cache, regex_cache_len * sizeof(RegexEntry*));
+  regex_cache[0] = e;
+  regex_cache_len++;
+  return &e->re;
+}
+
+static PyObject *
+func_regex_cache_stats(PyObject *self, PyObject *unused) {
+  return Py_BuildValue("(l,l)", regex_cache_hits, regex_cache_misses);
+}
+
 static PyObject *
 func_regex_parse(PyObject *self, PyObject *args) {
   const char* pattern;
   if (!PyArg_ParseTuple(args, "s", &pattern)) {
     return NULL;
   }
-  regex_t pat;
   // This is an extended regular expression rather than a basic one, i.e. we
   // use 'a*' instaed of 'a\*'.
-  int status = regcomp(&pat, pattern, REG_EXTENDED);
-  if (status != 0) {
-    char error_string[80];
-    regerror(status, &pat, error_string, 80);
-    PyErr_SetString(PyExc_RuntimeError, error_string);
+  if (CompileRegex(pattern, REG_EXTENDED) == NULL) {
     return NULL;
   }
-  regfree(&pat);
 
   Py_RETURN_TRUE;
 }
@@ -189,25 +254,20 @@ func_regex_match(PyObject *self, PyObject *args) {
     return NULL;
   }
 
-  regex_t pat;
-  int status = regcomp(&pat, pattern, REG_EXTENDED);
-  if (status != 0) {
-    char error_string[80];
-    regerror(status, &pat, error_string, 80);
-    PyErr_SetString(PyExc_RuntimeError, error_string);
+  regex_t* pat = CompileRegex(pattern, REG_EXTENDED);
+  if (pat == NULL) {
     return NULL;
   }
 
-  int outlen = pat.re_nsub + 1;
+  int outlen = pat->re_nsub + 1;
   PyObject *ret = PyList_New(outlen);
 
   if (ret == NULL) {
-    regfree(&pat);
     return NULL;
   }
 
   regmatch_t *pmatch = (regmatch_t*) malloc(sizeof(regmatch_t) * outlen);
-  int match = regexec(&pat, str, outlen, pmatch, 0);
+  int match = regexec(pat, str, outlen, pmatch, 0);
   if (match == 0) {
     int i;
     for (i = 0; i < outlen; i++) {
@@ -218,9 +278,9 @@ func_regex_match(PyObject *self, PyObject *args) {
   }
 
   free(pmatch);
-  regfree(&pat);
 
   if (match != 0) {
+    Py_DECREF(ret);
     Py_RETURN_NONE;
   }
 
@@ -243,25 +303,20 @@ func_regex_first_group_match(PyObject *self, PyObject *args) {
     return NULL;
   }
 
-  regex_t pat;
   regmatch_t m[NMATCH];
 
   // Could have been checked by regex_parse for [[ =~ ]], but not for glob
   // patterns like ${foo/x*/y}.
 
-  int status = regcomp(&pat, pattern, REG_EXTENDED);
-  if (status != 0) {
-    char error_string[80];
-    regerror(status, &pat, error_string, 80);
-    PyErr_SetString(PyExc_RuntimeError, error_string);
+  regex_t* pat = CompileRegex(pattern, REG_EXTENDED);
+  if (pat == NULL) {
     return NULL;
   }
 
   debug("first_group_match pat %s str %s pos %d", pattern, str, pos);
 
   // Match at offset 'pos'
-  int result = regexec(&pat, str + pos, NMATCH, m, 0 /*flags*/);
-  regfree(&pat);
+  int result = regexec(pat, str + pos, NMATCH, m, 0 /*flags*/);
 
   if (result != 0) {
     Py_RETURN_NONE;  // no match
@@ -273,6 +328,106 @@ func_regex_first_group_match(PyObject *self, PyObject *args) {
   return Py_BuildValue("(i,i)", pos + start, pos + end);
 }
 
+// Length of the UTF-8 character that starts with byte c.  Invalid bytes are
+// skipped one at a time.
+static int Utf8CharLen(unsigned char c) {
+  if (c >= 0xF0) return 4;
+  if (c >= 0xE0) return 3;
+  if (c >= 0xC0) return 2;
+  return 1;
+}
+
+// For ${s//pat/rep}: replace every match of the regex in one call.  An empty
+// match is replaced too, and then we step over one character, like bash does
+// for ${s//*(x)/-}.
+static PyObject *
+func_regex_sub_all(PyObject *self, PyObject *args) {
+  const char* pattern;
+  const char* str;
+  int str_len;
+  const char* replace;
+  int replace_len;
+  if (!PyArg_ParseTuple(args, "ss#s#", &pattern, &str, &str_len, &replace,
+                        &replace_len)) {
+    return NULL;
+  }
+
+  regex_t* pat = CompileRegex(pattern, REG_EXTENDED);
+  if (pat == NULL) {
+    return NULL;
+  }
+
+  // Collect (start, end) pairs, then copy everything into the result once.
+  int capacity = 16;
+  int num_matches = 0;
+  int* spans = malloc(2 * capacity * sizeof(int));
+  if (spans == NULL) {
+    return PyErr_NoMemory();
+  }
+  Py_ssize_t result_len = str_len;
+
+  // An empty string is searched once, so ${s//*/x} with s='' gives x
+  int pos = 0;
+  do {
+    regmatch_t m;
+    int eflags = pos == 0 ? 0 : REG_NOTBOL;
+    if (regexec(pat, str + pos, 1, &m, eflags) != 0) {
+      break;
+    }
+    int start = pos + m.rm_so;
+    int end = pos + m.rm_eo;
+    if (start == end && start == str_len && str_len > 0) {
+      break;  // Don't replace an empty match at the end
+    }
+
+    if (num_matches == capacity) {
+      capacity *= 2;
+      int* new_spans = realloc(spans, 2 * capacity * sizeof(int));
+      if (new_spans == NULL) {
+        free(spans);
+        return PyErr_NoMemory();
+      }
+      spans = new_spans;
+    }
+    spans[2 * num_matches] = start;
+    spans[2 * num_matches + 1] = end;
+    num_matches++;
+    result_len += replace_len - (end - start);
+
+    if (end > start) {
+      pos = end;
+    } else {
+      pos = end + Utf8CharLen((unsigned char)str[end]);
+    }
+  } while (pos < str_len);
+
+  if (num_matches == 0) {
+    free(spans);
+    return PyString_FromStringAndSize(str, str_len);
+  }
+
+  PyObject* result = PyString_FromStringAndSize(NULL, result_len);
+  if (result == NULL) {
+    free(spans);
+    return NULL;
+  }
+  char* out = PyString_AS_STRING(result);
+  int prev_end = 0;
+  int i;
+  for (i = 0; i < num_matches; ++i) {
+    int start = spans[2 * i];
+    memcpy(out, str + prev_end, start - prev_end);
+    out += start - prev_end;
+    memcpy(out, replace, replace_len);
+    out += replace_len;
+    prev_end = spans[2 * i + 1];
+  }
+  memcpy(out, str + prev_end, str_len - prev_end);
+
+  free(spans);
+  return result;
+}
+
 // We do this in C so we can remove '%f' % 0.1 from the CPython build.  That
 // involves dtoa.c and pystrod.c, which are thousands of lines of code.
 static PyObject *
@@ -377,6 +532,12 @@ static PyMethodDef methods[] = {
   // the regex is invalid.
   {"regex_first_group_match", func_regex_first_group_match, METH_VARARGS, ""},
 
+  // Replace every match of the regex in a string with another string.
+  {"regex_sub_all", func_regex_sub_all, METH_VARARGS, ""},
+
+  // Return (hits, misses) for the cache of compiled regexes.
+  {"regex_cache_stats", func_regex_cache_stats, METH_NOARGS, ""},
+
   // "Print three floating point values for the 'time' builtin.
   {"print_time", func_print_time, METH_VARARGS, ""},
 
@@ -199,6 +199,43 @@ class LibcTest(unittest.TestCase):
       # Invalid regex syntax
       libc.regex_first_group_match("(['+-'])", s, 6)
 
+  def testRegexCache(self):
+    hits, misses = libc.regex_cache_stats()
+    libc.regex_match('c(a+)che', 'caaache')
+    libc.regex_first_group_match('c(a+)che', 'xcache', 0)
+    self.assertEqual((hits + 1, misses + 1), libc.regex_cache_stats())
+
+    # Invalid regexes aren't cached
+    self.assertRaises(RuntimeError, libc.regex_match, r'c(', 'c')
+    self.assertRaises(RuntimeError, libc.regex_match, r'c(', 'c')
+    self.assertEqual((hits + 1, misses + 3), libc.regex_cache_stats())
+
+    # The least recently used regex is evicted
+    for i in range(100):
+      libc.regex_match('evict%d' % i, 'x')
+    self.assertEqual(['caaache', 'aaa'], libc.regex_match('c(a+)che', 'caaache'))
+    self.assertEqual((hits + 1, misses + 104), libc.regex_cache_stats())
+
+  def testRegexSubAll(self):
+    s = 'oXooXoooX'
+    self.assertEqual('o_o_ooX', libc.regex_sub_all('X.', s, '_'))
+
+    # No match
+    self.assertEqual(s, libc.regex_sub_all('z', s, '_'))
+
+    # Empty matches are replaced, except at the end, like bash extglob
+    self.assertEqual('-a-b--c', libc.regex_sub_all('x*', 'abxc', '-'))
+    self.assertEqual('-', libc.regex_sub_all('x*', '', '-'))
+
+    # An empty match steps over a whole UTF-8 character
+    self.assertEqual('-\xce\xbc-b', libc.regex_sub_all('x*', '\xce\xbcb', '-'))
+    self.assertEqual('aMbM', libc.regex_sub_all('\xce\xbc', 'a\xce\xbcb\xce\xbc', 'M'))
+
+    # ^ only matches at the start
+    self.assertEqual('-aa', libc.regex_sub_all('^a', 'aaa', '-'))
+
+    self.assertRaises(RuntimeError, libc.regex_sub_all, 'c(', 'c', '-')
+
   def testSpecialCharsInCharClass(self):
     CASES = [
       ("([a-z]+)", '123abc123', (3, 6)),
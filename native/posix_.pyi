@@ -49,6 +49,8 @@ O_SYNC = ...  # type: int
 O_TRUNC = ...  # type: int
 O_WRONLY = ...  # type: int
 R_OK = ...  # type: int
+SEEK_CUR = ...  # type: int
+SEEK_SET = ...  # type: int
 TMP_MAX = ...  # type: int
 WCONTINUED = ...  # type: int
 WNOHANG = ...  # type: int
@@ -105,6 +107,7 @@ def chroot(path: unicode) -> None: ...
 def close(fd: int) -> None: ...
 def closerange(fd_low: int, fd_high: int) -> None: ...
 def confstr(name: Union[str, int]) -> str: ...
+def copy_file_range(src: int, dst: int, count: int) -> int: ...
 def ctermid() -> str: ...
 def dup(fd: int) -> int: ...
 def dup2(fd: int, fd2: int) -> None: ...
@@ -117,6 +120,8 @@ def fdatasync(fd: int) -> None: ...
 
 # Oil patch: IO[str] -> mylib.LineReader
 def fdopen(fd: int, mode: str = ..., bufsize: int = ...) -> mylib.LineReader: ...
+def posix_spawn(path: str, argv: List[str], env: Dict[str, str],
+                setsigdef: List[int]) -> int: ...
 def fork() -> int:
     raise OSError()
 def forkpty() -> Tuple[int, int]:
@@ -151,7 +156,7 @@ def lchown(path: unicode, uid: int, gid: int) -> None: ...
 def link(source: unicode, link_name: str) -> None: ...
 _T = TypeVar("_T")
 def listdir(path: _T) -> List[_T]: ...
-def lseek(fd: int, pos: int, how: int) -> None: ...
+def lseek(fd: int, pos: int, how: int) -> int: ...
 def lstat(path: unicode) -> stat_result: ...
 def major(device: int) -> int: ...
 def makedev(major: int, minor: int) -> int: ...
@@ -167,6 +172,7 @@ def pipe() -> Tuple[int, int]: ...
 def popen(command: str, mode: str = ..., bufsize: int = ...) -> IO[str]: ...
 def putenv(varname: str, value: str) -> None: ...
 def read(fd: int, n: int) -> str: ...
+def read_to_eof(fd: int, strip_newlines: bool) -> str: ...
 def readlink(path: _T) -> _T: ...
 def remove(path: unicode) -> None: ...
 def rename(src: unicode, dst: unicode) -> None: ...
@@ -178,11 +184,13 @@ def setgroups(groups: Sequence[int]) -> None: ...
 def setpgid(pid: int, pgrp: int) -> None: ...
 def setpgrp() -> None: ...
 def setregid(rgid: int, egid: int) -> None: ...
+def sendfile(out_fd: int, in_fd: int, count: int) -> int: ...
 def setresgid(rgid: int, egid: int, sgid: int) -> None: ...
 def setresuid(ruid: int, euid: int, suid: int) -> None: ...
 def setreuid(ruid: int, euid: int) -> None: ...
 def setsid() -> None: ...
 def setuid(pid: int) -> None: ...
+def splice(src: int, dst: int, count: int) -> int: ...
 def stat(path: unicode) -> stat_result: ...
 def statvfs(path: unicode) -> statvfs_result: ...
 def stat_float_times(fd: int) -> None: ...
@@ -28,6 +28,7 @@ Other notes:
 """
 from __future__ import print_function
 
+import errno
 import signal
 import subprocess
 import unittest
@@ -44,14 +45,18 @@ FUNCS = [
     "getcwd",
     "listdir",
     "lstat",
+    "mkdir",
     "readlink",
+    "rename",
     "stat",
+    "unlink",
     "umask",
     "uname",
     "_exit",
     "execv",
     "execve",
     "fork",
+    "posix_spawn",
     "geteuid",
     "getpid",
     "getuid",
@@ -61,6 +66,7 @@ FUNCS = [
     "dup2",
     "read",
     "write",
+    "fstat",
     "fdopen",
     "isatty",
     "pipe",
@@ -96,6 +102,24 @@ class PosixTest(unittest.TestCase):
       func = getattr(posix_, name)
       print(func)
 
+  def testPosixSpawn(self):
+    r, w = posix_.pipe()
+    pid = posix_.posix_spawn(
+        '/bin/sh', ['sh', '-c', 'echo "$FOO" >&%d' % w], {'FOO': 'bar'},
+        [signal.SIGPIPE])
+    posix_.close(w)
+    _, status = posix_.waitpid(pid, 0)
+    self.assertEqual(0, posix_.WEXITSTATUS(status))
+    self.assertEqual('bar\n', posix_.read(r, 100))
+    posix_.close(r)
+
+    try:
+      posix_.posix_spawn('/nonexistent', ['x'], {}, [])
+    except OSError as e:
+      self.assertEqual(errno.ENOENT, e.errno)
+    else:
+      self.fail('Expected OSError')
+
   def testEmptyReadAndWrite(self):
     # Regression for bug where this would hang
     posix_.read(0, 0)
@@ -110,6 +134,26 @@ class PosixTest(unittest.TestCase):
       log('Hanging on read in pid %d', posix_.getpid())
       posix_.read(0, 1)
 
+  def testReadToEof(self):
+    # Bigger than the first buffer, and bigger than the pipe
+    p = subprocess.Popen(['seq', '30000'], stdout=subprocess.PIPE)
+    s = posix_.read_to_eof(p.stdout.fileno(), True)
+    p.wait()
+    self.assertEqual(168894 - 1, len(s))
+    self.assertEqual('29999\n30000', s[-11:])
+
+    r, w = posix_.pipe()
+    posix_.write(w, 'a\n\n')
+    posix_.close(w)
+    self.assertEqual('a\n\n', posix_.read_to_eof(r, False))
+    posix_.close(r)
+
+    r, w = posix_.pipe()
+    posix_.write(w, '\n\n')
+    posix_.close(w)
+    self.assertEqual('', posix_.read_to_eof(r, True))
+    posix_.close(r)
+
   def testWait(self):
     if posix_.environ.get('EINTR_TEST'):
       # Now we can do kill -TERM PID can get EINTR.
@@ -57,6 +57,12 @@ corresponding Unix manual entries for more information on calls.");
 #include <sys/resource.h>
 #endif
 
+#include <spawn.h>                /* Oil: posix_spawn() */
+
+#ifdef __linux__
+#include <sys/sendfile.h>         /* Oil: sendfile() */
+#endif
+
 /* Unix functions that the configure script doesn't check for */
 #define HAVE_EXECV      1
 #define HAVE_FORK       1
@@ -1264,6 +1270,122 @@ posix_execve(PyObject *self, PyObject *args)
 }
 #endif /* HAVE_EXECV */
 
+/* Oil addition.  Unlike Python 3's os.posix_spawn(), there are no file
+   actions: redirects are applied in the shell before the program starts. */
+PyDoc_STRVAR_remove(posix_posix_spawn__doc__,
+"posix_spawn(path, argv, env, setsigdef) -> pid\n\n\
+Start a program without copying the current process, like vfork() and exec().\n\
+\n\
+    path: path of executable file\n\
+    argv: list of arguments\n\
+    env: dictionary of strings mapping to strings\n\
+    setsigdef: list of signals to reset to SIG_DFL in the child");
+
+static PyObject *
+posix_posix_spawn(PyObject *self, PyObject *args)
+{
+    char *path;
+    PyObject *argv, *env, *setsigdef;
+    char **argvlist = NULL;
+    char **envlist = NULL;
+    Py_ssize_t i, argc, envc = 0, lastarg = 0;
+    PyObject *key, *val;
+    posix_spawnattr_t attr;
+    sigset_t sigdef;
+    pid_t pid;
+    int err;
+    PyObject *result = NULL;
+
+    if (!PyArg_ParseTuple(args, "etO!O!O!:posix_spawn",
+                          Py_FileSystemDefaultEncoding, &path,
+                          &PyList_Type, &argv, &PyDict_Type, &env,
+                          &PyList_Type, &setsigdef))
+        return NULL;
+
+    sigemptyset(&sigdef);
+    for (i = 0; i < PyList_Size(setsigdef); i++) {
+        long sig_num = PyInt_AsLong(PyList_GetItem(setsigdef, i));
+        if (sig_num == -1 && PyErr_Occurred())
+            goto done;
+        if (sigaddset(&sigdef, (int)sig_num) != 0) {
+            posix_error();
+            goto done;
+        }
+    }
+
+    argc = PyList_Size(argv);
+    argvlist = PyMem_NEW(char *, argc+1);
+    if (argvlist == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    for (i = 0; i < argc; i++) {
+        if (!PyArg_Parse(PyList_GetItem(argv, i),
+                         "et;posix_spawn() arg 2 must contain only strings",
+                         Py_FileSystemDefaultEncoding,
+                         &argvlist[i]))
+        {
+            lastarg = i;
+            goto done;
+        }
+    }
+    lastarg = argc;
+    argvlist[argc] = NULL;
+
+    envlist = PyMem_NEW(char *, PyDict_Size(env) + 1);
+    if (envlist == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    i = 0;
+    while (PyDict_Next(env, &i, &key, &val)) {
+        char *p;
+        size_t len;
+
+        if (!PyString_Check(key) || !PyString_Check(val)) {
+            PyErr_SetString(PyExc_TypeError,
+                            "posix_spawn() arg 3 must map strings to strings");
+            goto done;
+        }
+        len = PyString_Size(key) + PyString_Size(val) + 2;
+        p = PyMem_NEW(char, len);
+        if (p == NULL) {
+            PyErr_NoMemory();
+            goto done;
+        }
+        PyOS_snprintf(p, len, "%s=%s", PyString_AsString(key),
+                      PyString_AsString(val));
+        envlist[envc++] = p;
+    }
+    envlist[envc] = NULL;
+
+    posix_spawnattr_init(&attr);
+    posix_spawnattr_setsigdefault(&attr, &sigdef);
+    posix_spawnattr_setflags(&attr, POSIX_SPAWN_SETSIGDEF);
+
+    /* glibc reports exec() errors like ENOENT and ENOEXEC here. */
+    err = posix_spawn(&pid, path, NULL, &attr, argvlist, envlist);
+    posix_spawnattr_destroy(&attr);
+
+    if (err != 0) {
+        errno = err;
+        posix_error();
+        goto done;
+    }
+    result = PyLong_FromPid(pid);
+
+  done:
+    if (envlist != NULL) {
+        while (--envc >= 0)
+            PyMem_DEL(envlist[envc]);
+        PyMem_DEL(envlist);
+    }
+    if (argvlist != NULL)
+        free_string_array(argvlist, lastarg);
+    PyMem_Free(path);
+    return result;
+}
+
 #ifdef HAVE_FORK
 PyDoc_STRVAR_remove(posix_fork__doc__,
 "fork() -> pid\n\n\
@@ -2081,6 +2203,93 @@ posix_read(PyObject *self, PyObject *args)
 }
 
 
+PyDoc_STRVAR_remove(posix_read_to_eof__doc__,
+"read_to_eof(fd, strip_newlines) -> string\n\n\
+Read a file descriptor until EOF, e.g. the output of a command sub.");
+
+// OVM_MAIN patch: Read into a single string that grows by doubling, rather
+// than joining many small chunks.  Trailing newlines are removed by
+// shrinking the string in place.
+static PyObject *
+posix_read_to_eof(PyObject *self, PyObject *args)
+{
+    int fd, strip_newlines;
+    Py_ssize_t cap = 4096, len = 0;
+    ssize_t n;
+    PyObject *buffer;
+    if (!PyArg_ParseTuple(args, "ii:read_to_eof", &fd, &strip_newlines))
+        return NULL;
+    if (!_PyVerify_fd(fd))
+        return posix_error();
+    buffer = PyString_FromStringAndSize((char *)NULL, cap);
+    if (buffer == NULL)
+        return NULL;
+    while (1) {
+        if (len == cap) {
+            if (cap > PY_SSIZE_T_MAX / 2) {
+                Py_DECREF(buffer);
+                return PyErr_NoMemory();
+            }
+            cap *= 2;
+            if (_PyString_Resize(&buffer, cap) < 0)
+                return NULL;
+        }
+        Py_BEGIN_ALLOW_THREADS
+        n = read(fd, PyString_AS_STRING(buffer) + len, cap - len);
+        Py_END_ALLOW_THREADS
+
+        if (n > 0) {
+            len += n;
+        } else if (n == 0) {  // EOF
+            break;
+        } else {
+            if (PyErr_CheckSignals()) {
+                Py_DECREF(buffer);
+                return NULL;  // Propagate KeyboardInterrupt
+            }
+            if (errno != EINTR) {
+                Py_DECREF(buffer);
+                return posix_error();
+            }
+            // Otherwise, try again on EINTR.
+        }
+    }
+    if (strip_newlines) {
+        while (len > 0 && PyString_AS_STRING(buffer)[len - 1] == '\n')
+            len--;
+    }
+    if (len != cap)
+        _PyString_Resize(&buffer, len);
+    return buffer;
+}
+
+
+PyDoc_STRVAR_remove(posix_lseek__doc__,
+"lseek(fd, pos, how) -> newpos\n\n\
+Set the current position of a file descriptor.\n\
+Return the new cursor position in bytes, starting from the beginning.");
+
+static PyObject *
+posix_lseek(PyObject *self, PyObject *args)
+{
+    int fd, how;
+    long pos;
+    off_t res;
+
+    if (!PyArg_ParseTuple(args, "ili:lseek", &fd, &pos, &how))
+        return NULL;
+    if (!_PyVerify_fd(fd))
+        return posix_error();
+    Py_BEGIN_ALLOW_THREADS
+    res = lseek(fd, (off_t)pos, how);
+    Py_END_ALLOW_THREADS
+    if (res < 0)
+        return posix_error();
+
+    return PyLong_FromLongLong((PY_LONG_LONG)res);
+}
+
+
 PyDoc_STRVAR_remove(posix_write__doc__,
 "write(fd, string) -> byteswritten\n\n\
 Write a string to a file descriptor.");
@@ -2122,6 +2331,76 @@ posix_write(PyObject *self, PyObject *args)
 }
 
 
+/* Oil additions for the __cat builtin.  They copy data without passing it
+   through user space.  Unlike Python 3, there are no offset arguments: the
+   file offsets are used and updated. */
+
+#ifdef __linux__
+#define OIL_COPY_CALL(call) \
+    Py_BEGIN_ALLOW_THREADS \
+    n = call; \
+    Py_END_ALLOW_THREADS
+#else
+#define OIL_COPY_CALL(call) \
+    errno = ENOSYS; \
+    n = -1;
+#endif
+
+PyDoc_STRVAR_remove(posix_sendfile__doc__,
+"sendfile(out_fd, in_fd, count) -> bytes_sent\n\n\
+Copy up to count bytes from in_fd, which must allow mmap(), to out_fd.");
+
+static PyObject *
+posix_sendfile(PyObject *self, PyObject *args)
+{
+    int out_fd, in_fd;
+    Py_ssize_t count, n;
+
+    if (!PyArg_ParseTuple(args, "iin:sendfile", &out_fd, &in_fd, &count))
+        return NULL;
+    OIL_COPY_CALL(sendfile(out_fd, in_fd, NULL, count))
+    if (n < 0)
+        return posix_error();
+    return PyInt_FromSsize_t(n);
+}
+
+PyDoc_STRVAR_remove(posix_splice__doc__,
+"splice(src, dst, count) -> bytes_moved\n\n\
+Move up to count bytes from src to dst.  One of them must be a pipe.");
+
+static PyObject *
+posix_splice(PyObject *self, PyObject *args)
+{
+    int src, dst;
+    Py_ssize_t count, n;
+
+    if (!PyArg_ParseTuple(args, "iin:splice", &src, &dst, &count))
+        return NULL;
+    OIL_COPY_CALL(splice(src, NULL, dst, NULL, count, SPLICE_F_MOVE))
+    if (n < 0)
+        return posix_error();
+    return PyInt_FromSsize_t(n);
+}
+
+PyDoc_STRVAR_remove(posix_copy_file_range__doc__,
+"copy_file_range(src, dst, count) -> bytes_copied\n\n\
+Copy up to count bytes between regular files.");
+
+static PyObject *
+posix_copy_file_range(PyObject *self, PyObject *args)
+{
+    int src, dst;
+    Py_ssize_t count, n;
+
+    if (!PyArg_ParseTuple(args, "iin:copy_file_range", &src, &dst, &count))
+        return NULL;
+    OIL_COPY_CALL(copy_file_range(src, NULL, dst, NULL, count, 0))
+    if (n < 0)
+        return posix_error();
+    return PyInt_FromSsize_t(n);
+}
+
+
 PyDoc_STRVAR_remove(posix_fstat__doc__,
 "fstat(fd) -> stat result\n\n\
 Like stat(), but for an open file descriptor.");
@@ -2635,6 +2914,9 @@ all_ins(PyObject *d)
 #ifdef O_EXCL
     if (ins(d, "O_EXCL", (long)O_EXCL)) return -1;
 #endif
+    /* Oil addition: for lseek() */
+    if (ins(d, "SEEK_SET", (long)SEEK_SET)) return -1;
+    if (ins(d, "SEEK_CUR", (long)SEEK_CUR)) return -1;
 #ifdef O_TRUNC
     if (ins(d, "O_TRUNC", (long)O_TRUNC)) return -1;
 #endif
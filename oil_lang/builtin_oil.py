@@ -119,6 +119,14 @@ class Pp(_Builtin):
 
       status = 0
 
+    elif action == 'arena':
+      # Live and reclaimed source lines and spans.  See main_loop.Segment.
+      arena = self.arena
+      print('live_lines\tlive_spans\tfreed_lines\tfreed_spans')
+      print('%d\t%d\t%d\t%d' % (arena.LastLineId(), arena.LastSpanId(),
+                                arena.num_freed_lines, arena.num_freed_spans))
+      status = 0
+
     else:
       e_usage('got invalid action %r' % action, span_id=action_spid)
 
@@ -4,7 +4,7 @@ builtin_funcs.py
 """
 from __future__ import print_function
 
-from _devbuild.gen.runtime_asdl import value, scope_e
+from _devbuild.gen.runtime_asdl import value, value_e, scope_e
 from _devbuild.gen.syntax_asdl import sh_lhs_expr
 from core.pyerror import e_die, log
 from oil_lang import expr_eval
@@ -21,8 +21,14 @@ _ = log
 
 def SetGlobalFunc(mem, name, func):
   # type: (state.Mem, str, Union[Callable, ParameterizedArray, type]) -> None
-  """Used by bin/oil.py to set split(), etc."""
+  """Used by bin/oil.py to set split(), etc.
+
+  The functions are defined lazily, so don't clobber a global variable the
+  user has already set.
+  """
   assert callable(func), func
+  if mem.GetValue(name, scope_e.GlobalOnly).tag_() != value_e.Undef:
+    return
   mem.SetValue(sh_lhs_expr.Name(name), value.Obj(func), scope_e.GlobalOnly)
 
 
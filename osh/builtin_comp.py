@@ -20,7 +20,7 @@ if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import cmd_value__Argv
   from core.completion import Lookup, OptionState, Api, UserSpec
   from core.ui import ErrorFormatter
-  from core.state import Mem
+  from core.state import Mem, SearchPath
   from frontend.args import _Attributes
   from frontend.parse_lib import ParseContext
   from osh.cmd_eval import CommandEvaluator
@@ -120,18 +120,21 @@ class SpecBuilder(object):
                word_ev,  # type: NormalWordEvaluator
                splitter,  # type: SplitContext
                comp_lookup,  # type: Lookup
+               search_path,  # type: SearchPath
                ):
     # type: (...) -> None
     """
     Args:
       cmd_ev: CommandEvaluator for compgen -F
       parse_ctx, word_ev, splitter: for compgen -W
+      search_path: for compgen -A command
     """
     self.cmd_ev = cmd_ev
     self.parse_ctx = parse_ctx
     self.word_ev = word_ev
     self.splitter = splitter
     self.comp_lookup = comp_lookup
+    self.search_path = search_path
 
   def Build(self, argv, arg, base_opts):
     # type: (List[str], _Attributes, Dict[str, bool]) -> UserSpec
@@ -170,7 +173,7 @@ class SpecBuilder(object):
         actions.append(completion.FileSystemAction(exec_only=True))
 
         # Look on the file system.
-        a = completion.ExternalCommandAction(cmd_ev.mem)
+        a = completion.ExternalCommandAction(self.search_path)
 
       elif name == 'directory':
         a = completion.FileSystemAction(dirs_only=True)
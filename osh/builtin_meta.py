@@ -26,6 +26,8 @@ _ = log
 from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import cmd_value__Argv, Proc
+  from _devbuild.gen.syntax_asdl import command_t
+  from core.parse_cache import ParseCache
   from frontend.parse_lib import ParseContext
   from core import optview
   from core import process
@@ -62,17 +64,24 @@ class Eval(vm._Builtin):
     line_reader = reader.StringLineReader(code_str, self.arena)
     c_parser = self.parse_ctx.MakeOshParser(line_reader)
 
+    seg = main_loop.Segment(self.arena, self.cmd_ev.mem)
+
     src = source.EvalArg(eval_spid)
     with dev.ctx_Tracer(self.tracer, 'eval', None):
       with alloc.ctx_Location(self.arena, src):
-        return main_loop.Batch(self.cmd_ev, c_parser, self.arena,
-                               cmd_flags=cmd_eval.RaiseControlFlow)
+        status = main_loop.Batch(self.cmd_ev, c_parser, self.arena,
+                                 cmd_flags=cmd_eval.RaiseControlFlow)
+
+    # Not reached on errors or 'eval return', which may refer to the code.
+    seg.Reclaim()
+    return status
 
 
 class Source(vm._Builtin):
 
-  def __init__(self, parse_ctx, search_path, cmd_ev, fd_state, tracer, errfmt):
-    # type: (ParseContext, state.SearchPath, CommandEvaluator, process.FdState, dev.Tracer, ui.ErrorFormatter) -> None
+  def __init__(self, parse_ctx, search_path, cmd_ev, fd_state, tracer, errfmt,
+               parse_cache):
+    # type: (ParseContext, state.SearchPath, CommandEvaluator, process.FdState, dev.Tracer, ui.ErrorFormatter, Optional[ParseCache]) -> None
     self.parse_ctx = parse_ctx
     self.arena = parse_ctx.arena
     self.search_path = search_path
@@ -80,6 +89,7 @@ class Source(vm._Builtin):
     self.fd_state = fd_state
     self.tracer = tracer
     self.errfmt = errfmt
+    self.parse_cache = parse_cache  # None unless OSH_PARSE_CACHE_DIR is set
 
     self.mem = cmd_ev.mem
 
@@ -104,9 +114,6 @@ class Source(vm._Builtin):
       return 1
 
     try:
-      line_reader = reader.FileLineReader(f, self.arena)
-      c_parser = self.parse_ctx.MakeOshParser(line_reader)
-
       # A sourced module CAN have a new arguments array, but it always shares
       # the same variable scope as the caller.  The caller could be at either a
       # global or a local scope.
@@ -115,8 +122,18 @@ class Source(vm._Builtin):
         with state.ctx_Source(self.mem, path, source_argv):
           src = source.SourcedFile(path, call_spid)
           with alloc.ctx_Location(self.arena, src):
-            status = main_loop.Batch(self.cmd_ev, c_parser, self.arena,
-                                     cmd_flags=cmd_eval.RaiseControlFlow)
+            nodes = None  # type: Optional[List[command_t]]
+            if self.parse_cache is not None:
+              nodes = self.parse_cache.Parse(resolved, f)
+
+            if nodes is None:
+              line_reader = reader.FileReader(f, self.arena)
+              c_parser = self.parse_ctx.MakeOshParser(line_reader)
+              status = main_loop.Batch(self.cmd_ev, c_parser, self.arena,
+                                       cmd_flags=cmd_eval.RaiseControlFlow)
+            else:
+              status = main_loop.BatchNodes(self.cmd_ev, nodes,
+                                            cmd_flags=cmd_eval.RaiseControlFlow)
       return status
 
     except error._ControlFlow as e:
@@ -17,6 +17,7 @@ from _devbuild.gen.syntax_asdl import source
 from asdl import runtime
 from core import alloc
 from core import error
+from core import process
 from core import pyos
 from core.pyerror import e_usage, e_die, log
 from core import state
@@ -35,6 +36,7 @@ import posix_ as posix
 from typing import Tuple, List, Optional, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import span_t
+  from core.process import FdState, StdinBuffer
   from core.pyutil import _ResourceLoader
   from core.state import Mem, DirStack
   from core.ui import ErrorFormatter
@@ -138,38 +140,59 @@ def _AppendParts(s, spans, max_results, join_next, parts):
   return done, join_next
 
 
-def _ReadUntilDelim(delim_char):
-  # type: (Optional[str]) -> Tuple[str, bool]
-  """Read a portion of stdin.
-  
-  If delim_char is set, read until that delimiter, but don't include it.
-  If not set, read a line, and include the newline.
-  """
-  eof = False
-  chars = []  # type: List[str]
+# sys.stdin.readline() in Python has buffering, so we need our own functions.
+#
+# dash, mksh, and zsh all read a single byte at a time, because read must not
+# consume more than it returns.  The next command that reads stdin starts where
+# we stopped.  Like bash, we read blocks when we can give back the rest:
+#
+# - Read ahead in a regular file, then seek back.
+# - Read ahead from a pipe into FdState.stdin_buf, when the shell is the only
+#   reader.  See _StdinChecker in core/executor.py.
+
+_MIN_READ_AHEAD = 128  # lines are usually short, and we seek back the rest
+_MAX_READ_AHEAD = 4096
+
+_READ_ALL_SIZE = 65536  # when we consume everything anyway
+
+
+def _ReadRecordFromFile(delim_char):
+  # type: (str) -> str
+  """Read blocks of a regular file, and seek back to just after delim_char."""
+  chunks = []  # type: List[str]
+  n = _MIN_READ_AHEAD
   while True:
-    c = posix.read(0, 1)
-    if len(c) == 0:
-      eof = True
+    block = posix.read(0, n)
+    if len(block) == 0:
       break
 
-    if c == delim_char:
+    i = block.find(delim_char)
+    if i != -1:
+      chunks.append(block[:i+1])
+      unread = len(block) - i - 1
+      if unread:
+        posix.lseek(0, -unread, posix.SEEK_CUR)
       break
 
-    chars.append(c)
+    chunks.append(block)
+    if n < _MAX_READ_AHEAD:
+      n *= 2
+
+  return ''.join(chunks)
 
-  return ''.join(chars), eof
 
+def _ReadRecord(delim_char, stdin_buf):
+  # type: (str, Optional[StdinBuffer]) -> str
+  """Read stdin up to and including delim_char.
 
-# sys.stdin.readline() in Python has buffering, so we need our own function.
-# TODO: Rewrite this tight loop in C (or Tea) for less garbage.
+  Returns '' at EOF.  The delimiter is missing only if EOF came first.
+  """
+  if stdin_buf:
+    return stdin_buf.ReadRecord(delim_char)
 
-# Note that dash, mksh, and zsh all read a single byte at a time.  It appears
-# to be required by POSIX?  Could try libc getline and make this an option.
+  if pyos.IsRegularFile(0):
+    return _ReadRecordFromFile(delim_char)
 
-def _ReadLine():
-  # type: () -> str
-  """Read a line from stdin."""
   # TODO: This should be an array of integers in C++
   chars = []  # type: List[str]
   while True:
@@ -179,18 +202,39 @@ def _ReadLine():
 
     chars.append(c)
 
-    if c == '\n':
+    if c == delim_char:
       break
 
   return ''.join(chars)
 
 
-def _ReadAll():
-  # type: () -> str
+def _ReadUntilDelim(delim_char, stdin_buf):
+  # type: (str, Optional[StdinBuffer]) -> Tuple[str, bool]
+  """Read a portion of stdin, until delim_char, and don't include it.
+
+  Returns the string and whether we hit EOF.
+  """
+  record = _ReadRecord(delim_char, stdin_buf)
+  if record.endswith(delim_char):
+    return record[:-1], False
+  return record, True
+
+
+def _ReadLine(stdin_buf):
+  # type: (Optional[StdinBuffer]) -> str
+  """Read a line from stdin, including the newline."""
+  return _ReadRecord('\n', stdin_buf)
+
+
+def _ReadAll(stdin_buf):
+  # type: (Optional[StdinBuffer]) -> str
   """Read all of stdin."""
   chunks = []  # type: List[str]
   while True:
-    c = posix.read(0, 4096)
+    if stdin_buf:
+      c = stdin_buf.Read(_READ_ALL_SIZE)
+    else:
+      c = posix.read(0, _READ_ALL_SIZE)
     if len(c) == 0:
       break
 
@@ -199,17 +243,53 @@ def _ReadAll():
   return ''.join(chunks)
 
 
+def _ReadSplit(delim_char, max_records, stdin_buf):
+  # type: (str, int, Optional[StdinBuffer]) -> List[str]
+  """Read stdin and split it on delim_char, for mapfile.
+
+  Like str.split(), the last piece is what comes after the last delimiter, so
+  it's '' when the input ends with one.  If max_records isn't -1, we stop after
+  that many delimiters.
+  """
+  if max_records == -1:  # Consume everything, and split it natively
+    return _ReadAll(stdin_buf).split(delim_char)
+
+  file_buf = None  # type: Optional[StdinBuffer]
+  if stdin_buf is None and pyos.IsRegularFile(0):
+    file_buf = process.StdinBuffer(0)  # read ahead, then seek back
+    stdin_buf = file_buf
+
+  pieces = []  # type: List[str]
+  eof = False
+  for i in xrange(max_records):
+    record = _ReadRecord(delim_char, stdin_buf)
+    if not record.endswith(delim_char):
+      pieces.append(record)
+      eof = True
+      break
+    pieces.append(record[:-1])
+  if not eof:
+    pieces.append('')
+
+  if file_buf:
+    unread = file_buf.NumUnread()
+    if unread:
+      posix.lseek(0, -unread, posix.SEEK_CUR)
+  return pieces
+
+
 class Read(vm._Builtin):
-  def __init__(self, splitter, mem, parse_ctx):
-    # type: (SplitContext, Mem, ParseContext) -> None
+  def __init__(self, splitter, mem, parse_ctx, fd_state):
+    # type: (SplitContext, Mem, ParseContext, FdState) -> None
     self.splitter = splitter
     self.mem = mem
     self.parse_ctx = parse_ctx
+    self.fd_state = fd_state
     self.stdin = mylib.Stdin()
 
   def _Line(self, arg, var_name):
     # type: (arg_types.read, str) -> int
-    line = _ReadLine()
+    line = _ReadLine(self.fd_state.stdin_buf)
     if len(line) == 0:  # EOF
       return 1
 
@@ -250,7 +330,7 @@ class Read(vm._Builtin):
 
   def _All(self, var_name):
     # type: (str) -> int
-    contents = _ReadAll()
+    contents = _ReadAll(self.fd_state.stdin_buf)
 
     # No error conditions?
 
@@ -307,6 +387,9 @@ class Read(vm._Builtin):
       if arg.t != 0.0:
         e_die("read -t isn't implemented (except t=0)")
       else:
+        stdin_buf = self.fd_state.stdin_buf
+        if stdin_buf and stdin_buf.HasData():
+          return 0
         return 0 if pyos.InputAvailable(fd) else 1
 
     bits = 0
@@ -332,8 +415,12 @@ class Read(vm._Builtin):
     # type: (int, int) -> str
     chunks = []  # type: List[str]
     bytes_left = n
+    stdin_buf = self.fd_state.stdin_buf
     while bytes_left > 0:
-      chunk = posix.read(stdin_fd, n)  # read at up to N chars
+      if stdin_buf:
+        chunk = stdin_buf.Read(bytes_left)
+      else:
+        chunk = posix.read(stdin_fd, bytes_left)  # read at up to N chars
       if len(chunk) == 0:
         break
       chunks.append(chunk)
@@ -386,7 +473,7 @@ class Read(vm._Builtin):
     join_next = False
     status = 0
     while True:
-      line, eof = _ReadUntilDelim(delim_char)
+      line, eof = _ReadUntilDelim(delim_char, self.fd_state.stdin_buf)
 
       if eof:
         # status 1 to terminate loop.  (This is true even though we set
@@ -426,10 +513,11 @@ class Read(vm._Builtin):
 class MapFile(vm._Builtin):
   """ mapfile / readarray """
 
-  def __init__(self, mem, errfmt):
-    # type: (Mem, ErrorFormatter) -> None
+  def __init__(self, mem, errfmt, fd_state):
+    # type: (Mem, ErrorFormatter, FdState) -> None
     self.mem = mem
     self.errfmt = errfmt
+    self.fd_state = fd_state
 
   def Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
@@ -443,14 +531,30 @@ class MapFile(vm._Builtin):
      if var_name.startswith(':'):
        var_name = var_name[1:]
 
-    lines = []  # type: List[str]
-    while True:
-      line = _ReadLine()
-      if len(line) == 0:
-        break
-      if arg.t and line.endswith('\n'):
-        line = line[:-1]
-      lines.append(line)
+    if arg.d is None:
+      delim_char = '\n'
+    elif len(arg.d):
+      delim_char = arg.d[0]
+    else:
+      delim_char = '\0'  # -d '' delimits by NUL
+
+    # -1 means unset, and -n 0 means all lines
+    skip = arg.s if arg.s > 0 else 0
+    max_records = skip + arg.n if arg.n > 0 else -1
+
+    pieces = _ReadSplit(delim_char, max_records, self.fd_state.stdin_buf)
+    last = pieces.pop()  # the text after the last delimiter
+
+    # Strings can't hold NUL in bash, so it's always removed
+    if arg.t or delim_char == '\0':
+      lines = pieces
+    else:
+      lines = [line + delim_char for line in pieces]
+    if len(last):
+      lines.append(last)
+
+    if skip:
+      lines = lines[skip:]
 
     state.BuiltinSetArray(self.mem, var_name, lines)
     return 0
@@ -736,20 +840,21 @@ class Help(vm._Builtin):
 
 
 class Cat(vm._Builtin):
-  """Internal implementation detail for $(< file).
-  
+  """Copy stdin to stdout, e.g. __cat < in.txt > out.txt
+
+  The kernel does the copying when it can.  See pyos.CopyFd().
+
   Maybe expose this as 'builtin cat' ?
   """
-  def __init__(self):
-    # type: () -> None
-    """Empty constructor for mycpp."""
-    vm._Builtin.__init__(self)
+  def __init__(self, errfmt):
+    # type: (ErrorFormatter) -> None
+    self.errfmt = errfmt
 
   def Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
-    while True:
-      chunk = posix.read(0, 4096)
-      if len(chunk) == 0:
-        break
-      mylib.Stdout().write(chunk)
+    mylib.Stdout().flush()  # we write to the descriptor directly
+    err = pyos.CopyFd(0, 1)
+    if err != 0:
+      self.errfmt.Print_('__cat: %s' % posix.strerror(err))
+      return 1
     return 0
@@ -451,6 +451,7 @@ class Printf(vm._Builtin):
           return 2  # parse error
 
       self.parse_cache[fmt] = parts
+      arena.Pin()
 
     if 0:
       print()
@@ -439,6 +439,7 @@ class Trap(vm._Builtin):
     node = self._ParseTrapCode(code_str)
     if node is None:
       return 1  # ParseTrapCode() prints an error for us.
+    self.arena.Pin()  # the handler outlives this command
 
     # Register a hook.
     if sig_key in _HOOK_NAMES:
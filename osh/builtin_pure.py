@@ -463,7 +463,6 @@ class Echo(vm._Builtin):
   def __init__(self, exec_opts):
     # type: (optview.Exec) -> None
     self.exec_opts = exec_opts
-    self.f = mylib.Stdout()
 
   def Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
@@ -503,12 +502,15 @@ class Echo(vm._Builtin):
       # Replace it
       argv = new_argv
 
+    # Not saved in the constructor, since a command sub may capture it.  See
+    # ShellExecutor.RunCommandSub().
+    f = mylib.Stdout()
     if self.exec_opts.simple_echo():
       n = len(argv)
       if n == 0:
         pass
       elif n == 1:
-        self.f.write(argv[0])
+        f.write(argv[0])
       else:
         # TODO: span_id could be more accurate
         e_usage(
@@ -517,11 +519,11 @@ class Echo(vm._Builtin):
       #log('echo argv %s', argv)
       for i, a in enumerate(argv):
         if i != 0:
-          self.f.write(' ')  # arg separator
-        self.f.write(a)
+          f.write(' ')  # arg separator
+        f.write(a)
 
     if not arg.n and not backslash_c:
-      self.f.write('\n')
+      f.write('\n')
 
     return 0
 
@@ -25,7 +25,8 @@ from _devbuild.gen.syntax_asdl import (
     command__AndOr, command__Case, command__CommandList, command__ControlFlow,
     command__DBracket, command__DoGroup, command__DParen,
     command__ExpandedAlias, command__Expr, command__ForEach, command__ForExpr,
-    command__Func, command__If, command__NoOp, command__OilForIn,
+    command__Func, command__If, command__LazyBody, command__NoOp,
+    command__OilForIn,
     command__Pipeline, command__PlaceMutation, command__Proc,
     command__Sentence, command__ShAssignment, command__ShFunction,
     command__Simple, command__Subshell, command__TimeBlock, command__VarDecl,
@@ -59,6 +60,7 @@ from core import util
 from core import vm
 from frontend import consts
 from frontend import location
+from frontend import reader
 from oil_lang import objects
 from osh import braces
 from osh import sh_expr_eval
@@ -83,6 +85,7 @@ if TYPE_CHECKING:
   from core.alloc import Arena
   from core import optview
   from core.vm import _Executor, _AssignBuiltin
+  from frontend.parse_lib import ParseContext
   from oil_lang import expr_eval
   from osh import word_eval
   from osh import builtin_process
@@ -112,6 +115,7 @@ class Deps(object):
     self.mutable_opts = None  # type: state.MutableOpts
     self.dumper = None        # type: dev.CrashDumper
     self.debug_f = None       # type: util._DebugFile
+    self.parse_ctx = None     # type: ParseContext  # for LazyBody
 
     # signal/hook name -> handler
     self.traps = None         # type: Dict[str, builtin_process._TrapHandler]
@@ -215,6 +219,7 @@ class CommandEvaluator(object):
     self.mutable_opts = cmd_deps.mutable_opts
     self.dumper = cmd_deps.dumper
     self.debug_f = cmd_deps.debug_f  # Used by ShellFuncAction too
+    self.parse_ctx = cmd_deps.parse_ctx
 
     self.traps = cmd_deps.traps
     self.trap_nodes = cmd_deps.trap_nodes
@@ -319,7 +324,7 @@ class CommandEvaluator(object):
           'Exiting with status %d (%sPID %d)' % (status, reason, posix.getpid()),
           span_id=span_id, status=status)
 
-  def _EvalRedirect(self, r):
+  def EvalRedirect(self, r):
     # type: (redir) -> redirect
 
     result = redirect(r.op.id, r.op.span_id, r.loc, None)
@@ -455,6 +460,7 @@ class CommandEvaluator(object):
         # command_e.NoOp, command_e.ControlFlow, command_e.Pipeline,
         # command_e.AndOr, command_e.CommandList, command_e.DoGroup,
         # command_e.Sentence, # command_e.TimeBlock, command_e.ShFunction,
+        # command_e.LazyBody,
         # Oil:
         # command_e.VarDecl, command_e.PlaceMutation, command_e.OilForIn,
         # command_e.Proc, command_e.Func, command_e.Expr,
@@ -463,7 +469,7 @@ class CommandEvaluator(object):
 
     result = []  # type: List[redirect]
     for redir in redirects:
-      result.append(self._EvalRedirect(redir))
+      result.append(self.EvalRedirect(redir))
     return result
 
   def _RunSimpleCommand(self, cmd_val, do_fork):
@@ -569,7 +575,7 @@ class CommandEvaluator(object):
 
         # Find span_id for a basic implementation of $LINENO, e.g.
         # PS4='+$SOURCE_NAME:$LINENO:'
-        # Note that for '> $LINENO' the span_id is set in _EvalRedirect.
+        # Note that for '> $LINENO' the span_id is set in EvalRedirect.
         # TODO: Can we avoid setting this so many times?  See issue #567.
         if len(node.words):
           span_id = word_.LeftMostSpanForWord(node.words[0])
@@ -609,18 +615,22 @@ class CommandEvaluator(object):
           cmd_val = cast(cmd_value__Assign, UP_cmd_val)
 
         # NOTE: RunSimpleCommand never returns when do_fork=False!
+        do_fork = node.do_fork
+        if not do_fork and self._MustForkLast():
+          do_fork = True
+
         if len(node.more_env):  # I think this guard is necessary?
           is_other_special = False  # TODO: There are other special builtins too!
           if cmd_val.tag_() == cmd_value_e.Assign or is_other_special:
             # Special builtins have their temp env persisted.
             self._EvalTempEnv(node.more_env, 0)
-            status = self._RunSimpleCommand(cmd_val, node.do_fork)
+            status = self._RunSimpleCommand(cmd_val, do_fork)
           else:
             with state.ctx_Temp(self.mem):
               self._EvalTempEnv(node.more_env, state.SetExport)
-              status = self._RunSimpleCommand(cmd_val, node.do_fork)
+              status = self._RunSimpleCommand(cmd_val, do_fork)
         else:
-          status = self._RunSimpleCommand(cmd_val, node.do_fork)
+          status = self._RunSimpleCommand(cmd_val, do_fork)
 
       elif case(command_e.ExpandedAlias):
         node = cast(command__ExpandedAlias, UP_node)
@@ -1173,9 +1183,17 @@ class CommandEvaluator(object):
               span_id=node.spids[1])
         self.procs[node.name] = Proc(
             node.name, node.spids[1], proc_sig.Open(), node.body, [], True)
+        self.arena.Pin()  # the body refers to spans
 
         status = 0
 
+      elif case(command_e.LazyBody):
+        node = cast(command__LazyBody, UP_node)
+        if node.parsed is None:
+          node.parsed = self._ParseLazyBody(node)
+        status = self._Execute(node.parsed)
+        check_errexit = False
+
       elif case(command_e.Proc):
         node = cast(command__Proc, UP_node)
 
@@ -1197,6 +1215,7 @@ class CommandEvaluator(object):
         self.procs[node.name.val] = Proc(
             node.name.val, node.name.span_id, node.sig, node.body, defaults,
             False)  # no dynamic scope
+        self.arena.Pin()
 
         status = 0
 
@@ -1223,6 +1242,7 @@ class CommandEvaluator(object):
           obj = objects.Func(node, pos_defaults, named_defaults, self)
           self.mem.SetValue(
               lvalue.Named(node.name.val), value.Obj(obj), scope_e.GlobalOnly)
+          self.arena.Pin()
         status = 0
 
       elif case(command_e.If):
@@ -1288,13 +1308,9 @@ class CommandEvaluator(object):
 
     return status, check_errexit
 
-  def _Execute(self, node):
-    # type: (command_t) -> int
-    """Apply redirects, call _Dispatch(), and performs the errexit check.
+  def _RunPendingTraps(self):
+    # type: () -> None
 
-    Args:
-      node: syntax_asdl.command_t
-    """
     # See core/builtin.py for the Python signal handler that appends to this
     # list.
 
@@ -1310,6 +1326,15 @@ class CommandEvaluator(object):
             with dev.ctx_Tracer(self.tracer, 'trap', None):
               self._Execute(trap_node)
 
+  def _Execute(self, node):
+    # type: (command_t) -> int
+    """Apply redirects, call _Dispatch(), and performs the errexit check.
+
+    Args:
+      node: syntax_asdl.command_t
+    """
+    self._RunPendingTraps()
+
     # This has to go around redirect handling because the process sub could be
     # in the redirect word:
     #     { echo one; echo two; } > >(tac)
@@ -1434,6 +1459,54 @@ class CommandEvaluator(object):
         node = cast(BraceGroup, UP_node)
         self._NoForkLast(node.children[-1])
 
+      elif case(command_e.AndOr):
+        # In 'a && b' and 'a || b', b is a tail, but a isn't
+        node = cast(command__AndOr, UP_node)
+        self._NoForkLast(node.children[-1])
+
+      elif case(command_e.If):
+        node = cast(command__If, UP_node)
+        for arm in node.arms:
+          if len(arm.action):
+            self._NoForkLast(arm.action[-1])
+        if len(node.else_action):
+          self._NoForkLast(node.else_action[-1])
+
+      elif case(command_e.Case):
+        node = cast(command__Case, UP_node)
+        for case_arm in node.arms:
+          if len(case_arm.action):
+            self._NoForkLast(case_arm.action[-1])
+
+  def _MustForkLast(self):
+    # type: () -> bool
+    """Whether a command in tail position has to fork anyway.
+
+    The shell runs the EXIT trap after its last command, and signal traps
+    while it waits, so it can't exec that command when any trap is set.
+    """
+    return len(self.traps) != 0
+
+  def _ParseLazyBody(self, node):
+    # type: (command__LazyBody) -> command_t
+    """Parse a function body on its first call.  See OSH_LAZY_FUNCS."""
+    arena = self.arena
+    lines = []  # type: List[Tuple[int, str, int]]
+    for i in xrange(node.num_lines):
+      line_id = node.first_line_id + i
+      lines.append((line_id, arena.GetLine(line_id), 0))
+
+    line_reader = reader.VirtualLineReader(lines, arena)
+    c_parser = self.parse_ctx.MakeOshParser(line_reader)
+    try:
+      parsed = c_parser.ParseLazyBody(node.spids[0])
+    except error.Parse as e:
+      ui.PrettyPrintError(e, arena)
+      e_die('Syntax error in function body', span_id=node.spids[0], status=2)
+
+    arena.Pin()  # the body refers to spans
+    return parsed
+
   def _RemoveSubshells(self, node):
     # type: (command_t) -> command_t
     """
@@ -1552,6 +1625,9 @@ class CommandEvaluator(object):
     Could use i & (n-1) == i & 255  because we have a power of 2.
     https://stackoverflow.com/questions/14997165/fastest-way-to-get-a-positive-modulo-in-c-c
     """
+    # A signal may have arrived during the last command
+    self._RunPendingTraps()
+
     handler = self.traps.get('EXIT')
     if handler:
       with dev.ctx_Tracer(self.tracer, 'trap EXIT', None):
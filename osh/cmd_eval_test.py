@@ -13,7 +13,7 @@ import unittest
 
 from _devbuild.gen.id_kind_asdl import Id
 from _devbuild.gen.syntax_asdl import (
-    braced_var_sub, suffix_op, compound_word
+    braced_var_sub, command__Simple, suffix_op, compound_word
 )
 from core import test_lib
 from core.test_lib import Tok
@@ -70,5 +70,44 @@ class VarOpTest(unittest.TestCase):
     print(part_vals)
 
 
+def _ForkedCommands(node, out):
+  """Collect the first word of each simple command that still forks."""
+  if isinstance(node, command__Simple):
+    if node.do_fork:
+      out.append(node.words[0].parts[0].val)
+    return
+  for name in node.__slots__:
+    child = getattr(node, name)
+    items = child if isinstance(child, list) else [child]
+    for item in items:
+      if hasattr(item, '__slots__') and not hasattr(item, 'id'):
+        _ForkedCommands(item, out)
+
+
+class NoForkLastTest(unittest.TestCase):
+
+  def testTailPositions(self):
+    arena = test_lib.MakeArena('<cmd_eval_test.py>')
+    cmd_ev = test_lib.InitCommandEvaluator(arena=arena)
+
+    CASES = [
+        ('a; b', ['a']),
+        ('a && b || c', ['a', 'b']),
+        ('if a; then b; c; elif d; then e; else f; fi', ['a', 'b', 'd']),
+        ('case x in x) a; b ;; y) c ;; z) ;; esac', ['a']),
+        ('{ a; if b; then c; fi; }', ['a', 'b']),
+        ('while a; do b; done', ['a', 'b']),
+        ('! a', ['a']),
+    ]
+    for code_str, expected in CASES:
+      c_parser = test_lib.InitCommandParser(code_str, arena=arena)
+      node = c_parser.ParseLogicalLine()
+      cmd_ev._NoForkLast(node)
+
+      forked = []
+      _ForkedCommands(node, forked)
+      self.assertEqual(expected, forked, code_str)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -473,6 +473,7 @@ class CommandParser(object):
     # A hacky boolean to remove 'if cd / {' ambiguity.
     self.allow_block = True
     self.parse_opts = parse_ctx.parse_opts
+    self.lazy_funcs = parse_ctx.lazy_funcs
     # Note: VarChecker is instantiated with each CommandParser, which means
     # that two 'proc foo' -- inside a command sub and outside -- don't
     # conflict, because they use different CommandParser instances.  I think
@@ -490,6 +491,10 @@ class CommandParser(object):
     # type: (AliasesInFlight) -> None
     self.aliases_in_flight = aliases_in_flight
 
+  def Init_LazyFuncs(self, b):
+    # type: (bool) -> None
+    self.lazy_funcs = b
+
   def Reset(self):
     # type: () -> None
     """Reset our own internal state.
@@ -1627,6 +1632,77 @@ class CommandParser(object):
     p_die('Unexpected word while parsing compound command', word=self.cur_word)
     assert False  # for MyPy
 
+  def _MaybeSkipBraceGroup(self):
+    # type: () -> Optional[BraceGroup]
+    """Record the lines of a function body without parsing them.
+
+    With OSH_LAZY_FUNCS=1, the body of
+
+      f() {
+        echo hi
+      }
+
+    becomes a LazyBody, which the CommandEvaluator parses when it's first run.
+    The { must end its line, and the reader must find the } in column 0.
+    Otherwise we return None and the body is parsed as usual.
+
+    Aliases are expanded when a body is parsed, so we don't defer it while any
+    are defined.  The alias could be changed before the first call.
+    """
+    if (not self.lazy_funcs or self.eof_id != Id.Eof_Real or
+        len(self.pending_here_docs)):
+      return None
+    if self.parse_opts.expand_aliases() and len(self.aliases):
+      return None
+
+    left_spid = _KeywordSpid(self.cur_word)
+    span = self.arena.GetLineSpan(left_spid)
+    # The lexer must not have read past this line
+    if span.line_id != self.arena.LastLineId() - 1:
+      return None
+    line = self.arena.GetLine(span.line_id)
+    rest = line[span.col + span.length:].strip()
+    if len(rest) and not rest.startswith('#'):
+      return None
+
+    first_line_id, num_lines = self.line_reader.SkipFunctionBody()
+    if first_line_id == -1:
+      return None
+
+    self._Next()  # skip {, and the lexer resumes on the line with }
+    self._NewlineOk()
+    self._Eat(Id.Lit_RBrace)
+
+    body = command.LazyBody(first_line_id, num_lines, None)
+    body.spids.append(left_spid)
+    node = BraceGroup(None, [body], None)
+    node.spids.append(left_spid)
+    return node
+
+  def _ParseFunctionBody(self):
+    # type: () -> command_t
+    if self.c_id == Id.Lit_LBrace:
+      n1 = self._MaybeSkipBraceGroup()
+      if n1:
+        n1.redirects = self._ParseRedirectList()
+        return n1
+    return self.ParseCompoundCommand()
+
+  def ParseLazyBody(self, left_spid):
+    # type: (int) -> command_t
+    """Parse the lines of a LazyBody, which is the only input.
+
+    Args:
+      left_spid: The { that starts the body
+    """
+    blame_tok = Token(Id.Lit_LBrace, left_spid, '{')
+    with ctx_VarChecker(self.var_checker, blame_tok):
+      c_list = self._ParseCommandList()
+    self._Peek()
+    if self.c_id != Id.Eof_Real:
+      p_die('Unexpected word in function body', word=self.cur_word)
+    return c_list
+
   def ParseFunctionDef(self):
     # type: () -> command__ShFunction
     """
@@ -1680,7 +1756,7 @@ class CommandParser(object):
     func = command.ShFunction()
     func.name = name
     with ctx_VarChecker(self.var_checker, blame_tok):
-      func.body = self.ParseCompoundCommand()
+      func.body = self._ParseFunctionBody()
 
     # matches ParseKshFunctionDef below
     func.spids.append(left_spid)
@@ -1721,7 +1797,7 @@ class CommandParser(object):
     func = command.ShFunction()
     func.name = name
     with ctx_VarChecker(self.var_checker, keyword_tok):
-      func.body = self.ParseCompoundCommand()
+      func.body = self._ParseFunctionBody()
 
     # matches ParseFunctionDef above
     func.spids.append(left_spid)
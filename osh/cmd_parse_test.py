@@ -10,6 +10,7 @@ from _devbuild.gen.syntax_asdl import command_e
 from core import error
 from core import test_lib
 from core import ui
+from frontend import reader
 
 from osh import word_
 
@@ -764,6 +765,52 @@ fi
     self.assertEqual(command_e.BraceGroup, node.body.tag)
     self.assertEqual(2, len(node.body.redirects))
 
+  def testLazyFuncs(self):
+    arena = test_lib.MakeArena('<cmd_parse_test.py>')
+    parse_ctx = test_lib.InitParseContext(arena=arena)
+    parse_ctx.Init_LazyFuncs(True)
+
+    code_str = 'f() {  # comment\n  echo hi\n\n  if then\n} >&2\necho\n'
+    c_parser = parse_ctx.MakeOshParser(
+        reader.BufferLineReader(code_str, arena))
+    node = c_parser.ParseLogicalLine()
+    self.assertEqual(command_e.ShFunction, node.tag_())
+    self.assertEqual(1, len(node.body.redirects))
+
+    lazy = node.body.children[0]
+    self.assertEqual(command_e.LazyBody, lazy.tag_())
+    self.assertEqual((1, 3), (lazy.first_line_id, lazy.num_lines))
+
+    node = c_parser.ParseLogicalLine()  # the parser continues after }
+    self.assertEqual('echo', node.words[0].parts[0].val)
+
+    # The error is reported when the body is parsed
+    lines = [(i, arena.GetLine(i), 0) for i in xrange(1, 4)]
+    body_parser = parse_ctx.MakeOshParser(
+        reader.VirtualLineReader(lines, arena))
+    try:
+      body_parser.ParseLazyBody(lazy.spids[0])
+    except error.Parse as e:
+      span = arena.GetLineSpan(word_.LeftMostSpanForWord(e.word))
+      self.assertEqual(4, arena.GetLineNumber(span.line_id))
+    else:
+      self.fail('Expected parse error')
+
+    # Not deferred
+    for code_str in ['f() { echo hi; }\n', 'f() {\n  echo hi\n  }\n']:
+      c_parser = parse_ctx.MakeOshParser(
+          reader.BufferLineReader(code_str, arena))
+      node = c_parser.ParseLogicalLine()
+      self.assertNotEqual(command_e.LazyBody, node.body.children[0].tag_())
+
+    # Not deferred while an alias is defined, since it's expanded now
+    parse_ctx = test_lib.InitParseContext(arena=arena, aliases={'ll': 'ls'})
+    parse_ctx.Init_LazyFuncs(True)
+    c_parser = parse_ctx.MakeOshParser(
+        reader.BufferLineReader('f() {\n  ll x\n}\n', arena))
+    node = c_parser.ParseLogicalLine()
+    self.assertEqual(command_e.ExpandedAlias, node.body.children[0].tag_())
+
   def testParseKeyword(self):
     # NOTE: It chooses the longest match, which is Lit_Chars>
     node = assert_ParseCommandList(self, 'ifFOO')
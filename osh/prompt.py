@@ -219,6 +219,7 @@ class Evaluator(object):
         ps1_word = word_.ErrorWord(
             "<ERROR: Can't parse PS1: %s>" % e.UserErrorString())
       self.parse_cache[ps1_str] = ps1_word
+      self.parse_ctx.arena.Pin()
 
     # Evaluate, e.g. "${debian_chroot}\u" -> '\u'
     val2 = self.word_ev.EvalForPlugin(ps1_word)
@@ -273,6 +274,7 @@ class UserPlugin(object):
           return  # don't execute
 
       self.parse_cache[prompt_cmd] = node
+      self.arena.Pin()
 
     # Save this so PROMPT_COMMAND can't set $?
     with state.ctx_Registers(self.mem):
@@ -27,11 +27,11 @@ with SPLIT_REGEX = / digit+ / {
 """
 
 from _devbuild.gen.runtime_asdl import (
-    value_e, scope_e, span_e, value__Str, emit_i, char_kind_i, state_i
+    value_e, scope_e, span_e, value__Str
 )
 from core import pyutil
 from core.pyerror import log
-from frontend import consts
+from frontend import match
 from mycpp import mylib
 from mycpp.mylib import tagswitch
 
@@ -225,73 +225,6 @@ class IfsSplitter(_BaseSplitter):
     TODO: This should be (frag, do_split) pairs, to avoid IFS='\'
     double-escaping issue.
     """
-    ws_chars = self.ifs_whitespace
-    other_chars = self.ifs_other
-
-    n = len(s)
-    spans = [] # type: List[Span] # NOTE: in C, could reserve() this to len(s)
-
-    if n == 0:
-      return spans  # empty
-
-    # Ad hoc rule from POSIX: ignore leading whitespace.
-    # "IFS white space shall be ignored at the beginning and end of the input"
-    # This can't really be handled by the state machine.
-
-    i = 0
-    while i < n and s[i] in self.ifs_whitespace:
-      i += 1
-
-    # Append an ignored span.
-    if i != 0:
-      spans.append((span_e.Delim, i))
-
-    # String is ONLY whitespace.  We want to skip the last span after the
-    # while loop.
-    if i == n:
-      return spans
-
-    state = state_i.Start
-    while state != state_i.Done:
-      if i < n:
-        c = s[i]
-        if c in ws_chars:
-          ch = char_kind_i.DE_White
-        elif c in other_chars:
-          ch = char_kind_i.DE_Gray
-        elif allow_escape and c == '\\':
-          ch = char_kind_i.Backslash
-        else:
-          ch = char_kind_i.Black
-      elif i == n:
-        ch = char_kind_i.Sentinel  # one more iterations for the end of string
-      else:
-        raise AssertionError()  # shouldn't happen
-
-      new_state, action = consts.IfsEdge(state, ch)
-      if new_state == state_i.Invalid:
-        raise AssertionError(
-            'Invalid transition from %r with %r' % (state, ch))
-
-      if 0:
-        log('i %d c %r ch %s current: %s next: %s %s',
-             i, c, ch, state, new_state, action)
-
-      if action == emit_i.Part:
-        spans.append((span_e.Black, i))
-      elif action == emit_i.Delim:
-        spans.append((span_e.Delim, i))  # ignored delimiter
-      elif action == emit_i.Empty:
-        spans.append((span_e.Delim, i))  # ignored delimiter
-        spans.append((span_e.Black, i))  # EMPTY part that is NOT ignored
-      elif action == emit_i.Escape:
-        spans.append((span_e.Backslash, i))  # \
-      elif action == emit_i.Nothing:
-        pass
-      else:
-        raise AssertionError()
-
-      state = new_state
-      i += 1
-
-    return spans
+    # Runs the state machine described in frontend/consts.py
+    return match.IfsSplit(s, self.ifs_whitespace, self.ifs_other,
+                          allow_escape)
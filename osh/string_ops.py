@@ -8,15 +8,17 @@ Instead of:
     var y = x -> sub( Glob/a*/, 'b', :ALL)  # maybe a glob literal
 """
 
-from _devbuild.gen.id_kind_asdl import Id
+from _devbuild.gen.id_kind_asdl import Id, Id_t
+from core import error
 from core import pyutil
 from core import ui
 from core.pyerror import e_die, e_strict, log
+from mycpp import mylib
 from osh import glob_
 
 import libc
 
-from typing import List, Tuple, TYPE_CHECKING
+from typing import List, Optional, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.syntax_asdl import suffix_op__Unary, suffix_op__PatSub
 
@@ -227,79 +229,91 @@ def AdvanceUtf8Chars(s, num_chars, byte_offset):
 #   then the result back at the end.
 # - Compile time errors for [[:space:]] ?
 
-def DoUnarySuffixOp(s, op, arg, extglob):
-  # type: (str, suffix_op__Unary, str, bool) -> str
-  """Helper for ${x#prefix} and family."""
+def _IsValidUtf8(s):
+  # type: (str) -> bool
+  if mylib.PYTHON:
+    # The decoder runs in C, unlike CountUtf8Chars()
+    try:
+      s.decode('utf-8')
+    except UnicodeDecodeError:
+      return False
+    return True
+
+  try:
+    CountUtf8Chars(s)
+  except error.Strict:
+    return False
+  return True
+
+
+def _StripGlobBytes(s, op_id, arg, extglob):
+  # type: (str, Id_t, str, bool) -> str
+  """Like _StripGlobChars(), but for strings that aren't valid UTF-8.
+
+  fnmatch() can match an invalid byte, so like bash, we try every byte
+  position.
+  """
+  n = len(s)
+  if op_id == Id.VOp1_Pound:
+    for i in xrange(0, n + 1):
+      if libc.fnmatch(arg, s[:i], extglob):
+        return s[i:]
 
-  tok = op.tok
+  elif op_id == Id.VOp1_DPound:
+    for i in xrange(n, -1, -1):
+      if libc.fnmatch(arg, s[:i], extglob):
+        return s[i:]
 
-  # Fast path for constant strings.
-  if not glob_.LooksLikeGlob(arg):
-    # It doesn't look like a glob, but we glob-escaped it (e.g. [ -> \[).  So
-    # reverse it.  NOTE: We also do this check in Globber.Expand().  It would
-    # be nice to somehow store the original string rather tahn
-    # escaping/unescaping.
-    arg = glob_.GlobUnescape(arg)
+  elif op_id == Id.VOp1_Percent:
+    for i in xrange(n, -1, -1):
+      if libc.fnmatch(arg, s[i:], extglob):
+        return s[:i]
 
-    if tok.id in (Id.VOp1_Pound, Id.VOp1_DPound):  # const prefix
-      # explicit check for non-empty arg (len for mycpp)
-      if len(arg) and s.startswith(arg):
-        return s[len(arg):]
-      else:
-        return s
+  else:
+    for i in xrange(0, n + 1):
+      if libc.fnmatch(arg, s[i:], extglob):
+        return s[:i]
 
-    elif tok.id in (Id.VOp1_Percent, Id.VOp1_DPercent):  # const suffix
-      # need explicit check for non-empty arg (len for mycpp)
-      if len(arg) and s.endswith(arg):
-        return s[:-len(arg)]
-      else:
-        return s
+  return s
 
-    # These operators take glob arguments, we don't implement that obscure case.
-    elif tok.id == Id.VOp1_Comma:  # Only lowercase the first letter
-      if arg != '':
-        e_die("%s can't have an argument", ui.PrettyId(tok.id), token=tok)
-      if len(s):
-        return s[0].lower() + s[1:]
-      else:
-        return s
 
-    elif tok.id == Id.VOp1_DComma:
-      if arg != '':
-        e_die("%s can't have an argument", ui.PrettyId(tok.id), token=tok)
-      return s.lower()
+def _StripGlob(s, op_id, arg, regex):
+  # type: (str, Id_t, str, str) -> str
+  """Strip the longest prefix ## or suffix %% of s that matches the glob arg.
 
-    elif tok.id == Id.VOp1_Caret:  # Only uppercase the first letter
-      if arg != '':
-        e_die("%s can't have an argument", ui.PrettyId(tok.id), token=tok)
-      if len(s):
-        return s[0].upper() + s[1:]
-      else:
-        return s
+  The regex is arg translated by SuffixOpRegex().  POSIX regexes find the
+  leftmost-longest match, so each op takes one anchored search.
 
-    elif tok.id == Id.VOp1_DCaret:
-      if arg != '':
-        e_die("%s can't have an argument", ui.PrettyId(tok.id), token=tok)
-      return s.upper()
+  That only holds when s is valid UTF-8, since a regex . can't match an invalid
+  byte.  Otherwise we use _StripGlobBytes().
+  """
+  if not _IsValidUtf8(s):
+    return _StripGlobBytes(s, op_id, arg, False)
 
-    else:  # e.g. ^ ^^ , ,,
-      raise AssertionError(tok.id)
+  if op_id == Id.VOp1_DPound:
+    m = libc.regex_first_group_match('^(%s)' % regex, s, 0)
+    if m is None:
+      return s
+    start, longest = m
+    return s[longest:]
 
-  # For patterns, do fnmatch() in a loop.
-  #
-  # TODO:
-  # - Another potential fast path:
-  #   v=aabbccdd
-  #   echo ${v#*b}  # strip shortest prefix
-  #
-  # If the whole thing doesn't match '*b*', then no test can succeed.  So we
-  # can fail early.  Conversely echo ${v%%c*} and '*c*'.
-  #
-  # (Although honestly this whole construct is nuts and should be deprecated.)
+  else:
+    m = libc.regex_first_group_match('(%s)$' % regex, s, 0)
+    if m is None:
+      return s
+    longest, end = m
+    return s[:longest]
+
+
+def _StripGlobChars(s, op_id, arg, extglob):
+  # type: (str, Id_t, str, bool) -> str
+  """Strip a prefix or suffix by calling fnmatch() on each one.
 
+  Raises error.Strict if s isn't valid UTF-8.
+  """
   n = len(s)
 
-  if tok.id == Id.VOp1_Pound:  # shortest prefix
+  if op_id == Id.VOp1_Pound:  # shortest prefix
     # 'abcd': match '', 'a', 'ab', 'abc', ...
     i = 0
     while True:
@@ -312,7 +326,7 @@ def DoUnarySuffixOp(s, op, arg, extglob):
       i = _NextUtf8Char(s, i)
     return s
 
-  elif tok.id == Id.VOp1_DPound:  # longest prefix
+  elif op_id == Id.VOp1_DPound:  # longest prefix
     # 'abcd': match 'abc', 'ab', 'a'
     i = n
     while True:
@@ -325,7 +339,7 @@ def DoUnarySuffixOp(s, op, arg, extglob):
       i = PreviousUtf8Char(s, i)
     return s
 
-  elif tok.id == Id.VOp1_Percent:  # shortest suffix
+  elif op_id == Id.VOp1_Percent:  # shortest suffix
     # 'abcd': match 'abcd', 'abc', 'ab', 'a'
     i = n
     while True:
@@ -338,7 +352,7 @@ def DoUnarySuffixOp(s, op, arg, extglob):
       i = PreviousUtf8Char(s, i)
     return s
 
-  elif tok.id == Id.VOp1_DPercent:  # longest suffix
+  elif op_id == Id.VOp1_DPercent:  # longest suffix
     # 'abcd': match 'abc', 'bc', 'c', ...
     i = 0
     while True:
@@ -352,38 +366,104 @@ def DoUnarySuffixOp(s, op, arg, extglob):
     return s
 
   else:
-    raise NotImplementedError(ui.PrettyId(tok.id))
+    raise NotImplementedError(ui.PrettyId(op_id))
 
 
-def _AllMatchPositions(s, regex):
-  # type: (str, str) -> List[Tuple[int, int]]
-  """Returns a list of all (start, end) match positions of the regex against s.
+def SuffixOpRegex(arg, extglob):
+  # type: (str, bool) -> str
+  """Translate the glob in ${x#glob} to a regex, or return '' for fnmatch().
 
-  (If there are no matches, it returns the empty list.)
+  GlobToERE() doesn't understand extended globs, and we keep fnmatch()
+  semantics for globs it warns about.
   """
-  matches = []  # type: List[Tuple[int, int]]
-  pos = 0
-  n = len(s)
-  while pos < n:  # needed to prevent infinite loop in (.*) case
-    m = libc.regex_first_group_match(regex, s, pos)
-    if m is None:
-      break
-    matches.append(m)
-    start, end = m
-    pos = end  # advance position
-  return matches
+  if extglob or not glob_.LooksLikeGlob(arg):
+    return ''
+  regex, warnings = glob_.GlobToERE(arg)
+  if len(warnings):
+    return ''
+  return regex
+
+
+def DoUnarySuffixOp(s, op, arg, extglob, regex=None):
+  # type: (str, suffix_op__Unary, str, bool, Optional[str]) -> str
+  """Helper for ${x#prefix} and family.
+
+  Args:
+    regex: from SuffixOpRegex(), which the caller may cache.  Only used for
+      ## and %%.
+  """
+
+  tok = op.tok
+
+  # Fast path for constant strings.
+  if not glob_.LooksLikeGlob(arg):
+    # It doesn't look like a glob, but we glob-escaped it (e.g. [ -> \[).  So
+    # reverse it.  NOTE: We also do this check in Globber.Expand().  It would
+    # be nice to somehow store the original string rather tahn
+    # escaping/unescaping.
+    arg = glob_.GlobUnescape(arg)
+
+    if tok.id in (Id.VOp1_Pound, Id.VOp1_DPound):  # const prefix
+      # explicit check for non-empty arg (len for mycpp)
+      if len(arg) and s.startswith(arg):
+        return s[len(arg):]
+      else:
+        return s
+
+    elif tok.id in (Id.VOp1_Percent, Id.VOp1_DPercent):  # const suffix
+      # need explicit check for non-empty arg (len for mycpp)
+      if len(arg) and s.endswith(arg):
+        return s[:-len(arg)]
+      else:
+        return s
+
+    # These operators take glob arguments, we don't implement that obscure case.
+    elif tok.id == Id.VOp1_Comma:  # Only lowercase the first letter
+      if arg != '':
+        e_die("%s can't have an argument", ui.PrettyId(tok.id), token=tok)
+      if len(s):
+        return s[0].lower() + s[1:]
+      else:
+        return s
+
+    elif tok.id == Id.VOp1_DComma:
+      if arg != '':
+        e_die("%s can't have an argument", ui.PrettyId(tok.id), token=tok)
+      return s.lower()
+
+    elif tok.id == Id.VOp1_Caret:  # Only uppercase the first letter
+      if arg != '':
+        e_die("%s can't have an argument", ui.PrettyId(tok.id), token=tok)
+      if len(s):
+        return s[0].upper() + s[1:]
+      else:
+        return s
 
+    elif tok.id == Id.VOp1_DCaret:
+      if arg != '':
+        e_die("%s can't have an argument", ui.PrettyId(tok.id), token=tok)
+      return s.upper()
 
-def _PatSubAll(s, regex, replace_str):
-  # type: (str, str, str) -> str
-  parts = []  # type: List[str]
-  prev_end = 0
-  for start, end in _AllMatchPositions(s, regex):
-    parts.append(s[prev_end:start])
-    parts.append(replace_str)
-    prev_end = end
-  parts.append(s[prev_end:])
-  return ''.join(parts)
+    else:  # e.g. ^ ^^ , ,,
+      raise AssertionError(tok.id)
+
+  # ## and %% search with the glob translated to a regex.  POSIX regexes
+  # have no shortest match, so # and % still call fnmatch() on each prefix or
+  # suffix.
+  if tok.id in (Id.VOp1_DPound, Id.VOp1_DPercent):
+    if regex is None:
+      regex = SuffixOpRegex(arg, extglob)
+    if len(regex):
+      try:
+        return _StripGlob(s, tok.id, arg, regex)
+      except RuntimeError:
+        pass  # an invalid regex like [z-a], which fnmatch() doesn't match
+
+  # (Although honestly this whole construct is nuts and should be deprecated.)
+  try:
+    return _StripGlobChars(s, tok.id, arg, extglob)
+  except error.Strict:
+    return _StripGlobBytes(s, tok.id, arg, extglob)
 
 
 class GlobReplacer(object):
@@ -391,9 +471,7 @@ class GlobReplacer(object):
   def __init__(self, regex, replace_str, slash_spid):
     # type: (str, str, int) -> None
 
-    # TODO: It would be nice to cache the compilation of the regex here,
-    # instead of just the string.  That would require more sophisticated use of
-    # the Python/C API in libc.c, which we might want to avoid.
+    # libc caches the compiled regex, keyed by this string
     self.regex = regex
     self.replace_str = replace_str
     self.slash_spid = slash_spid
@@ -405,18 +483,24 @@ class GlobReplacer(object):
   def Replace(self, s, op):
     # type: (str, suffix_op__PatSub) -> str
 
-    regex = '(%s)' % self.regex  # make it a group
+    # Like bash, an empty pattern only matches with /# and /%
+    if (len(self.regex) == 0 and op.replace_mode != Id.Lit_Pound and
+        op.replace_mode != Id.Lit_Percent):
+      return s
 
     if op.replace_mode == Id.Lit_Slash:
       try:
-        return _PatSubAll(s, regex, self.replace_str)  # loop over matches
+        # Find every match and build the result in one native call
+        return libc.regex_sub_all(self.regex, s, self.replace_str)
       except RuntimeError as e:
-        # libc.regex_first_group_match raises RuntimeError.
+        # libc.regex_sub_all raises RuntimeError.
         # note: MyPy doesn't know RuntimeError has e.message (and e.args)
         msg = e.message  # type: str
-        e_die('Error matching regex %r: %s', regex, msg,
+        e_die('Error matching regex %r: %s', self.regex, msg,
               span_id=self.slash_spid)
 
+    regex = '(%s)' % self.regex  # make it a group
+
     if op.replace_mode == Id.Lit_Pound:
       regex = '^' + regex
     elif op.replace_mode == Id.Lit_Percent:
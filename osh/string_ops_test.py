@@ -6,9 +6,14 @@ from __future__ import print_function
 
 import unittest
 
+from _devbuild.gen.id_kind_asdl import Id
+from _devbuild.gen.syntax_asdl import Token, suffix_op
+from asdl import runtime
 from core import error
 from osh import string_ops  # module under test
 
+import libc
+
 
 class LibStrTest(unittest.TestCase):
 
@@ -105,29 +110,54 @@ class LibStrTest(unittest.TestCase):
       print('%d test %06r return %06r' % (i, s[i:], s[:i]))
     print()
 
-  def testPatSubAllMatches(self):
-    s = 'oXooXoooX'
-
-    # Match positions
-    self.assertEqual(
-        [(1, 3), (4, 6)],
-        string_ops._AllMatchPositions(s, '(X.)'))
-
-    # No match
-    self.assertEqual(
-        [],
-        string_ops._AllMatchPositions(s, '(z)'))
-
-    # Replacement
-    self.assertEqual(
-        'o_o_ooX',
-        string_ops._PatSubAll(s, '(X.)', '_'))
 
-    # Replacement with no match
-    self.assertEqual(
-        s,
-        string_ops._PatSubAll(s, '(z)', '_'))
+  def testStripGlob(self):
+    libc.cpython_reset_locale()  # like bin/oil.py, so ? matches a UTF-8 char
 
+    ops = [Id.VOp1_DPound, Id.VOp1_DPercent]  # the longest match
+    CASES = [
+        ('aabbccdd', '*b'),
+        ('aabbccdd', 'c*'),
+        ('aabbccdd', '*'),
+        ('aabbccdd', 'x*'),
+        ('a:b:c', '*:'),
+        ('a:b:c', ':*'),
+        ('', '*'),
+        ('_\xce\xbc_\xce\xbc_', '?_'),
+        ('_\xce\xbc_\xce\xbc_', '_?'),
+    ]
+    for s, pat in CASES:
+      regex, _ = string_ops.glob_.GlobToERE(pat)
+      for op_id in ops:
+        op = suffix_op.Unary(Token(op_id, runtime.NO_SPID, None), None)
+        # extglob forces the fnmatch() loop
+        expected = string_ops.DoUnarySuffixOp(s, op, pat, True)
+        self.assertEqual(expected, string_ops._StripGlob(s, op_id, pat, regex),
+                         '%r %s %r' % (s, op_id, pat))
+
+    # Not valid UTF-8: a regex . doesn't match \xff, but fnmatch() does
+    s = 'a\xffb/foo/bar'
+    BYTE_CASES = [
+        (Id.VOp1_Pound, '*/', 'foo/bar'),
+        (Id.VOp1_DPound, '*/', 'bar'),
+        (Id.VOp1_Percent, '/*', 'a\xffb/foo'),
+        (Id.VOp1_DPercent, '/*', 'a\xffb'),
+        (Id.VOp1_DPound, 'x*', s),
+    ]
+    for op_id, pat, expected in BYTE_CASES:
+      op = suffix_op.Unary(Token(op_id, runtime.NO_SPID, None), None)
+      for extglob in [False, True]:
+        self.assertEqual(expected,
+                         string_ops.DoUnarySuffixOp(s, op, pat, extglob),
+                         '%s %r' % (op_id, pat))
+
+    op = suffix_op.Unary(Token(Id.VOp1_DPound, runtime.NO_SPID, None), None)
+    self.assertEqual('c', string_ops.DoUnarySuffixOp('a:b:c', op, '*:', False))
+    regex = string_ops.SuffixOpRegex('*:', False)
+    self.assertEqual('c', string_ops.DoUnarySuffixOp('a:b:c', op, '*:', False,
+                                                     regex))
+    self.assertEqual('', string_ops.SuffixOpRegex('*:', True))  # extglob
+    self.assertEqual('', string_ops.SuffixOpRegex('abc', False))  # not a glob
 
 if __name__ == '__main__':
   unittest.main()
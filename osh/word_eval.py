@@ -421,6 +421,8 @@ class AbstractWordEvaluator(StringWordEvaluator):
     self.errfmt = errfmt
 
     self.globber = glob_.Globber(exec_opts)
+    # ${x#pat} is often in a loop, and translating the glob is slow
+    self.suffix_op_regexes = {}  # type: Dict[str, str]
 
   def CheckCircularDeps(self):
     # type: () -> None
@@ -789,12 +791,20 @@ class AbstractWordEvaluator(StringWordEvaluator):
       assert arg_val.tag == value_e.Str
 
       extglob = self.exec_opts.extglob()
+      pat = arg_val.s
+      if extglob or op.tok.id not in (Id.VOp1_DPound, Id.VOp1_DPercent):
+        regex = ''
+      elif pat in self.suffix_op_regexes:
+        regex = self.suffix_op_regexes[pat]
+      else:
+        regex = string_ops.SuffixOpRegex(pat, extglob)
+        self.suffix_op_regexes[pat] = regex
 
       UP_val = val
       with tagswitch(val) as case:
         if case(value_e.Str):
           val = cast(value__Str, UP_val)
-          s = string_ops.DoUnarySuffixOp(val.s, op, arg_val.s, extglob)
+          s = string_ops.DoUnarySuffixOp(val.s, op, pat, extglob, regex)
           #log('%r %r -> %r', val.s, arg_val.s, s)
           new_val = value.Str(s) # type: value_t
 
@@ -804,14 +814,15 @@ class AbstractWordEvaluator(StringWordEvaluator):
           strs = []  # type: List[str]
           for s in val.strs:
             if s is not None:
-              strs.append(string_ops.DoUnarySuffixOp(s, op, arg_val.s, extglob))
+              strs.append(string_ops.DoUnarySuffixOp(s, op, pat, extglob,
+                                                     regex))
           new_val = value.MaybeStrArray(strs)
 
         elif case(value_e.AssocArray):
           val = cast(value__AssocArray, UP_val)
           strs = []
           for s in val.d.values():
-            strs.append(string_ops.DoUnarySuffixOp(s, op, arg_val.s, extglob))
+            strs.append(string_ops.DoUnarySuffixOp(s, op, pat, extglob, regex))
           new_val = value.MaybeStrArray(strs)
 
         else:
@@ -1503,13 +1514,16 @@ class AbstractWordEvaluator(StringWordEvaluator):
         if mylib.PYTHON:
           func_name = part.name.val[1:]
 
+          # Evaluate the args first, since the expression evaluator defines
+          # the builtin functions on first use.
+          pos_args, named_args = self.expr_ev.EvalArgList(part.args)
+
           fn_val = self.mem.GetValue(func_name)  # type: value_t
           if fn_val.tag != value_e.Obj:
             e_die("Expected function named %r, got %r ", func_name, fn_val)
           assert isinstance(fn_val, value__Obj)
 
           func = fn_val.obj
-          pos_args, named_args = self.expr_ev.EvalArgList(part.args)
 
           id_ = part.name.id
           if id_ == Id.VSub_DollarName:
@@ -322,6 +322,23 @@ n=3
 ## END
 ## N-I dash/mksh/zsh/ash stdout-json: ""
 
+#### mapfile -n leaves the rest of stdin for the next reader
+type mapfile >/dev/null 2>&1 || exit 0
+seq 5 > five.txt
+{ mapfile -n 2 -t arr; cat; } < five.txt
+echo "arr=${arr[@]}"
+seq 5 | { mapfile -s 1 -n 2 -t arr; cat; echo "arr=${arr[@]}"; }
+## STDOUT:
+3
+4
+5
+arr=1 2
+4
+5
+arr=2 3
+## END
+## N-I dash/mksh/zsh/ash stdout-json: ""
+
 #### mapfile / readarray stdin  TODO: Fix me.
 shopt -s lastpipe  # for bash
 
@@ -233,6 +233,22 @@ echo 'should not get here'
 ## status: 42
 
 
+#### functions and traps defined in eval outlive it
+for i in 1 2; do
+  eval "f$i() { echo f$i; }"
+  eval 'x=$((x + 1))'
+done
+eval 'trap "echo trap" EXIT'
+f1
+f2
+echo $LINENO $x
+## STDOUT:
+f1
+f2
+8 2
+trap
+## END
+
 #### exit within source (regression)
 cd $TMP
 echo 'exit 42' > lib.sh
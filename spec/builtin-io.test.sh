@@ -697,3 +697,63 @@ find . -type f -a -print0 | { read -r -d ''; echo "[$REPLY]"; }
 ## N-I dash/zsh/mksh STDOUT:
 ## END
 
+
+#### read from a file leaves the rest for the next reader
+seq 3 > lines.txt
+{ read x; cat; read y; echo "x=$x y=$y"; } < lines.txt
+## STDOUT:
+2
+3
+x=1 y=
+## END
+
+#### read loop on a pipe, with other readers of the pipe
+seq 4 | { while read x; do (read y; echo "y=$y"); echo "x=$x"; done; }
+seq 4 | { read -n 1 c; read -d 3 rest; cat; echo "c=$c"; }
+## STDOUT:
+y=2
+x=1
+y=4
+x=3
+
+4
+c=1
+## END
+## N-I dash STDOUT:
+y=2
+x=1
+y=4
+x=3
+1
+2
+3
+4
+c=
+## END
+
+#### read loop on a pipe, with redirects inside the loop
+echo redirected > other.txt
+seq 3 | while read x; do read y < other.txt; echo "$x $y"; done
+seq 3 | while read x; do
+  read y <<EOF
+here $x
+EOF
+  echo "$x $y"
+done
+## STDOUT:
+1 redirected
+2 redirected
+3 redirected
+1 here 1
+2 here 2
+3 here 3
+## END
+
+#### exec < file in the last part of a pipeline
+printf 'f1\nf2\n' > f.txt
+seq 5 | { read a; exec < f.txt; read b; echo $a $b; }
+seq 5 | { read a; { exec < f.txt; }; read b; read c; echo $a $b $c; }
+## STDOUT:
+1 f1
+1 f1 f2
+## END
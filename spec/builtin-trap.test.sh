@@ -111,6 +111,16 @@ for
 ## stdout: FAILED
 ## status: 0
 
+#### trap EXIT when the last command is external
+trap 'echo bye' EXIT
+if true; then
+  $SH -c 'echo hi'
+fi
+## STDOUT:
+hi
+bye
+## END
+
 #### trap EXIT with explicit exit
 trap 'echo IN TRAP; echo $stdout' EXIT 
 stdout=FOO
@@ -404,3 +414,12 @@ status=0
 USR1
 status=0
 ## END
+
+#### signal trap when the last command is external
+trap 'echo caught TERM' TERM
+( sleep 0.2; kill -TERM $$ ) &
+sleep 1
+## STDOUT:
+caught TERM
+## END
+## status: 0
@@ -270,3 +270,73 @@ status=1
 status=1
 ## END
 ## OK bash stdout-json: "\nstatus=0\n\nstatus=0\n"
+
+#### Command sub with builtins and functions doesn't leak state
+f() {
+  local x=local
+  echo "f $1 $x"
+  return 3
+}
+g() {
+  y=global
+  echo g
+}
+echo "$(f a; echo $?)"
+echo "$(g)" y=$y
+false
+echo $(echo $?) $?
+echo "$(echo 1; printf '%s\n' 2 3)"
+## STDOUT:
+f a local
+3
+g y=
+1 0
+1
+2
+3
+## END
+## OK dash STDOUT:
+f a local
+3
+g y=
+1 1
+1
+2
+3
+## END
+
+#### Errors in a command sub with builtins
+set -u
+x=$(echo $undefined_var)
+echo status=$?
+## STDOUT:
+status=1
+## END
+## OK dash STDOUT:
+status=2
+## END
+
+#### Nested command sub and pipeline output isn't lost
+x=$(echo "[$(echo hi; echo there | cat)]")
+echo "$x"
+f() { echo "<$(echo a | cat)>"; }
+y=$(f)
+echo "$y"
+## STDOUT:
+[hi
+there]
+<a>
+## END
+
+#### Command sub calling a function whose callee was redefined
+g() { echo g; }
+f() { g; }
+x=$(f)
+echo "$x"
+g() { v=leaked; exit 3; }
+x=$(f)
+echo "status=$? v=$v"
+## STDOUT:
+g
+status=3 v=
+## END
@@ -184,6 +184,18 @@ status=0
 status=0
 ## END
 
+#### assigning PATH clears the hash table
+whoami >/dev/null
+hash | grep -c whoami
+PATH="$PATH"
+hash | grep -c whoami
+echo status=$?
+## STDOUT:
+1
+0
+status=1
+## END
+
 #### hash -r doesn't allow additional args
 hash -r whoami >/dev/null  # avoid weird output with mksh
 echo status=$?
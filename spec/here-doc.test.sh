@@ -363,3 +363,22 @@ EOF5
 5: fd5
 ## END
 
+
+#### Here doc when stdin is closed
+# The shell reads this file from stdin, so close it in a child shell
+$SH -c '
+exec 0<&-
+cat <<EOF
+hi
+EOF
+true 3<&0 2>/dev/null
+echo status=$?
+'
+## STDOUT:
+hi
+status=1
+## END
+## OK dash STDOUT:
+hi
+status=2
+## END
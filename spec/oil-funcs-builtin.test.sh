@@ -208,3 +208,14 @@ ___
 a.z
 b.z
 ## END
+
+#### Shell variables aren't clobbered by builtin functions
+max=42
+var x = 1 + 2
+echo "$max $x"
+var y = min(3, 4)
+echo $y
+## STDOUT:
+42 3
+3
+## END
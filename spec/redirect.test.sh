@@ -476,6 +476,38 @@ FOO
 ## END
 ## N-I dash/ash/yash stdout-json: "\n"
 
+#### $(< file) strips trailing newlines, and fails if the file is missing
+
+printf 'a\nb\n\n\n' > myfile
+foo=$(< myfile)
+echo "[$foo]"
+
+foo=$(< nonexistent)
+echo status=$?
+## STDOUT:
+[a
+b]
+status=1
+## END
+## N-I dash/ash/yash STDOUT:
+[]
+status=2
+## END
+
+#### $(0< file) reads the file, but $(3< file) doesn't
+
+echo hi > myfile
+echo "[$(0< myfile)]"
+echo "[$(3< myfile)]"
+## STDOUT:
+[hi]
+[]
+## END
+## N-I dash/ash/yash STDOUT:
+[]
+[]
+## END
+
 #### $(< file) with more statements
 
 # note that it doesn't do this without a command sub!
@@ -130,3 +130,63 @@ f
 status=0
 ## END
 
+
+#### OSH_LAZY_FUNCS parses bodies when they're called
+cat >$TMP/lazy-funcs.sh <<'SCRIPT'
+f() {
+  echo "f $1"
+  g() {
+    echo g
+  }
+  g
+}
+
+h() {
+  echo h
+} > $TMP/lazy-funcs.txt
+
+f x
+f y
+h
+cat $TMP/lazy-funcs.txt
+SCRIPT
+OSH_LAZY_FUNCS=1 $SH $TMP/lazy-funcs.sh
+## STDOUT:
+f x
+g
+f y
+g
+h
+## END
+
+#### OSH_LAZY_FUNCS with a brace in a multi-line string
+cat >$TMP/lazy-string.sh <<'SCRIPT'
+f() {
+  x='a
+}
+'
+  echo "x=[$x]"
+}
+f
+SCRIPT
+OSH_LAZY_FUNCS=1 $SH $TMP/lazy-string.sh
+## STDOUT:
+x=[a
+}
+]
+## END
+
+#### OSH_LAZY_FUNCS expands aliases when the function is defined
+cat >$TMP/lazy-alias.sh <<'SCRIPT'
+shopt -s expand_aliases
+alias ll='echo A'
+f() {
+  ll x
+}
+unalias ll
+f
+SCRIPT
+OSH_LAZY_FUNCS=1 $SH $TMP/lazy-alias.sh
+## STDOUT:
+A x
+## END
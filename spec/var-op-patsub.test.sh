@@ -316,3 +316,25 @@ fooz
 status=0
 ## END
 ## OK bash/mksh/zsh status: 0
+
+#### patsub with empty pattern
+s=abc
+echo ${s//""/x}
+echo ${s/""/x}
+echo ${s/#""/x}
+echo ${s/%""/x}
+## STDOUT:
+abc
+abc
+xabc
+abcx
+## END
+
+#### patsub of empty string
+s=''
+echo "[${s//*/x}]"
+echo "[${s//?/x}]"
+## STDOUT:
+[x]
+[]
+## END
@@ -355,3 +355,33 @@ echo 4 ${x##*(foo|bar)'()'}
 4
 ## END
 ## N-I dash/zsh/ash stdout-json: ""
+
+#### Strip glob with quoted and bracketed chars
+s='*a.b*c.d'
+echo "${s#"*"?}"
+echo "${s%%.*}"
+echo "${s##*"*"}"
+echo "${s#*[.]}"
+echo "${s%[!.]}"
+echo "${s#[z-a]*}"
+## STDOUT:
+.b*c.d
+*a
+c.d
+b*c.d
+*a.b*c.
+*a.b*c.d
+## END
+
+#### Strip glob from a string that isn't valid UTF-8
+case $SH in (dash|mksh|zsh|ash) exit ;; esac
+s=$'a\377b/foo/bar'
+echo "${s##*/}"
+echo "${s#*/}"
+echo "${s%%/*}" | od -A n -t c
+## STDOUT:
+bar
+foo/bar
+   a 377   b  \n
+## END
+## N-I dash/mksh/zsh/ash stdout-json: ""
@@ -62,16 +62,18 @@ def PrintArena(arena):
 
 def PrintSpans(arena):
   """Just to see spans."""
-  if len(arena.spans) == 1:  # Special case for line_id == -1
+  num_spans = arena.LastSpanId()
+  if num_spans == 1:  # Special case for line_id == -1
     print('Empty file with EOF span on invalid line:')
-    print('%s' % arena.spans[0])
+    print('%s' % arena.GetLineSpan(0))
     return
 
-  for i, span in enumerate(arena.spans):
+  for i in xrange(num_spans):
+    span = arena.GetLineSpan(i)
     line = arena.GetLine(span.line_id)
     piece = line[span.col : span.col + span.length]
     print('%5d %r' % (i, piece))
-  print('(%d spans)' % len(arena.spans), file=sys.stderr)
+  print('(%d spans)' % num_spans, file=sys.stderr)
 
 
 def PrintAsOil(arena, node):
@@ -0,0 +1,314 @@
+"""
+parse_all.py - Parse many shell scripts in parallel.
+
+Usage:
+  oshc parse-all [-j N] FILE_OR_DIR...
+  find . -name '*.sh' | oshc parse-all [-j N]
+
+Directories are searched for *.sh files.  The files are handed out to N worker
+processes (default: the number of CPUs), and each file is parsed with its own
+arena.  As each file finishes, a line is printed to stdout:
+
+  status  elapsed_ms  num_lines  path
+
+where status is 0 for success, 2 for a parse error, and 1 if the file couldn't
+be read.  Parse errors are printed to stderr.  The exit status is the maximum
+of the file statuses.
+
+Messages between the processes are netstrings, like fanos, but over pipes.
+"""
+from __future__ import print_function
+
+import cStringIO
+import select
+import sys
+import time
+
+import posix_ as posix
+
+from _devbuild.gen.option_asdl import option_i
+from _devbuild.gen.syntax_asdl import source
+from core import alloc
+from core import error
+from core import main_loop
+from core import optview
+from core import pyutil
+from core import state
+from core import ui
+from frontend import args
+from frontend import flag_spec
+from frontend import parse_lib
+from frontend import reader
+from pylib import os_path
+
+from typing import List, Tuple, Optional, Any
+
+SPEC = flag_spec.FlagSpec('parse-all')
+SPEC.ShortFlag('-j', args.Int)
+
+
+def _NumCpus():
+  # type: () -> int
+  n = 0
+  try:
+    with open('/proc/cpuinfo') as f:
+      for line in f:
+        if line.startswith('processor'):
+          n += 1
+  except IOError:
+    pass
+  return n or 1
+
+
+def FindFiles(paths, out):
+  # type: (List[str], List[str]) -> None
+  """Expand directories into the *.sh files under them."""
+  for path in paths:
+    try:
+      names = posix.listdir(path)
+    except OSError:  # not a directory, or doesn't exist
+      out.append(path)
+      continue
+    names.sort()
+    for name in names:
+      if name.startswith('.'):
+        continue
+      child = os_path.join(path, name)
+      if name.endswith('.sh'):
+        out.append(child)
+      else:
+        try:
+          posix.listdir(child)
+        except OSError:
+          continue
+        FindFiles([child], out)
+
+
+def _WriteMsg(fd, s):
+  # type: (int, str) -> None
+  buf = '%d:%s,' % (len(s), s)
+  while buf:
+    n = posix.write(fd, buf)
+    buf = buf[n:]
+
+
+class _MsgReader(object):
+  """Read netstrings from a pipe."""
+
+  def __init__(self, fd):
+    # type: (int) -> None
+    self.fd = fd
+    self.buf = ''
+
+  def _Parse(self):
+    # type: () -> Optional[str]
+    colon = self.buf.find(':')
+    if colon == -1:
+      return None
+    n = int(self.buf[:colon])
+    end = colon + 1 + n
+    if len(self.buf) < end + 1:
+      return None
+    msg = self.buf[colon+1 : end]
+    assert self.buf[end] == ',', self.buf
+    self.buf = self.buf[end+1:]
+    return msg
+
+  def Next(self):
+    # type: () -> Optional[str]
+    """Block until a message is available.  Returns None on EOF."""
+    while True:
+      msg = self._Parse()
+      if msg is not None:
+        return msg
+      chunk = posix.read(self.fd, 4096)
+      if not chunk:
+        return None
+      self.buf += chunk
+
+
+def ParseFile(path, parse_opts, oil_grammar):
+  # type: (str, optview.Parse, Any) -> Tuple[int, int, str]
+  """Parse a file with a fresh arena.
+
+  Returns:
+    status, number of lines, and error text.
+  """
+  try:
+    f = open(path)
+  except IOError as e:
+    return 1, 0, "oshc: Couldn't open %r: %s\n" % (path,
+                                                posix.strerror(e.errno))
+
+  arena = alloc.Arena()
+  arena.PushSource(source.MainFile(path))
+
+  aliases = {}  # Dummy value; not respecting aliases!
+  parse_ctx = parse_lib.ParseContext(arena, parse_opts, aliases, oil_grammar)
+  parse_ctx.Init_OnePassParse(True)
+
+  line_reader = reader.FileReader(f, arena)
+  c_parser = parse_ctx.MakeOshParser(line_reader)
+  try:
+    try:
+      main_loop.ParseWholeFile(c_parser)
+    except error.Parse as e:
+      # ui prints to stderr, so capture it for the parent
+      old_stderr = sys.stderr
+      sys.stderr = cStringIO.StringIO()
+      try:
+        ui.PrettyPrintError(e, arena)
+        err_text = sys.stderr.getvalue()
+      finally:
+        sys.stderr = old_stderr
+      return 2, arena.LastLineId(), err_text
+  finally:
+    f.close()
+
+  return 0, arena.LastLineId(), ''
+
+
+def _WorkerLoop(task_fd, result_fd, parse_opts, oil_grammar):
+  # type: (int, int, optview.Parse, Any) -> None
+  tasks = _MsgReader(task_fd)
+  while True:
+    path = tasks.Next()
+    if path is None:  # parent closed the pipe
+      break
+
+    start_time = time.time()
+    status, num_lines, err_text = ParseFile(path, parse_opts, oil_grammar)
+    elapsed_ms = (time.time() - start_time) * 1000
+
+    _WriteMsg(result_fd, '%d %.1f %d\n%s' %
+              (status, elapsed_ms, num_lines, err_text))
+
+
+class _Worker(object):
+
+  def __init__(self, pid, task_fd, result_fd):
+    # type: (int, int, int) -> None
+    self.pid = pid
+    self.task_fd = task_fd
+    self.results = _MsgReader(result_fd)
+    self.path = None  # type: Optional[str]
+
+
+def _StartWorker(parse_opts, oil_grammar, workers):
+  # type: (optview.Parse, Any, List[_Worker]) -> _Worker
+  task_r, task_w = posix.pipe()
+  result_r, result_w = posix.pipe()
+
+  pid = posix.fork()
+  if pid == 0:  # child
+    posix.close(task_w)
+    posix.close(result_r)
+    # Only the parent should hold the other workers' pipes, so they see EOF
+    for w in workers:
+      posix.close(w.task_fd)
+      posix.close(w.results.fd)
+    status = 0
+    try:
+      _WorkerLoop(task_r, result_w, parse_opts, oil_grammar)
+    except KeyboardInterrupt:
+      status = 130
+    posix._exit(status)
+
+  posix.close(task_r)
+  posix.close(result_w)
+  return _Worker(pid, task_w, result_r)
+
+
+def Main(argv):
+  # type: (List[str]) -> int
+  arg_r = args.Reader(argv)
+  arg_r.Next()  # skip 'parse-all'
+  arg = args.Parse(SPEC, arg_r)
+
+  paths = []  # type: List[str]
+  rest = arg_r.Rest()
+  if rest:
+    FindFiles(rest, paths)
+  else:
+    for line in sys.stdin:
+      line = line.rstrip('\n')
+      if line:
+        paths.append(line)
+
+  num_workers = arg.j if arg.j > 0 else _NumCpus()
+  num_workers = min(num_workers, len(paths))
+
+  loader = pyutil.GetResourceLoader()
+  oil_grammar = pyutil.LoadOilGrammar(loader)
+
+  opt0_array = state.InitOpts()
+  no_stack = None  # type: List[bool]
+  opt_stacks = [no_stack] * option_i.ARRAY_SIZE  # type: List[List[bool]]
+  parse_opts = optview.Parse(opt0_array, opt_stacks)
+
+  # Flush before forking, so the children don't inherit buffered output
+  sys.stdout.flush()
+  sys.stderr.flush()
+
+  workers = []  # type: List[_Worker]
+  for _ in xrange(num_workers):
+    workers.append(_StartWorker(parse_opts, oil_grammar, workers))
+
+  paths.reverse()  # hand them out in order with pop()
+
+  def _Assign(w):
+    # type: (_Worker) -> None
+    if paths:
+      w.path = paths.pop()
+      _WriteMsg(w.task_fd, w.path)
+    else:
+      w.path = None
+      posix.close(w.task_fd)  # worker exits
+
+  for w in workers:
+    _Assign(w)
+
+  print('status\telapsed_ms\tnum_lines\tpath')
+  sys.stdout.flush()
+
+  max_status = 0
+  busy = [w for w in workers if w.path is not None]
+  while busy:
+    ready, _, _ = select.select([w.results.fd for w in busy], [], [])
+    for w in busy:
+      if w.results.fd not in ready:
+        continue
+
+      msg = w.results.Next()
+      if msg is None:  # worker died
+        status = 1
+        elapsed_ms = 0.0
+        num_lines = 0
+        err_text = 'parse-all: worker for %r exited unexpectedly\n' % w.path
+      else:
+        first, err_text = msg.split('\n', 1)
+        status_str, elapsed_str, lines_str = first.split()
+        status = int(status_str)
+        elapsed_ms = float(elapsed_str)
+        num_lines = int(lines_str)
+
+      if err_text:
+        sys.stderr.write(err_text)
+        sys.stderr.flush()
+      print('%d\t%.1f\t%d\t%s' % (status, elapsed_ms, num_lines, w.path))
+      sys.stdout.flush()
+      max_status = max(max_status, status)
+
+      if msg is None:
+        w.path = None
+        posix.close(w.task_fd)
+      else:
+        _Assign(w)
+
+    busy = [w for w in busy if w.path is not None]
+
+  for w in workers:
+    posix.close(w.results.fd)
+    posix.waitpid(w.pid, 0)
+
+  return max_status
@@ -0,0 +1,89 @@
+#!/usr/bin/env python2
+"""
+parse_all_test.py: Tests for parse_all.py
+"""
+from __future__ import print_function
+
+import shutil
+import tempfile
+import unittest
+
+import posix_ as posix
+
+from core import optview
+from core import pyutil
+from core import state
+from _devbuild.gen.option_asdl import option_i
+from pylib import os_path
+from tools import parse_all  # module under test
+
+
+def _ParseOpts():
+  opt0_array = state.InitOpts()
+  opt_stacks = [None] * option_i.ARRAY_SIZE
+  return optview.Parse(opt0_array, opt_stacks)
+
+
+class ParseAllTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def _MakeFile(self, rel_path, contents):
+    path = os_path.join(self.tmp_dir, rel_path)
+    with open(path, 'w') as f:
+      f.write(contents)
+    return path
+
+  def testFindFiles(self):
+    posix.mkdir(os_path.join(self.tmp_dir, 'sub'), 0o755)
+    a = self._MakeFile('a.sh', '')
+    self._MakeFile('README', '')
+    b = self._MakeFile('sub/b.sh', '')
+    self._MakeFile('.hidden.sh', '')
+
+    out = []
+    parse_all.FindFiles([self.tmp_dir, '/nonexistent'], out)
+    self.assertEqual([a, b, '/nonexistent'], out)
+
+  def testParseFile(self):
+    oil_grammar = pyutil.LoadOilGrammar(pyutil.GetResourceLoader())
+    parse_opts = _ParseOpts()
+
+    path = self._MakeFile('ok.sh', 'echo hi\nf() {\n  echo $x\n}\n')
+    status, num_lines, err_text = parse_all.ParseFile(
+        path, parse_opts, oil_grammar)
+    self.assertEqual(0, status)
+    self.assertEqual(4, num_lines)
+    self.assertEqual('', err_text)
+
+    path = self._MakeFile('bad.sh', 'echo hi\nif then\n')
+    status, _, err_text = parse_all.ParseFile(path, parse_opts, oil_grammar)
+    self.assertEqual(2, status)
+    self.assertIn('bad.sh:2:', err_text)
+
+    status, _, err_text = parse_all.ParseFile(
+        '/nonexistent', parse_opts, oil_grammar)
+    self.assertEqual(1, status)
+    self.assertIn("Couldn't open", err_text)
+
+  def testMessages(self):
+    r, w = posix.pipe()
+    parse_all._WriteMsg(w, 'foo')
+    parse_all._WriteMsg(w, '')
+    parse_all._WriteMsg(w, 'a:b,\nc')
+    posix.close(w)
+
+    reader = parse_all._MsgReader(r)
+    self.assertEqual('foo', reader.Next())
+    self.assertEqual('', reader.Next())
+    self.assertEqual('a:b,\nc', reader.Next())
+    self.assertEqual(None, reader.Next())
+    posix.close(r)
+
+
+if __name__ == '__main__':
+  unittest.main()